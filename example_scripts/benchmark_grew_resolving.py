@@ -0,0 +1,116 @@
+import logging
+import time
+from argparse import ArgumentParser, Namespace
+from copy import deepcopy
+from pathlib import Path
+
+from ud_boxer.config import Config
+from ud_boxer.grew_rewrite import Grew
+from ud_boxer.rewrite import GrsRewriter
+from ud_boxer.sbn import SBNGraph
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+
+
+def get_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "-p",
+        "--starting_path",
+        type=str,
+        default=str(Config.DATA_DIR / "test_cases"),
+        help="Path to start recursively search for UD files.",
+    )
+    parser.add_argument(
+        "-l",
+        "--language",
+        default=Config.SUPPORTED_LANGUAGES.EN.value,
+        choices=Config.SUPPORTED_LANGUAGES.all_values(),
+        type=str,
+        help="Language of the documents.",
+    )
+    parser.add_argument(
+        "--ud_system",
+        default=Config.UD_SYSTEM.STANZA.value,
+        type=str,
+        choices=Config.UD_SYSTEM.all_values(),
+        help="UD system of the parses to rewrite.",
+    )
+    parser.add_argument(
+        "-c",
+        "--copies",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="Number of copies of all rewritten sentences in a single graph.",
+    )
+    parser.add_argument(
+        "-n",
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of times to resolve each graph, the best run is used.",
+    )
+
+    return parser.parse_args()
+
+
+def combine_grew_graphs(grew_graphs, copies):
+    """Put copies of the (disjoint) grew graphs in a single grew graph"""
+    return {
+        f"{copy_idx}.{graph_idx}.{node_id}": (
+            dict(node_data),
+            [
+                (edge_name, f"{copy_idx}.{graph_idx}.{to_id}")
+                for edge_name, to_id in edges
+            ],
+        )
+        for copy_idx in range(copies)
+        for graph_idx, grew_graph in enumerate(grew_graphs)
+        for node_id, (node_data, edges) in grew_graph.items()
+    }
+
+
+def best_time(grew_graph, language: str, repeat: int) -> float:
+    # 'from_grew' changes the node data, so every run gets a fresh copy.
+    timings = []
+    for _ in range(repeat):
+        graph_copy = deepcopy(grew_graph)
+        start = time.perf_counter()
+        SBNGraph().from_grew(graph_copy, language)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    args = get_args()
+
+    # Rewrite once, only the resolving of the rewritten graphs is timed.
+    rewriter = GrsRewriter(language=args.language)
+    grew_graphs = [
+        rewriter.run(grew_graph)[0]
+        for conll_path in sorted(
+            Path(args.starting_path).glob(
+                f"**/{args.language}.ud.{args.ud_system}.conll"
+            )
+        )
+        for grew_graph in Grew.conll_to_grew(conll_path.read_text())
+    ]
+    if not grew_graphs:
+        raise ValueError(f"No UD files found in {args.starting_path}")
+
+    print(f"{'copies':>8} {'nodes':>8} {'edges':>8} {'resolve (ms)':>14}")
+    for copies in args.copies:
+        grew_graph = combine_grew_graphs(grew_graphs, copies)
+        n_edges = sum(len(edges) for _, edges in grew_graph.values())
+        timing = best_time(grew_graph, args.language, args.repeat) * 1000
+
+        print(
+            f"{copies:>8} {len(grew_graph):>8} {n_edges:>8} {timing:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import logging
+import timeit
+from argparse import ArgumentParser, Namespace
+
+from ud_boxer.sbn import SBNGraph
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+
+# A single 'box' worth of (flat) SBN, repeated to create long documents. The
+# indices are relative, so the repeated blocks stay valid.
+SBN_BLOCK = (
+    'male.n.02 Name "Tom Miller" see.v.01 Experiencer -1 Time +1 Stimulus +2 '
+    "time.n.08 TPR now note.n.01 NEGATION -1"
+)
+
+
+def get_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "-b",
+        "--boxes",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100, 1000],
+        help="Number of boxes of the generated documents.",
+    )
+    parser.add_argument(
+        "-n",
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of times to parse each document, the best run is used.",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    print(f"{'boxes':>8} {'tokens':>8} {'flat (ms)':>12} {'lines (ms)':>12}")
+    for n_boxes in args.boxes:
+        flat = " ".join([SBN_BLOCK] * n_boxes)
+        # The multi-line variant, as found in the PMB.
+        lines = SBNGraph().from_string(flat).to_sbn_string(add_comments=True)
+
+        timings = [
+            min(
+                timeit.repeat(
+                    lambda: SBNGraph().from_string(doc),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            * 1000
+            for doc in (flat, lines)
+        ]
+
+        print(
+            f"{n_boxes:>8} {len(flat.split()):>8} "
+            f"{timings[0]:>12.2f} {timings[1]:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import logging
+from argparse import ArgumentParser, Namespace
+
+from ud_boxer.config import Config
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+
+LOOKUP_VARIANTS = ["gold", "gold_silver"]
+
+
+def get_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "-l",
+        "--languages",
+        nargs="+",
+        default=Config.SUPPORTED_LANGUAGES.all_values(),
+        choices=Config.SUPPORTED_LANGUAGES.all_values(),
+        type=str,
+        help="Languages to compile the lemma lookups of.",
+    )
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        default=LOOKUP_VARIANTS,
+        choices=LOOKUP_VARIANTS,
+        type=str,
+        help="Lookup variants to compile.",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    # Loading a lookup compiles it when needed, so start the inference
+    # workers after this to have them share the compiled files right away.
+    for language in args.languages:
+        for variant in args.variants:
+            for lookup in (
+                Config.get_lemma_sense(language, variant),
+                Config.get_lemma_pos_sense(language, variant),
+            ):
+                print(f"{lookup.path} ({len(lookup)} entries)")
+                lookup.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import logging
+from argparse import ArgumentParser, Namespace
+
+import pandas as pd
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from ud_boxer.config import Config
+from ud_boxer.grew_rewrite import Grew
+from ud_boxer.helpers import PMB
+from ud_boxer.sbn_spec import get_doc_id
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+
+
+def get_args() -> Namespace:
+    parser = ArgumentParser()
+
+    parser.add_argument(
+        "-p",
+        "--starting_path",
+        type=str,
+        required=True,
+        help="Path to start recursively search for UD files.",
+    )
+    parser.add_argument(
+        "-l",
+        "--language",
+        default=Config.SUPPORTED_LANGUAGES.EN.value,
+        choices=Config.SUPPORTED_LANGUAGES.all_values(),
+        type=str,
+        help="Language of the grs rules to profile.",
+    )
+    parser.add_argument(
+        "--ud_system",
+        default=Config.UD_SYSTEM.STANZA.value,
+        type=str,
+        choices=Config.UD_SYSTEM.all_values(),
+        help="UD system of the parses to rewrite.",
+    )
+    parser.add_argument(
+        "--data_split",
+        default=Config.DATA_SPLIT.DEV.value,
+        choices=Config.DATA_SPLIT.all_values(),
+        type=str,
+        help="Data split to profile the rules on.",
+    )
+    parser.add_argument(
+        "--strat",
+        default="main",
+        type=str,
+        help="Strategy to profile.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_csv",
+        default="grs_profile.csv",
+        type=str,
+        help="CSV file to store the statistics per rule per document in.",
+    )
+    parser.add_argument(
+        "-n",
+        "--top_n",
+        default=10,
+        type=int,
+        help="Number of most expensive rules to show.",
+    )
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+
+    grew = Grew(language=args.language)
+    pmb = PMB(args.data_split, args.language)
+
+    records = []
+    for ud_filepath in pmb.generator(
+        args.starting_path,
+        f"**/{args.language}.ud.{args.ud_system}.conll",
+        desc_tqdm="Profiling rules",
+    ):
+        try:
+            _, stats = grew.profile(ud_filepath, args.strat)
+        except Exception as e:
+            logger.error(f"Cannot profile {ud_filepath} reason: {e}")
+            continue
+
+        pmb_id = get_doc_id(args.language, ud_filepath)
+        records.extend((pmb_id, *rule_stats) for rule_stats in stats)
+
+    df = pd.DataFrame(
+        records, columns=["pmb_id", "rule", "seconds", "firings"]
+    )
+    df.to_csv(args.output_csv, index=False)
+
+    summary = df.groupby("rule").agg(
+        total_seconds=("seconds", "sum"),
+        mean_ms=("seconds", lambda seconds: seconds.mean() * 1000),
+        max_ms=("seconds", lambda seconds: seconds.max() * 1000),
+        firings=("firings", "sum"),
+        docs_fired=("firings", lambda firings: (firings > 0).sum()),
+    )
+    summary["time_share"] = summary["total_seconds"] / df["seconds"].sum()
+    summary = summary.sort_values("total_seconds", ascending=False)
+
+    print(
+        f"Profiled {df['pmb_id'].nunique()} documents, "
+        f"{df['seconds'].sum():.2f}s in total\n"
+    )
+    print(summary.head(args.top_n).to_string(float_format="{:.3f}".format))
+
+
+if __name__ == "__main__":
+    with logging_redirect_tqdm():
+        main()
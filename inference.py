@@ -5,7 +5,9 @@ from pathlib import Path
 from tqdm.contrib.logging import logging_redirect_tqdm
 
 from ud_boxer.config import Config
+from ud_boxer.grew_cache import GrewCache
 from ud_boxer.grew_rewrite import Grew
+from ud_boxer.helpers import check_edge_clf_arg
 from ud_boxer.ud import UDGraph, UDParser
 
 logging.basicConfig(level=logging.ERROR)
@@ -48,6 +50,34 @@ def get_args() -> Namespace:
         help="Output directory to store results in, will be created if it "
         "does not exist.",
     )
+    parser.add_argument(
+        "--grew_cache",
+        nargs="?",
+        const=str(Config.GREW_CACHE_PATH),
+        type=str,
+        help="Cache the grew rewrites in this SQLite file, documents that did "
+        "not change since a previous run are not rewritten again. Without a "
+        "path the default cache in the data directory is used.",
+    )
+    parser.add_argument(
+        "--grew_workers",
+        default=1,
+        type=int,
+        help="Number of grew worker processes used to rewrite the sentences "
+        "of a multi-sentence document in parallel.",
+    )
+    parser.add_argument(
+        "--edge_clf",
+        action="store_true",
+        help="Label the edges that the grs rules leave unresolved with the "
+        "edge classifier instead of the edge mappings.",
+    )
+    parser.add_argument(
+        "--native_rewrite",
+        action="store_true",
+        help="Apply the grs rules with the python rewriter instead of grew, "
+        "grew is still used if the rules cannot be expressed natively.",
+    )
 
     # Main options
     parser.add_argument(
@@ -66,7 +96,10 @@ def get_args() -> Namespace:
         help="Store graphviz dot strings used for the visualization in "
         "'output_dir'.",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    check_edge_clf_arg(parser, args)
+
+    return args
 
 
 def main():
@@ -75,8 +108,6 @@ def main():
     if not args.sentence and not args.ud:
         raise ValueError("Please provide either a sentence or UD conll file.")
 
-    grew = Grew(language=args.language)
-
     output_dir = Path(args.output_dir).resolve()
     output_dir.mkdir(exist_ok=True)
 
@@ -85,15 +116,23 @@ def main():
         ud_filepath = Path(
             output_dir / f"{args.language}.ud.{args.ud_system}.conll"
         )
-        parser.parse(args.sentence, ud_filepath)
+        conll_str, ud_graph = parser.parse_in_memory(args.sentence)
+        ud_filepath.write_text(conll_str)
     elif args.ud:
-        ud_filepath = Path(args.ud).resolve()
-
-    res = grew.run(ud_filepath)
+        conll_str = Path(args.ud).resolve().read_text()
+        ud_graph = UDGraph().from_string(conll_str)
+
+    grew_cache = GrewCache(args.grew_cache) if args.grew_cache else None
+    with Grew(
+        language=args.language,
+        cache=grew_cache,
+        native=args.native_rewrite,
+        workers=args.grew_workers,
+        edge_clf=args.edge_clf,
+    ) as grew:
+        res = grew.run_conll_str(conll_str)
     res.to_sbn(output_dir / f"{args.language}.drs.sbn")
 
-    ud_graph = UDGraph().from_path(ud_filepath)
-
     if args.store_visualizations:
         ud_graph.to_png(
             output_dir / f"{args.language}.ud.{args.ud_system}.png"
@@ -4,15 +4,18 @@ from argparse import ArgumentParser, Namespace
 from datetime import datetime
 from pathlib import Path
 
+from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
 from ud_boxer.config import Config
+from ud_boxer.grew_cache import GrewCache
 from ud_boxer.grew_rewrite import Grew
 from ud_boxer.helpers import PMB, pmb_generator
 from ud_boxer.mapper import MapExtractor
 from ud_boxer.sbn import SBNError, SBNGraph, sbn_graphs_are_isomorphic
 from ud_boxer.sbn_spec import get_doc_id
 from ud_boxer.ud import UDGraph, UDParser
+from ud_boxer.ud_cache import UDCache
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
@@ -51,6 +54,33 @@ def get_args() -> Namespace:
         default="data/output",
         help="Path to save output files to.",
     )
+    parser.add_argument(
+        "--grew_cache",
+        nargs="?",
+        const=str(Config.GREW_CACHE_PATH),
+        type=str,
+        help="Cache the grew rewrites of --extract_mappings in this SQLite "
+        "file, documents that did not change since a previous run are not "
+        "rewritten again. Without a path the default cache in the data "
+        "directory is used.",
+    )
+    parser.add_argument(
+        "--ud_cache",
+        nargs="?",
+        const=str(Config.UD_CACHE_PATH),
+        type=str,
+        help="Cache the UD parses of --store_ud_parses in this SQLite file, "
+        "raw files that were parsed before with the same UD system, language "
+        "and models are not parsed again. Without a path the default cache "
+        "in the data directory is used.",
+    )
+    parser.add_argument(
+        "--ud_batch_size",
+        type=int,
+        default=32,
+        help="Number of documents per UD pipeline call of --store_ud_parses, "
+        "the documents are grouped by length.",
+    )
 
     # Main options
     parser.add_argument(
@@ -89,18 +119,47 @@ def get_args() -> Namespace:
 
 
 def store_ud_parses(args):
-    parser = UDParser(system=args.ud_system, language=args.language)
+    ud_cache = UDCache(args.ud_cache) if args.ud_cache else None
+    parser = UDParser(
+        system=args.ud_system, language=args.language, cache=ud_cache
+    )
     ud_file_format = f"{args.language}.ud.{args.ud_system}.conll"
 
-    for filepath in pmb_generator(
-        args.starting_path, "**/*.raw", desc_tqdm="Storing UD parses "
+    filepaths = list(
+        pmb_generator(args.starting_path, "**/*.raw", disable_tqdm=True)
+    )
+    # Parse a chunk of documents at a time, so an error in a single document
+    # only sends the documents of its chunk through the parser one by one.
+    chunk_size = args.ud_batch_size * 16
+    for start in tqdm(
+        range(0, len(filepaths), chunk_size),
+        desc="Storing UD parses ",
+        unit="chunk",
     ):
+        chunk = filepaths[start : start + chunk_size]
         try:
-            parser.parse_path(filepath, filepath.parent / ud_file_format)
-        except Exception as e:
-            logger.error(
-                f"Unable to generate ud for {filepath}\nReason: {e}\n"
+            conll_strs = parser.parse_many(
+                [filepath.read_text() for filepath in chunk],
+                batch_size=args.ud_batch_size,
             )
+        except Exception:
+            conll_strs = [None] * len(chunk)
+
+        for filepath, conll_str in zip(chunk, conll_strs):
+            ud_filepath = filepath.parent / ud_file_format
+            try:
+                if conll_str is None:
+                    parser.parse_path(filepath, ud_filepath)
+                # Leave the parses that did not change untouched.
+                elif (
+                    not ud_filepath.exists()
+                    or ud_filepath.read_text() != conll_str
+                ):
+                    ud_filepath.write_text(conll_str)
+            except Exception as e:
+                logger.error(
+                    f"Unable to generate ud for {filepath}\nReason: {e}\n"
+                )
 
 
 def search_dataset(args):
@@ -122,7 +181,8 @@ def search_dataset(args):
 
 def extract_mappings(args):
     extractor = MapExtractor()
-    grew = Grew(language=args.language)
+    grew_cache = GrewCache(args.grew_cache) if args.grew_cache else None
+    grew = Grew(language=args.language, cache=grew_cache)
     pmb = PMB(Config.DATA_SPLIT.TRAIN, args.language)
 
     for filepath in pmb.generator(
@@ -238,11 +298,13 @@ def store_penman(args):
     ):
         try:
             G = SBNGraph().from_path(filepath)
-            G.to_penman(filepath.parent / f"{filepath.stem}.penman")
-            G.to_penman(
-                filepath.parent / f"{filepath.stem}.lenient.penman",
-                evaluate_sense=False,
+            penman_str, penman_lenient_str = G.to_penman_variants()
+            Path(filepath.parent / f"{filepath.stem}.penman").write_text(
+                penman_str
             )
+            Path(
+                filepath.parent / f"{filepath.stem}.lenient.penman"
+            ).write_text(penman_lenient_str)
         except SBNError as e:
             logger.warning(e)
 
@@ -9,11 +9,24 @@ from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
 from ud_boxer.config import Config
-from ud_boxer.grew_rewrite import Grew
-from ud_boxer.helpers import PMB, create_record, smatch_score
+from ud_boxer.grew_cache import GrewCache
+from ud_boxer.grew_rewrite import GrewPool
+from ud_boxer.grs import (
+    RuleHitIndex,
+    conll_features,
+    grs_rule_hashes,
+    grs_rules,
+)
+from ud_boxer.helpers import (
+    PMB,
+    aggregate_smatch_counts,
+    check_edge_clf_arg,
+    create_record,
+)
 from ud_boxer.misc import ensure_ext
 from ud_boxer.sbn import SBNSource
-from ud_boxer.sbn_spec import get_doc_id
+from ud_boxer.sbn_spec import SBNError, get_doc_id
+from ud_boxer.scorer import SMATCH_BACKEND, SmatchScorer
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
@@ -68,9 +81,71 @@ def get_args() -> Namespace:
         "-w",
         "--max_workers",
         default=16,
-        help="Max concurrent workers used to run inference with. Be careful "
-        "with setting this too high since mtool might error (segfault) if hit "
-        "too hard by too many concurrent tasks.",
+        help="Max concurrent threads used to export and score the rewritten "
+        "graphs, the scoring itself is done by the scorer workers.",
+    )
+    parser.add_argument(
+        "--grew_workers",
+        type=int,
+        help="Number of grew worker processes used to rewrite the UD parses, "
+        "defaults to the number of cores.",
+    )
+    parser.add_argument(
+        "--scorer_workers",
+        default=4,
+        type=int,
+        help="Number of long-lived smatch scorer processes.",
+    )
+    parser.add_argument(
+        "--smatch_backend",
+        default=SMATCH_BACKEND.MTOOL.value,
+        choices=SMATCH_BACKEND.all_values(),
+        type=str,
+        help="SMATCH implementation the scorer workers run. The native "
+        "implementation is faster but not validated against mtool yet.",
+    )
+    parser.add_argument(
+        "--batch_smatch",
+        action="store_true",
+        help="Score the whole split in one go after running inference, this "
+        "also reports the micro and macro averaged scores.",
+    )
+    parser.add_argument(
+        "--grew_cache",
+        nargs="?",
+        const=str(Config.GREW_CACHE_PATH),
+        type=str,
+        help="Cache the grew rewrites in this SQLite file, documents that did "
+        "not change since a previous run are not rewritten again. Without a "
+        "path the default cache in the data directory is used.",
+    )
+    parser.add_argument(
+        "--edge_clf",
+        action="store_true",
+        help="Label the edges that the grs rules leave unresolved with the "
+        "edge classifier instead of the edge mappings.",
+    )
+    parser.add_argument(
+        "--native_rewrite",
+        action="store_true",
+        help="Apply the grs rules with the python rewriter instead of grew, "
+        "grew is still used if the rules cannot be expressed natively.",
+    )
+    parser.add_argument(
+        "--rule_hits",
+        action="store_true",
+        help="Record which grs rules fired per document, next to the "
+        "results file. The rules are applied one at a time for this, which "
+        "is slower than a normal run.",
+    )
+    parser.add_argument(
+        "--rerun_changed",
+        action="store_true",
+        help="Only rewrite and score the documents that could be affected "
+        "by the grs changes since the previous run with --rule_hits, the "
+        "new scores are merged into the previous results file. The rule "
+        "hits come from applying the rules one at a time, so this relies on "
+        "that firing the same rules as grew's own strategy.",
     )
 
     # Main options
@@ -90,10 +165,17 @@ def get_args() -> Namespace:
         action="store_true",
         help="Store SBN of prediction in 'predicted' directory.",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    check_edge_clf_arg(parser, args)
+
+    return args
 
 
-def generate_result(args, ud_filepath):
+def generate_result(args, ud_filepath, G):
+    # Rewrite errors are yielded by the grew pool instead of raised there.
+    if isinstance(G, SBNError):
+        raise G
+
     current_dir = ud_filepath.parent
 
     pred_dir = current_dir / "predicted"
@@ -104,7 +186,6 @@ def generate_result(args, ud_filepath):
             if item.is_file():
                 item.unlink()
 
-    G = GREW.run(ud_filepath)
     G.source = args.sbn_source  # Setter?
     if args.store_visualizations:
         G.to_png(pred_dir / "output.png")
@@ -112,87 +193,304 @@ def generate_result(args, ud_filepath):
     if args.store_sbn:
         G.to_sbn(pred_dir / "output.sbn")
 
-    penman_path = G.to_penman(pred_dir / "output.penman")
-    scores = smatch_score(
-        current_dir / f"{args.language}.drs.penman",
-        penman_path,
-    )
-    penman_lenient_path = G.to_penman(
-        pred_dir / "output.lenient.penman",
-        evaluate_sense=False,
-    )
-    lenient_scores = smatch_score(
-        current_dir / f"{args.language}.drs.lenient.penman",
-        penman_lenient_path,
-    )
-    return scores, lenient_scores, G.to_sbn_string()
+    # Both variants come from a single traversal. The output is checked by
+    # the scorer anyway, no need to validate it twice.
+    penman_str, penman_lenient_str = G.to_penman_variants(validate=False)
+
+    (pred_dir / "output.penman").write_text(penman_str)
+    (pred_dir / "output.lenient.penman").write_text(penman_lenient_str)
 
+    return penman_str, penman_lenient_str, G.to_sbn_string()
 
-def full_run(args, ud_filepath):
-    raw_sent = (
+
+def read_raw_sent(args, ud_filepath):
+    return (
         Path(ud_filepath.parent / f"{args.language}.raw").read_text().rstrip()
     )
 
-    sbn, error = None, None
-    scores, lenient_scores = dict(), dict()
+
+def read_gold(args, ud_filepath):
+    current_dir = ud_filepath.parent
+    return (
+        (current_dir / f"{args.language}.drs.penman").read_text(),
+        (current_dir / f"{args.language}.drs.lenient.penman").read_text(),
+    )
+
+
+def full_run(args, ud_filepath, G, scorer):
+    pmb_id = get_doc_id(args.language, ud_filepath)
+    raw_sent = read_raw_sent(args, ud_filepath)
+    penman_str, penman_lenient_str, sbn = export_result(args, ud_filepath, G)
 
     try:
-        scores, lenient_scores, sbn = generate_result(args, ud_filepath)
+        gold_penman, gold_lenient_penman = read_gold(args, ud_filepath)
+        strict = score_docs(scorer, [(pmb_id, gold_penman, penman_str)])
+        lenient = score_docs(
+            scorer, [(pmb_id, gold_lenient_penman, penman_lenient_str)]
+        )
+        scores, lenient_scores = strict[pmb_id], lenient[pmb_id]
     except Exception as e:
-        error = str(e)
-        logger.error(f"{ud_filepath}: {error}")
+        logger.error(f"{ud_filepath}: {e}")
+        scores, lenient_scores = {"error": str(e)}, {"error": str(e)}
 
-    # TODO: fix this with the new explicit strict/lenient names
     record = create_record(
-        pmb_id=get_doc_id(args.language, ud_filepath),
+        pmb_id=pmb_id,
         raw_sent=raw_sent,
         sbn_source=args.sbn_source,
         sbn=sbn,
-        error=error,
-        scores=scores,
+        strict_error=scores.pop("error"),
+        lenient_error=lenient_scores.pop("error"),
+        strict_scores=scores,
         lenient_scores=lenient_scores,
     )
     return record
 
 
+def score_docs(scorer, docs):
+    """
+    Score (pmb_id, gold, test) documents, the scores per pmb_id also have
+    the triple counts ('match', 'test' and 'gold') of the document. These
+    are stored in the results, so the split scores can be computed again
+    from the results file, see 'overall_scores_from_df'.
+    """
+    doc_counts = scorer.corpus_counts(docs)
+    doc_scores, _ = aggregate_smatch_counts(doc_counts)
+    for pmb_id, (match, test, gold), _ in doc_counts:
+        doc_scores[pmb_id].update(match=match, test=test, gold=gold)
+    return doc_scores
+
+
+def overall_scores_from_df(df):
+    """
+    The micro and macro scores (strict and lenient) of the documents in the
+    results, from their triple counts. Documents without counts (no gold
+    files) are not part of the scores, like in 'batch_run'.
+    """
+    overall_scores = []
+    for suffix in ("", "_lenient"):
+        columns = [f"{key}{suffix}" for key in ("match", "test", "gold")]
+        if any(column not in df for column in columns):
+            return None
+
+        scored = df[df[columns].notnull().all(axis=1)]
+        errors = scored[f"{'lenient' if suffix else 'strict'}_error"]
+        _, overall = aggregate_smatch_counts(
+            (
+                pmb_id,
+                tuple(int(count) for count in counts),
+                None if pd.isnull(error) else error,
+            )
+            for pmb_id, counts, error in zip(
+                scored["pmb_id"], scored[columns].values, errors
+            )
+        )
+        overall_scores.append(overall)
+    return tuple(overall_scores)
+
+
+def export_result(args, ud_filepath, G):
+    """
+    Export the result without scoring, a failed document gets the SBNError
+    in place of its output so it can still be scored (and recorded) as such.
+    """
+    try:
+        return generate_result(args, ud_filepath, G)
+    except Exception as e:
+        logger.error(f"{ud_filepath}: {e}")
+        error = e if isinstance(e, SBNError) else SBNError(str(e))
+        return error, error, None
+
+
+def record_rule_hits(args, profiled, rule_index):
+    """Add the rules that fired to the index and pass the graphs on"""
+    for ud_filepath, G, stats in profiled:
+        pmb_id = get_doc_id(args.language, ud_filepath)
+        if isinstance(G, SBNError):
+            # Documents that are not indexed are rerun after any change.
+            rule_index.hits.pop(pmb_id, None)
+        else:
+            rule_index.add(
+                pmb_id, (rule for rule, _, firings in stats if firings)
+            )
+        yield ud_filepath, G
+
+
+def batch_run(args, rewritten, scorer):
+    """
+    Run inference for all documents first and score the split with a single
+    call to the scorer per variant, the scores are mapped back by pmb_id.
+    """
+    ud_filepaths, results = [], []
+    for ud_filepath, G in tqdm(rewritten, desc="Running inference"):
+        ud_filepaths.append(ud_filepath)
+        results.append(export_result(args, ud_filepath, G))
+
+    pmb_ids = [get_doc_id(args.language, p) for p in ud_filepaths]
+    # Documents without (readable) gold files cannot be scored, they only
+    # get an error record, like in 'full_run'.
+    golds, gold_errors = dict(), dict()
+    for pmb_id, ud_filepath in zip(pmb_ids, ud_filepaths):
+        try:
+            golds[pmb_id] = read_gold(args, ud_filepath)
+        except Exception as e:
+            gold_errors[pmb_id] = str(e)
+            logger.error(f"{ud_filepath}: {gold_errors[pmb_id]}")
+
+    strict_scores = score_docs(
+        scorer,
+        (
+            (pmb_id, golds[pmb_id][0], penman_str)
+            for pmb_id, (penman_str, _, _) in zip(pmb_ids, results)
+            if pmb_id in golds
+        ),
+    )
+    lenient_scores = score_docs(
+        scorer,
+        (
+            (pmb_id, golds[pmb_id][1], penman_lenient_str)
+            for pmb_id, (_, penman_lenient_str, _) in zip(pmb_ids, results)
+            if pmb_id in golds
+        ),
+    )
+
+    records = []
+    for pmb_id, ud_filepath, (_, _, sbn) in zip(
+        pmb_ids, ud_filepaths, results
+    ):
+        if pmb_id in gold_errors:
+            strict = {"error": gold_errors[pmb_id]}
+            lenient = {"error": gold_errors[pmb_id]}
+        else:
+            strict, lenient = strict_scores[pmb_id], lenient_scores[pmb_id]
+        records.append(
+            create_record(
+                pmb_id=pmb_id,
+                raw_sent=read_raw_sent(args, ud_filepath),
+                sbn_source=args.sbn_source,
+                sbn=sbn,
+                strict_error=strict.pop("error"),
+                lenient_error=lenient.pop("error"),
+                strict_scores=strict,
+                lenient_scores=lenient,
+            )
+        )
+
+    return records
+
+
 def main():
     args = get_args()
 
-    # I know, I know...
-    global GREW
-    GREW = Grew(language=args.language)
-
     ud_file_format = f"{args.language}.ud.{args.ud_system}.conll"
     pmb = PMB(args.data_split, args.language)
 
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=args.max_workers
-    ) as executor:
-        futures = []
-        for filepath in pmb.generator(
-            args.starting_path,
-            f"**/{args.language}.drs.penman",
-            desc_tqdm="Gathering data",
-        ):
-            ud_filepath = filepath.parent / ud_file_format
-            if not ud_filepath.exists():
-                continue
-            futures.append(executor.submit(full_run, args, ud_filepath))
-
-        result_records = [
-            res.result()
-            for res in tqdm(
-                concurrent.futures.as_completed(futures),
-                desc="Running inference",
-            )
-        ]
+    ud_filepaths = []
+    for filepath in pmb.generator(
+        args.starting_path,
+        f"**/{args.language}.drs.penman",
+        desc_tqdm="Gathering data",
+    ):
+        ud_filepath = filepath.parent / ud_file_format
+        if ud_filepath.exists():
+            ud_filepaths.append(ud_filepath)
 
     result_path = Config.get_result_dir(args.language, args.data_split)
+    if args.results_file:
+        final_path = result_path / ensure_ext(args.results_file, ".csv").name
+        rule_hits_path = final_path.with_suffix(".rule_hits.json")
+    elif args.rule_hits or args.rerun_changed:
+        raise ValueError("Rule hits are stored next to the --results_file.")
+
+    rule_index, previous_df = None, None
+    if args.rule_hits or args.rerun_changed:
+        rules = grs_rules(Config.GRS_PATH, args.language)
+    if args.rerun_changed:
+        previous_df = pd.read_csv(final_path)
+        if "match" not in previous_df:
+            logger.warning(
+                f"{final_path} has no triple counts, the micro and macro "
+                "scores need a full run first."
+            )
+        rule_index = RuleHitIndex.from_path(rule_hits_path)
+        affected = rule_index.affected_docs(
+            rules,
+            {
+                get_doc_id(args.language, p): conll_features(p.read_text())
+                for p in ud_filepaths
+            },
+        )
+        ud_filepaths = [
+            p
+            for p in ud_filepaths
+            if get_doc_id(args.language, p) in affected
+        ]
+    elif args.rule_hits:
+        rule_index = RuleHitIndex(grs_rule_hashes(rules))
+
+    grew_cache = GrewCache(args.grew_cache) if args.grew_cache else None
+
+    with GrewPool(
+        args.language,
+        workers=args.grew_workers,
+        cache=grew_cache,
+        native=args.native_rewrite,
+        edge_clf=args.edge_clf,
+    ) as grew_pool, SmatchScorer(
+        workers=args.scorer_workers,
+        backend=SMATCH_BACKEND(args.smatch_backend),
+    ) as scorer:
+        # The rewriting happens in the grew worker processes, the documents
+        # are exported and scored as soon as they come back.
+        if rule_index is not None:
+            rewritten = record_rule_hits(
+                args,
+                grew_pool.imap_profile(ud_filepaths, ordered=False),
+                rule_index,
+            )
+        else:
+            rewritten = grew_pool.imap(ud_filepaths, ordered=False)
+        if args.batch_smatch:
+            result_records = batch_run(args, rewritten, scorer)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=args.max_workers
+            ) as executor:
+                futures = [
+                    executor.submit(full_run, args, ud_filepath, G, scorer)
+                    for ud_filepath, G in rewritten
+                ]
+                result_records = [
+                    res.result()
+                    for res in tqdm(
+                        concurrent.futures.as_completed(futures),
+                        desc="Running inference",
+                    )
+                ]
 
     df = pd.DataFrame().from_records(result_records)
+    if previous_df is not None:
+        df = pd.concat(
+            [
+                previous_df[
+                    ~previous_df["pmb_id"].isin(
+                        [record["pmb_id"] for record in result_records]
+                    )
+                ],
+                df,
+            ],
+            ignore_index=True,
+        )
+
+    # Computed from the stored triple counts, so the scores of a rerun cover
+    # the previous results as well.
+    overall_scores = None
+    if previous_df is None or "match" in previous_df:
+        overall_scores = overall_scores_from_df(df)
     if args.results_file:
-        final_path = result_path / ensure_ext(args.results_file, ".csv").name
         df.to_csv(final_path, index=False)
+    if rule_index is not None:
+        rule_index.rule_hashes = grs_rule_hashes(rules)
+        rule_index.to_path(rule_hits_path)
 
     df["f1"] = df["f1"].fillna(0)
     df["f1_lenient"] = df["f1_lenient"].fillna(0)
@@ -204,13 +502,22 @@ def main():
     ARGS: {args}
 
     DATA SPLIT:           {args.data_split}
-    PARSED DOCS:          {len(df[df['error'].isnull()])}
-    FAILED DOCS:          {len(df[df['error'].notnull()])}
+    PARSED DOCS:          {len(df[df['lenient_error'].isnull()])}
+    FAILED DOCS:          {len(df[df['lenient_error'].notnull()])}
     TOTAL DOCS:           {len(df)}
+    REWRITTEN DOCS:       {len(result_records)}
 
     AVERAGE F1 (strict):  {df["f1"].mean():.3} ({df["f1"].min():.3} - {df["f1"].max():.3})
     AVERAGE F1 (lenient): {df["f1_lenient"].mean():.3} ({df["f1_lenient"].min():.3} - {df["f1_lenient"].max():.3})
     """
+    if overall_scores:
+        strict_overall, lenient_overall = overall_scores
+        overall_result_msg += f"""
+    MICRO F1 (strict):    {strict_overall["micro_f1"]:.3}
+    MICRO F1 (lenient):   {lenient_overall["micro_f1"]:.3}
+    MACRO F1 (strict):    {strict_overall["macro_f1"]:.3}
+    MACRO F1 (lenient):   {lenient_overall["macro_f1"]:.3}
+    """
 
     with open(result_path / "overall.txt", "a") as f:
         f.write(f"{overall_result_msg}\n\n")
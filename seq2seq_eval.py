@@ -1,23 +1,31 @@
 import concurrent.futures
 import logging
-import tempfile
 from argparse import ArgumentParser, Namespace
 from datetime import datetime
 from pathlib import Path
+from typing import Tuple, Union
 
 import pandas as pd
 from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
 from ud_boxer.config import Config
-from ud_boxer.helpers import PMB, create_record, smatch_score
+from ud_boxer.helpers import (
+    PMB,
+    aggregate_smatch_counts,
+    create_record,
+    iter_sbn_corpus,
+)
 from ud_boxer.misc import ensure_ext
-from ud_boxer.sbn import SBNGraph, SBNSource
+from ud_boxer.sbn import SBNSource
 from ud_boxer.sbn_spec import SBNError, get_base_id, get_doc_id
+from ud_boxer.scorer import SMATCH_BACKEND, SmatchScorer
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+PENMAN_OR_ERROR = Union[str, SBNError]
+
 
 def get_args() -> Namespace:
     parser = ArgumentParser()
@@ -66,36 +74,86 @@ def get_args() -> Namespace:
         "-w",
         "--max_workers",
         default=16,
-        help="Max concurrent workers used to run inference with. Be careful "
-        "with setting this too high since mtool might error (segfault) if hit "
-        "too hard by too many concurrent tasks.",
+        help="Max concurrent threads used to run inference with, the scoring "
+        "itself is done by the scorer workers.",
+    )
+    parser.add_argument(
+        "--scorer_workers",
+        default=4,
+        type=int,
+        help="Number of long-lived smatch scorer processes.",
+    )
+    parser.add_argument(
+        "--smatch_backend",
+        default=SMATCH_BACKEND.MTOOL.value,
+        choices=SMATCH_BACKEND.all_values(),
+        type=str,
+        help="SMATCH implementation the scorer workers run. The native "
+        "implementation is faster but not validated against mtool yet.",
+    )
+    parser.add_argument(
+        "--batch_smatch",
+        action="store_true",
+        help="Score the whole split in one go after exporting all graphs, "
+        "this also reports the micro and macro averaged scores.",
+    )
+    parser.add_argument(
+        "--parse_workers",
+        type=int,
+        help="Number of processes used to parse the seq2seq output, defaults "
+        "to the number of cores.",
     )
     return parser.parse_args()
 
 
-def generate_result(args, sbn_line, gold_path):
+def export_penman(G) -> Tuple[PENMAN_OR_ERROR, PENMAN_OR_ERROR]:
+    """
+    Get the strict and lenient Penman output of G, or the SBNError that
+    prevented them from being created.
+    """
+    # Parse errors are yielded by the corpus loader instead of raised there.
+    if isinstance(G, SBNError):
+        return G, G
+
+    # Strict and lenient output are the same, unless the graph is possibly
+    # ill-formed. Only export it again when the strict one fails. The output
+    # is checked by the scorer anyway, no need to validate it twice.
+    try:
+        penman_str, _ = G.to_penman_variants(validate=False)
+        return penman_str, penman_str
+    except SBNError as e_strict:
+        try:
+            penman_str, _ = G.to_penman_variants(strict=False, validate=False)
+            return e_strict, penman_str
+        except SBNError as e:
+            return e_strict, e
+
+
+def generate_result(args, G, gold_path, scorer):
     # current_dir = gold_path.parent
 
-    G = SBNGraph(source=args.sbn_source).from_string(sbn_line)
+    # Parse errors are yielded by the corpus loader instead of raised there.
+    if isinstance(G, SBNError):
+        raise G
+
     lenient_err, strict_err = None, None
+    strict_scores, lenient_scores = dict(), dict()
 
-    with tempfile.NamedTemporaryFile("w") as f:
-        try:
-            strict_scores = smatch_score(gold_path, G.to_penman(f.name))
-        except SBNError as e_strict:
-            strict_scores = dict()
-            strict_err = str(e_strict)
+    gold_penman = gold_path.read_text()
+    strict_penman, lenient_penman = export_penman(G)
+    try:
+        if isinstance(strict_penman, SBNError):
+            raise strict_penman
+        strict_scores = scorer.score(gold_penman, strict_penman)
+        lenient_scores = strict_scores
+    except SBNError as e_strict:
+        strict_err = str(e_strict)
         try:
-            lenient_scores = smatch_score(
-                gold_path, G.to_penman(f.name, strict=False)
-            )
+            if isinstance(lenient_penman, SBNError):
+                raise lenient_penman
+            lenient_scores = scorer.score(gold_penman, lenient_penman)
         except SBNError as e:
-            lenient_scores = dict()
             lenient_err = str(e)
-        # lenient_scores = smatch_score(
-        # current_dir / f"{args.language}.drs.lenient.penman",
-        # G.to_penman(f.name, evaluate_sense=False),
-        # )
 
     return (
         strict_scores,
@@ -106,7 +164,7 @@ def generate_result(args, sbn_line, gold_path):
     )
 
 
-def full_run(args, sbn_line, filepath):
+def full_run(args, G, filepath, scorer):
     raw_sent = (
         Path(filepath.parent / f"{args.language}.raw").read_text().rstrip()
     )
@@ -120,7 +178,7 @@ def full_run(args, sbn_line, filepath):
             sbn,
             lenient_error,
             strict_error,
-        ) = generate_result(args, sbn_line, filepath)
+        ) = generate_result(args, G, filepath, scorer)
     except Exception as e:
         logger.error(e)
 
@@ -137,41 +195,111 @@ def full_run(args, sbn_line, filepath):
     return record
 
 
-def main():
-    args = get_args()
+def iter_gold_corpus(args, gold_paths):
+    """Yield the parsed seq2seq output together with its gold file"""
+    # The SBN is parsed across processes, the threads only wait on the scorer.
+    for base_id, G in iter_sbn_corpus(
+        args.input_file,
+        workers=args.parse_workers,
+        source=args.sbn_source,
+    ):
+        if filepath := gold_paths.pop(base_id, None):
+            yield G, filepath
+
+    for base_id in gold_paths:
+        logger.error(f"No seq2seq output found for {base_id}")
+
+
+def batch_run(args, corpus, scorer):
+    """
+    Export all graphs first and score the split with a single call to the
+    scorer, the scores are mapped back to the documents by pmb_id.
+    """
+    docs = []
+    for G, filepath in tqdm(corpus, desc="Exporting graphs"):
+        pmb_id = get_doc_id(args.language, filepath)
+        docs.append((pmb_id, G, filepath, *export_penman(G)))
+
+    gold = {pmb_id: filepath.read_text() for pmb_id, _, filepath, *_ in docs}
+    strict_counts = scorer.corpus_counts(
+        (pmb_id, gold[pmb_id], strict) for pmb_id, _, _, strict, _ in docs
+    )
 
-    dataset = {
-        k: v
-        for k, v in [
-            item.split(",")
-            for item in Path(args.input_file).read_text().split("\n")
-        ]
+    # The lenient output only differs from the strict one when that failed.
+    strict_failed = {pmb_id for pmb_id, _, error in strict_counts if error}
+    lenient_retried = {
+        counts[0]: counts
+        for counts in scorer.corpus_counts(
+            (pmb_id, gold[pmb_id], lenient)
+            for pmb_id, _, _, _, lenient in docs
+            if pmb_id in strict_failed
+        )
     }
+    lenient_counts = [
+        lenient_retried.get(counts[0], counts) for counts in strict_counts
+    ]
+
+    strict_scores, strict_overall = aggregate_smatch_counts(strict_counts)
+    lenient_scores, lenient_overall = aggregate_smatch_counts(lenient_counts)
+
+    records = []
+    for pmb_id, G, filepath, *_ in docs:
+        strict, lenient = strict_scores[pmb_id], lenient_scores[pmb_id]
+        records.append(
+            create_record(
+                pmb_id=pmb_id,
+                raw_sent=Path(filepath.parent / f"{args.language}.raw")
+                .read_text()
+                .rstrip(),
+                sbn_source=args.sbn_source,
+                sbn=None if isinstance(G, SBNError) else G.to_sbn_string(),
+                strict_error=strict.pop("error"),
+                lenient_error=lenient.pop("error"),
+                strict_scores=strict,
+                lenient_scores=lenient,
+            )
+        )
+
+    return records, (strict_overall, lenient_overall)
+
+
+def main():
+    args = get_args()
 
     pmb = PMB(args.data_split, args.language)
 
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=args.max_workers
-    ) as executor:
-        futures = []
+    gold_paths = {
+        get_base_id(filepath): Path(filepath).resolve()
         for filepath in pmb.generator(
             args.starting_path,
             f"**/{args.language}.drs.penman",
             desc_tqdm="Gathering data",
-        ):
-            filepath = Path(filepath).resolve()
-            base_id = get_base_id(filepath)
-            sbn_line = dataset[base_id]
-
-            futures.append(executor.submit(full_run, args, sbn_line, filepath))
-
-        result_records = [
-            res.result()
-            for res in tqdm(
-                concurrent.futures.as_completed(futures),
-                desc="Running evaluation",
-            )
-        ]
+        )
+    }
+
+    overall_scores = None
+    with SmatchScorer(
+        workers=args.scorer_workers,
+        backend=SMATCH_BACKEND(args.smatch_backend),
+    ) as scorer:
+        corpus = iter_gold_corpus(args, gold_paths)
+        if args.batch_smatch:
+            result_records, overall_scores = batch_run(args, corpus, scorer)
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=args.max_workers
+            ) as executor:
+                futures = [
+                    executor.submit(full_run, args, G, filepath, scorer)
+                    for G, filepath in corpus
+                ]
+                result_records = [
+                    res.result()
+                    for res in tqdm(
+                        concurrent.futures.as_completed(futures),
+                        desc="Running evaluation",
+                    )
+                ]
 
     result_path = Config.get_result_dir(
         args.language, args.data_split, "seq2seq"
@@ -199,6 +327,14 @@ def main():
     AVERAGE F1 (strict):  {df["f1"].mean():.3} ({df["f1"].min():.3} - {df["f1"].max():.3})
     AVERAGE F1 (lenient): {df["f1_lenient"].mean():.3} ({df["f1_lenient"].min():.3} - {df["f1_lenient"].max():.3})
     """
+    if overall_scores:
+        strict_overall, lenient_overall = overall_scores
+        overall_result_msg += f"""
+    MICRO F1 (strict):    {strict_overall["micro_f1"]:.3}
+    MICRO F1 (lenient):   {lenient_overall["micro_f1"]:.3}
+    MACRO F1 (strict):    {strict_overall["macro_f1"]:.3}
+    MACRO F1 (lenient):   {lenient_overall["macro_f1"]:.3}
+    """
 
     with open(result_path / "overall.txt", "a") as f:
         f.write(f"{overall_result_msg}\n\n")
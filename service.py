@@ -1,6 +1,5 @@
 import logging
 from argparse import ArgumentParser, Namespace
-from pathlib import Path
 
 import networkx as nx
 from flask import Flask, request
@@ -8,12 +7,13 @@ from tqdm.contrib.logging import logging_redirect_tqdm
 
 from ud_boxer.config import Config
 from ud_boxer.grew_rewrite import Grew
-from ud_boxer.ud import UDGraph, UDParser
+from ud_boxer.helpers import check_edge_clf_arg
+from ud_boxer.ud import UD_NODE_TYPE, UDParser
+from ud_boxer.ud_cache import UDCache
 
 app = Flask(__name__)
 HOST = "0.0.0.0"
 PORT = 5002
-OUTPUT_DIR = "./results"
 
 
 @app.route("/parse", methods=["POST"])
@@ -21,9 +21,6 @@ def parse():
     global PARSER
     global GREW
 
-    output_dir = Path(OUTPUT_DIR).resolve()
-    output_dir.mkdir(exist_ok=True)
-
     data = request.get_json()
     ret_value = {"result": {"errors": None, "graph": None}}
 
@@ -36,13 +33,12 @@ def parse():
     logging.debug(f"got this text: {text}")
 
     try:
-        ud_filepath = Path(output_dir / f"{LANGUAGE}.ud.stanza.conll")
-
-        _, document = PARSER.parse(text, ud_filepath, return_output=True)
+        # Everything stays in memory, so concurrent requests do not share
+        # any files.
+        conll_str, ud_graph = PARSER.parse_in_memory(text)
 
-        logging.debug(f"UD parsed sentence to {ud_filepath}")
-        res = GREW.run(ud_filepath)
-        # res.to_sbn(OUTPUT_DIR / f"{LANGUAGE}.drs.sbn")
+        logging.debug(f"UD parsed sentence to:\n{conll_str}")
+        res = GREW.run_conll_str(conll_str)
         graph = res.to_pydot()
         networkx_graph = nx.nx_pydot.from_pydot(graph)
 
@@ -50,8 +46,10 @@ def parse():
         ret_value["result"]["graph"] = json_graph
 
         tokens = {
-            i: t.text for t in document.sentences[0].tokens for i in t.id
-        }  # ids are tuples
+            node_id[2]: node_data["token"]
+            for node_id, node_data in ud_graph.nodes.items()
+            if node_id[0] == 0 and node_id[1] == UD_NODE_TYPE.TOKEN
+        }
         ret_value["result"]["tokens"] = tokens
 
     except Exception as e:
@@ -70,8 +68,26 @@ def get_args() -> Namespace:
         type=str,
         help="Language to use for UD pipelines.",
     )
+    parser.add_argument(
+        "--ud_cache",
+        nargs="?",
+        const=str(Config.UD_CACHE_PATH),
+        type=str,
+        help="Cache the UD parses in this SQLite file, texts that were "
+        "parsed before are not parsed again. Without a path the default "
+        "cache in the data directory is used.",
+    )
+    parser.add_argument(
+        "--edge_clf",
+        action="store_true",
+        help="Label the edges that the grs rules leave unresolved with the "
+        "edge classifier instead of the edge mappings.",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    check_edge_clf_arg(parser, args)
+
+    return args
 
 
 if __name__ == "__main__":
@@ -84,9 +100,9 @@ if __name__ == "__main__":
     global LANGUAGE
 
     LANGUAGE = args.language
-    PARSER = UDParser(language=args.language)
+    ud_cache = UDCache(args.ud_cache) if args.ud_cache else None
+    PARSER = UDParser(language=args.language, cache=ud_cache)
 
     global GREW
-    GREW = Grew(language=args.language)
-
-    app.run(host=HOST, port=PORT, debug=False)
+    with Grew(language=args.language, edge_clf=args.edge_clf) as GREW:
+        app.run(host=HOST, port=PORT, debug=False)
@@ -1,6 +1,7 @@
 from pathlib import Path
 
 from ud_boxer.base import BaseEnum
+from ud_boxer.lemma_store import LemmaStore, load_lemma_store
 from ud_boxer.misc import load_json
 
 __all__ = [
@@ -46,10 +47,16 @@ class Config:
     # -- Paths --
     PROJECT_ROOT = Path(__file__).parent.parent
     GRS_PATH = Path(PROJECT_ROOT / "grew/main.grs").resolve()
+    # Language specific builds of the grs, see 'build_grs'
+    GRS_CACHE_DIR = Path(PROJECT_ROOT / "grew/.cache").resolve()
     DATA_DIR = PROJECT_ROOT / "data"
     MAPPINGS_DIR = DATA_DIR / "mappings"
     LOG_PATH = Path(DATA_DIR / "logs").resolve()
     SEQ2SEQ_DIR = Path(DATA_DIR / "results/seq2seq").resolve()
+    GREW_CACHE_PATH = Path(DATA_DIR / "cache/grew_rewrites.sqlite").resolve()
+    UD_CACHE_PATH = Path(DATA_DIR / "cache/ud_parses.sqlite").resolve()
+    # Compiled versions of the lemma lookups, see 'load_lemma_store'
+    LEMMA_STORE_DIR = Path(DATA_DIR / "cache/lemma_stores").resolve()
 
     @staticmethod
     def get_result_dir(
@@ -64,39 +71,64 @@ class Config:
         return path
 
     @staticmethod
-    def get_edge_mappings(lang: SUPPORTED_LANGUAGES):
+    def get_edge_mappings_path(lang: SUPPORTED_LANGUAGES) -> Path:
         # TODO: this is currently language neutral since it only works with
         # UPOS and DEPRELs, maybe in the future language specific mappings can
         # be used or everything can be extracted across all training sets of
         # all languages.
-        path = Path(
+        return Path(
             Config.MAPPINGS_DIR / f"en_edge_mappings_train.json"
         ).resolve()
-        return load_json(path)
 
     @staticmethod
-    def get_lemma_sense(lang: SUPPORTED_LANGUAGES):
-        path = Path(
-            Config.DATA_DIR / f"mappings/{lang}_lemma_sense_lookup_gold.json"
+    def get_edge_mappings(lang: SUPPORTED_LANGUAGES):
+        return load_json(Config.get_edge_mappings_path(lang))
+
+    @staticmethod
+    def get_lemma_sense_path(
+        lang: SUPPORTED_LANGUAGES, variant: str = "gold"
+    ) -> Path:
+        return Path(
+            Config.MAPPINGS_DIR / f"{lang}_lemma_sense_lookup_{variant}.json"
         ).resolve()
-        return load_json(path)
 
     @staticmethod
-    def get_lemma_pos_sense(lang: SUPPORTED_LANGUAGES):
-        path = Path(
-            Config.DATA_DIR
-            / f"mappings/{lang}_lemma_pos_sense_lookup_gold.json"
+    def get_lemma_sense(
+        lang: SUPPORTED_LANGUAGES, variant: str = "gold"
+    ) -> LemmaStore:
+        return load_lemma_store(
+            Config.get_lemma_sense_path(lang, variant), Config.LEMMA_STORE_DIR
+        )
+
+    @staticmethod
+    def get_lemma_pos_sense_path(
+        lang: SUPPORTED_LANGUAGES, variant: str = "gold"
+    ) -> Path:
+        return Path(
+            Config.MAPPINGS_DIR
+            / f"{lang}_lemma_pos_sense_lookup_{variant}.json"
         ).resolve()
-        return load_json(path)
 
     @staticmethod
-    def get_edge_clf(lang: SUPPORTED_LANGUAGES):
-        import joblib
+    def get_lemma_pos_sense(
+        lang: SUPPORTED_LANGUAGES, variant: str = "gold"
+    ) -> LemmaStore:
+        return load_lemma_store(
+            Config.get_lemma_pos_sense_path(lang, variant),
+            Config.LEMMA_STORE_DIR,
+        )
 
-        path = Path(
+    @staticmethod
+    def get_edge_clf_path(lang: SUPPORTED_LANGUAGES) -> Path:
+        return Path(
             Config.DATA_DIR / f"edge_classifier/{lang}_edge_clf.joblib"
         ).resolve()
-        return joblib.load(path)
+
+    @staticmethod
+    def get_edge_clf(lang: SUPPORTED_LANGUAGES):
+        import joblib
+
+        return joblib.load(Config.get_edge_clf_path(lang))
 
     @staticmethod
     def get_split_ids(lang: SUPPORTED_LANGUAGES, split: DATA_SPLIT):
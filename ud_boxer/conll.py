@@ -0,0 +1,116 @@
+"""
+Streaming CoNLL-U reader without dependencies. Lines are read one at a time,
+so files with many (large) documents never have to be loaded completely.
+"""
+from functools import lru_cache
+from sys import intern
+from typing import Iterable, Iterator, List, Tuple
+
+from ud_boxer.ud_spec import UDError
+
+__all__ = [
+    "CONLL_SENTENCE",
+    "CONLL_COLUMNS",
+    "iter_conll_sentences",
+    "iter_conll_documents",
+    "parse_conll_items",
+]
+
+# The columns of the word lines of a sentence, multiword tokens and empty
+# nodes included.
+CONLL_SENTENCE = List[List[str]]
+
+CONLL_COLUMNS = (
+    "id",
+    "form",
+    "lemma",
+    "upos",
+    "xpos",
+    "feats",
+    "head",
+    "deprel",
+    "deps",
+    "misc",
+)
+
+# Columns with a small set of values that repeat all the time, these are
+# interned so sentences that are kept around share a single copy of them.
+_INTERNED_COLUMNS = tuple(
+    CONLL_COLUMNS.index(column)
+    for column in ("lemma", "upos", "xpos", "feats", "deprel")
+)
+_NEWDOC = "# newdoc"
+
+# Max number of distinct FEATS / MISC columns to remember the parse of.
+CONLL_ITEMS_CACHE_SIZE = 1 << 14
+
+
+@lru_cache(maxsize=CONLL_ITEMS_CACHE_SIZE)
+def parse_conll_items(column: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    The (interned) 'key=value' items of a FEATS or MISC column. Items
+    without a value (no '=') are skipped, like grew does. The same columns
+    come back all the time, so each one is only parsed once.
+    """
+    return tuple(
+        (intern(key), intern(value))
+        for key, value in (
+            item.split("=", 1) for item in column.split("|") if "=" in item
+        )
+    )
+
+
+def _iter_conll(lines: Iterable[str]) -> Iterator[Tuple[bool, CONLL_SENTENCE]]:
+    """
+    The sentences of CoNLL-U lines, together with whether a sentence starts
+    a new document ('# newdoc' comment).
+    """
+    sentence, newdoc = [], False
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            if sentence:
+                yield newdoc, sentence
+            sentence, newdoc = [], False
+            continue
+
+        if line.startswith("#"):
+            newdoc = newdoc or line.startswith(_NEWDOC)
+            continue
+
+        columns = line.split("\t")
+        if len(columns) != len(CONLL_COLUMNS):
+            raise UDError(f"Invalid CoNLL-U line: {line}")
+        for idx in _INTERNED_COLUMNS:
+            columns[idx] = intern(columns[idx])
+        sentence.append(columns)
+
+    if sentence:
+        yield newdoc, sentence
+
+
+def iter_conll_sentences(lines: Iterable[str]) -> Iterator[CONLL_SENTENCE]:
+    """
+    Read the sentences of CoNLL-U lines (an open file for instance) one by
+    one. Every sentence is a list of the columns of its word lines.
+    """
+    for _, sentence in _iter_conll(lines):
+        yield sentence
+
+
+def iter_conll_documents(
+    lines: Iterable[str],
+) -> Iterator[List[CONLL_SENTENCE]]:
+    """
+    Read the documents of CoNLL-U lines one by one, documents start at a
+    '# newdoc' comment. Lines without these comments are a single document.
+    """
+    document = []
+    for newdoc, sentence in _iter_conll(lines):
+        if newdoc and document:
+            yield document
+            document = []
+        document.append(sentence)
+
+    if document:
+        yield document
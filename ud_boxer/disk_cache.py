@@ -0,0 +1,151 @@
+import sqlite3
+import threading
+import time
+import zlib
+from os import PathLike
+from pathlib import Path
+from typing import Optional
+
+__all__ = [
+    "DiskCache",
+]
+
+
+class DiskCache:
+    """
+    On-disk cache of compressed values, stored in a table of a single SQLite
+    database. When the cache grows beyond 'max_size' bytes, the least
+    recently used values are evicted. Subclasses pick the table and convert
+    their values from and to bytes.
+
+    The total size of a table is kept up to date in a separate one-row
+    table, in the same transactions that change it, so a put never has to
+    sum the sizes of all values.
+
+    The connection is opened lazily, so every process gets its own connection
+    and the cache can be shared by worker processes. Within a process, the
+    threads share the connection one at a time.
+    """
+
+    TABLE: str
+
+    def __init__(self, path: PathLike, max_size: int) -> None:
+        self.path = Path(path)
+        self.max_size = max_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Several processes can write at the same time, wait for the
+            # lock instead of failing right away.
+            self._conn = sqlite3.connect(
+                self.path, timeout=60, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                    key TEXT PRIMARY KEY,
+                    doc BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.TABLE}_last_used "
+                f"ON {self.TABLE} (last_used)"
+            )
+            self._conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE}_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total_size INTEGER NOT NULL
+                )
+                """
+            )
+            # Databases from before the running total get it counted once.
+            self._conn.execute(
+                f"INSERT OR IGNORE INTO {self.TABLE}_size "
+                f"SELECT 0, COALESCE(SUM(size), 0) FROM {self.TABLE}"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT doc FROM {self.TABLE} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            with self.conn:
+                self.conn.execute(
+                    f"UPDATE {self.TABLE} SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+        return zlib.decompress(row[0])
+
+    def put_bytes(self, key: str, value: bytes):
+        blob = zlib.compress(value)
+        with self._lock, self.conn:
+            # The total is updated first, so the transaction holds the write
+            # lock before the size of a value that is replaced is read.
+            self.conn.execute(
+                f"UPDATE {self.TABLE}_size SET total_size = total_size + ? - "
+                f"COALESCE((SELECT size FROM {self.TABLE} WHERE key = ?), 0)",
+                (len(blob), key),
+            )
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        (total_size,) = self.conn.execute(
+            f"SELECT total_size FROM {self.TABLE}_size"
+        ).fetchone()
+        if total_size <= self.max_size:
+            return
+
+        evict_keys, evict_size = [], 0
+        for key, size in self.conn.execute(
+            f"SELECT key, size FROM {self.TABLE} ORDER BY last_used"
+        ):
+            if total_size - evict_size <= self.max_size:
+                break
+            evict_keys.append((key,))
+            evict_size += size
+
+        self.conn.executemany(
+            f"DELETE FROM {self.TABLE} WHERE key = ?", evict_keys
+        )
+        self.conn.execute(
+            f"UPDATE {self.TABLE}_size SET total_size = total_size - ?",
+            (evict_size,),
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM {self.TABLE}"
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __getstate__(self):
+        # Connections and locks cannot be pickled, the copy opens its own.
+        return {**self.__dict__, "_conn": None, "_lock": None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
@@ -1,6 +1,10 @@
+import hashlib
 from collections import Counter
 from copy import copy
-from typing import Any, Dict, List, Tuple
+from functools import lru_cache
+from sys import intern
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from ud_boxer.config import Config
 from ud_boxer.sbn_spec import SBN_EDGE_TYPE, SBN_NODE_TYPE, SBNError, SBNSpec
@@ -12,9 +16,21 @@ from ud_boxer.ud_spec import (
 )
 
 __all__ = [
+    "EDGE_CLF_ITEM",
     "GraphResolver",
+    "get_resolver",
+    "resolver_hash",
 ]
 
+# Edge to classify: (deprel, from node data, to node data)
+EDGE_CLF_ITEM = Tuple[Optional[str], Dict[str, Any], Dict[str, Any]]
+
+# Max number of distinct feature vectors to remember the prediction of.
+EDGE_PREDICTION_CACHE_SIZE = 100_000
+
+# Max number of distinct grew edge names to remember the parse of.
+EDGE_NAME_CACHE_SIZE = 4096
+
 
 class GraphResolver:
     """
@@ -33,13 +49,18 @@ class GraphResolver:
     def __init__(
         self,
         language: Config.SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES.EN,
+        edge_clf: bool = False,
     ) -> None:
         self.edge_mappings = Config.get_edge_mappings(language)
         self.lemma_sense_lookup = Config.get_lemma_sense(language)
         self.lemma_pos_sense_lookup = Config.get_lemma_pos_sense(language)
-        # TODO: use flag if we want to use this
-        # self.edge_clf_pipeline = Config.get_edge_clf(language)
-        self.edge_clf_pipeline = None
+        # With the edge classifier, the 'NONE' edges are labeled by the
+        # classifier instead of the edge mappings.
+        self.edge_clf_pipeline = (
+            Config.get_edge_clf(language) if edge_clf else None
+        )
+        # The predictions per encoded edge, see 'predict_edges'
+        self.edge_predictions: Dict[Tuple[Any, ...], str] = dict()
 
     def node_token_type(
         self, node_data: Dict[str, str]
@@ -109,8 +130,19 @@ class GraphResolver:
         return node_type, node_token, node_data
 
     def edge_token_type(
-        self, edge_name, nodes, from_id, to_id
+        self,
+        edge_name,
+        nodes,
+        from_id,
+        to_id,
+        time_role: Optional[str] = None,
     ) -> Tuple[SBN_EDGE_TYPE, str, Dict[str, str]]:
+        """
+        Resolve the type and token of an edge. The 'time_role' of the graph
+        is determined from all nodes, so when resolving all edges of a graph,
+        pass the result of 'time_role' instead of scanning the nodes for
+        every time edge.
+        """
         edge_data = self.parse_edge_name(edge_name)
         if not (token_to_resolve := edge_data.get("token", None)):
             raise SBNError(
@@ -136,24 +168,21 @@ class GraphResolver:
                 edge_type = SBN_EDGE_TYPE.BOX_CONNECT
         elif token_to_resolve == self.RESOLVE_TIME_EDGE:
             edge_type = SBN_EDGE_TYPE.ROLE
-            # Not the nicest solution, but we need to figure out the
-            # tense, which is a bit of a pain on the grew side.
-            tenses = [
-                n_data["Tense"]
-                for _, n_data in nodes.items()
-                if "Tense" in n_data
-            ]
-            if len(tenses) > 0:
-                counts = Counter(tenses).most_common(1)
-                edge_token = TIME_EDGE_MAPPING[counts[0][0]]
-            else:
-                edge_token = Config.DEFAULT_TIME_ROLE
+            edge_token = time_role or self.time_role(nodes)
         elif token_to_resolve == self.RESOLVE_NONE_EDGE:
             from_upos = nodes[from_id].get("upos", None)
             to_upos = nodes[to_id].get("upos", None)
             key_components = [from_upos, deprel, to_upos]
 
-            if all(key_components):
+            if self.edge_clf_pipeline:
+                edge_token = self.predict_edge(
+                    deprel, nodes[from_id], nodes[to_id]
+                )
+                if edge_token in SBNSpec.ROLES:
+                    edge_type = SBN_EDGE_TYPE.ROLE
+                elif edge_token in SBNSpec.DRS_OPERATORS:
+                    edge_type = SBN_EDGE_TYPE.DRS_OPERATOR
+            elif all(key_components):
                 key = "-".join(key_components)
                 if key in self.edge_mappings:
                     edge_token = self.edge_mappings[key]
@@ -172,36 +201,82 @@ class GraphResolver:
 
         return edge_type, edge_token, edge_data
 
+    @staticmethod
+    def time_role(nodes) -> str:
+        """
+        Get the time role of a graph from the most common 'Tense' of its
+        nodes. Not the nicest solution, but we need to figure out the tense,
+        which is a bit of a pain on the grew side.
+        """
+        tenses = Counter(
+            n_data["Tense"] for n_data in nodes.values() if "Tense" in n_data
+        )
+        if tenses:
+            return TIME_EDGE_MAPPING[tenses.most_common(1)[0][0]]
+        return Config.DEFAULT_TIME_ROLE
+
     def predict_edge(self, deprel, from_node_data, to_node_data) -> str:
+        return self.predict_edges([(deprel, from_node_data, to_node_data)])[0]
+
+    def predict_edges(self, edges: Iterable[EDGE_CLF_ITEM]) -> List[str]:
+        """
+        Predict the labels of many edges with a single call to the
+        classifier. Predictions are remembered per feature vector, so only
+        vectors that were never seen before are passed to the classifier.
+        """
         if not self.edge_clf_pipeline:
             raise SBNError("Edge clf is not enabled")
 
-        feature_vec = self.encode(deprel, from_node_data, to_node_data)
-        label = self.edge_clf_pipeline.predict([feature_vec])[0]
-        return label
+        keys = [tuple(self.encode(*edge)) for edge in edges]
+        new_keys = [
+            key
+            for key in dict.fromkeys(keys)
+            if key not in self.edge_predictions
+        ]
+        if new_keys:
+            if (
+                len(self.edge_predictions) + len(new_keys)
+                > EDGE_PREDICTION_CACHE_SIZE
+            ):
+                self.edge_predictions.clear()
+            labels = self.edge_clf_pipeline.predict(
+                [list(key) for key in new_keys]
+            )
+            self.edge_predictions.update(zip(new_keys, labels))
+
+        return [self.edge_predictions[key] for key in keys]
+
+    def predict_grew_edges(self, grew_graphs: Iterable[Dict[str, Any]]):
+        """
+        Predict the labels of all 'NONE' edges in (rewritten) grew graphs at
+        once, after which resolving the graphs only uses known predictions.
+        This does nothing without the edge classifier.
+        """
+        if not self.edge_clf_pipeline:
+            return
+
+        edges = []
+        for grew_graph in grew_graphs:
+            for node_data, grew_edges in grew_graph.values():
+                for edge_name, to_node_id in grew_edges:
+                    edge_data = self.parse_edge_name(edge_name)
+                    if edge_data.get("token") == self.RESOLVE_NONE_EDGE:
+                        edges.append(
+                            (
+                                edge_data["deprel"],
+                                node_data,
+                                grew_graph[to_node_id][0],
+                            )
+                        )
+        if edges:
+            self.predict_edges(edges)
 
     @staticmethod
     def parse_edge_name(edge_name) -> Dict[str, str]:
-        # Grew encodes edge data in a similar way Feats are encoded in UD Conll
-        # parses, so a single string that has to be split up into components.
-        edge_data = {
-            key: value
-            for key, value in [
-                item.split("=") for item in edge_name.split(",")
-            ]
-        }
-        # Grew encodes deprels in a peculiar way, reconstruct it here.
-        deprel_comp = [
-            edge_data[deprel_component]
-            for deprel_component in ["1", "2"]
-            if deprel_component in edge_data
-        ]
-        edge_data.pop("1", None)
-        edge_data.pop("2", None)
-        deprel = ":".join(deprel_comp) if deprel_comp else None
-        edge_data["deprel"] = deprel
-
-        return edge_data
+        # There are only a few distinct edge names, so the parsing itself is
+        # cached. The dict is new on every call, callers are free to change
+        # it.
+        return dict(_parse_edge_name(edge_name))
 
     @staticmethod
     def parse_gender(gender: str):
@@ -252,3 +327,73 @@ class GraphResolver:
         ]
 
         return features
+
+
+@lru_cache(maxsize=EDGE_NAME_CACHE_SIZE)
+def _parse_edge_name(edge_name: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+    # Grew encodes edge data in a similar way Feats are encoded in UD Conll
+    # parses, so a single string that has to be split up into components.
+    edge_data = {
+        intern(key): intern(value)
+        for key, value in [item.split("=") for item in edge_name.split(",")]
+    }
+    # Grew encodes deprels in a peculiar way, reconstruct it here.
+    deprel_comp = [
+        edge_data[deprel_component]
+        for deprel_component in ["1", "2"]
+        if deprel_component in edge_data
+    ]
+    edge_data.pop("1", None)
+    edge_data.pop("2", None)
+    deprel = intern(":".join(deprel_comp)) if deprel_comp else None
+    edge_data["deprel"] = deprel
+
+    return tuple(edge_data.items())
+
+
+# Resolvers per language and edge classifier use, created on first use, see
+# 'get_resolver'.
+_RESOLVERS: Dict[Tuple[str, bool], GraphResolver] = dict()
+_RESOLVERS_LOCK = Lock()
+
+
+def get_resolver(
+    language: Config.SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES.EN,
+    edge_clf: bool = False,
+) -> GraphResolver:
+    """
+    Get the GraphResolver of a language. The mappings and lookups of a
+    language are only loaded when its resolver is first needed, after that
+    the resolver is shared by everything in the process.
+    """
+    key = (Config.SUPPORTED_LANGUAGES(language), edge_clf)
+    if (resolver := _RESOLVERS.get(key)) is None:
+        with _RESOLVERS_LOCK:
+            if (resolver := _RESOLVERS.get(key)) is None:
+                resolver = _RESOLVERS[key] = GraphResolver(*key)
+    return resolver
+
+
+def resolver_hash(
+    language: Config.SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES.EN,
+    edge_clf: bool = False,
+) -> str:
+    """
+    Hash of the mappings, lookups and (if enabled) edge classifier the
+    GraphResolver of a language is loaded from, changing any of these files
+    results in a new hash.
+    """
+    paths = [
+        Config.get_edge_mappings_path(language),
+        Config.get_lemma_sense_path(language),
+        Config.get_lemma_pos_sense_path(language),
+    ]
+    if edge_clf:
+        paths.append(Config.get_edge_clf_path(language))
+
+    resolver_hasher = hashlib.sha256(f"{language}\n{edge_clf}\n".encode())
+    for path in paths:
+        resolver_hasher.update(f"{path.name}\n".encode())
+        if path.exists():
+            resolver_hasher.update(path.read_bytes())
+    return resolver_hasher.hexdigest()[:16]
@@ -0,0 +1,56 @@
+import hashlib
+import pickle
+from os import PathLike
+from typing import Optional
+
+from ud_boxer.disk_cache import DiskCache
+from ud_boxer.sbn import SBNDocument
+
+__all__ = [
+    "DEFAULT_GREW_CACHE_SIZE",
+    "GrewCache",
+]
+
+# 1 GiB of (zlib compressed) pickled documents, which is a lot more than all
+# PMB splits.
+DEFAULT_GREW_CACHE_SIZE = 1 << 30
+
+
+class GrewCache(DiskCache):
+    """
+    On-disk cache of grew rewrites, stored in a single SQLite database.
+    Documents are keyed by a hash of everything that determines the result
+    (see 'key') and stored as pickled SBNDocuments, which DiskCache compresses.
+    When the cache grows beyond 'max_size' bytes (compressed), the least
+    recently used documents are evicted.
+
+    The connection is opened lazily, so every process gets its own connection
+    and the cache can be shared by the grew workers of a GrewPool.
+    """
+
+    TABLE = "rewrites"
+
+    def __init__(
+        self, path: PathLike, max_size: int = DEFAULT_GREW_CACHE_SIZE
+    ) -> None:
+        super().__init__(path, max_size)
+
+    @staticmethod
+    def key(doc_str: str, grs_hash: str, language: str, strat: str) -> str:
+        """
+        Key of a single rewrite. The grs hash covers the rules and resolver
+        inputs, see 'Grew.grs_hash'. The document is a CoNLL-U string or the
+        serialized grew graphs of a UDGraph.
+        """
+        key_hasher = hashlib.sha256()
+        for item in (grs_hash, language, strat, doc_str):
+            key_hasher.update(f"{item}\0".encode())
+        return key_hasher.hexdigest()
+
+    def get(self, key: str) -> Optional[SBNDocument]:
+        if (value := self.get_bytes(key)) is None:
+            return None
+        return pickle.loads(value)
+
+    def put(self, key: str, doc: SBNDocument):
+        self.put_bytes(key, pickle.dumps(doc, pickle.HIGHEST_PROTOCOL))
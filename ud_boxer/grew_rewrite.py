@@ -1,22 +1,80 @@
 # Grew has no stubs & mixed types everywhere, no need to bother mypy with that.
 # mypy: ignore-errors
+import hashlib
+import json
+import logging
+import os
+import shutil
 import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from itertools import repeat
 from os import PathLike
 from pathlib import Path
-from typing import List
+from sys import intern
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import networkx as nx
 
 import grew
 from ud_boxer.config import Config
-from ud_boxer.graph_resolver import GraphResolver
-from ud_boxer.sbn import SBNGraph
+from ud_boxer.conll import parse_conll_items
+from ud_boxer.graph_resolver import (
+    GraphResolver,
+    get_resolver,
+    resolver_hash,
+)
+from ud_boxer.grew_cache import GrewCache
+from ud_boxer.grs import GREW_GRAPH, LANGUAGE_PLACEHOLDER, grs_strat_steps
+from ud_boxer.rewrite import GrsRewriter
+from ud_boxer.sbn import SBNDocument, SBNGraph
 from ud_boxer.sbn_spec import SBN_EDGE_TYPE, SBN_NODE_TYPE, SBNError
+from ud_boxer.ud import UD_EDGE_TYPE, UD_NODE_TYPE, UDGraph
+
+logger = logging.getLogger(__name__)
 
 __all__ = [
     "Grew",
+    "GrewPool",
+    "build_grs",
 ]
 
-# Placeholder to dynamically build a grs file for a specific language.
-LANGUAGE_PLACEHOLDER = "$$LANGUAGE$$"
+# Grew adds an explicit root node to CoNLL-U graphs, the rules rely on it.
+GREW_ROOT_ID = "0"
+GREW_ROOT_FORM = "__0__"
+
+# Rule statistics from profiling: (rule, seconds, firings)
+GRS_RULE_STATS = Tuple[str, float, int]
+
+# Indices of the CoNLL-U columns that are used
+_ID, _FORM, _LEMMA, _UPOS, _XPOS, _FEATS, _HEAD, _DEPREL = range(8)
+_MISC = 9
+
+# Max number of distinct deprels to remember the grew edge label of, see
+# 'conll_to_grew'.
+CONLL_PARSE_CACHE_SIZE = 1 << 14
+
+
+@lru_cache(maxsize=CONLL_PARSE_CACHE_SIZE)
+def _deprel_to_grew(deprel: str) -> str:
+    return intern(
+        ",".join(
+            f"{i}={component}"
+            for i, component in enumerate(deprel.split(":"), start=1)
+        )
+    )
 
 
 class Grew:
@@ -24,34 +82,323 @@ class Grew:
         self,
         grs_path: PathLike = Config.GRS_PATH,
         language: Config.SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES.EN,
+        cache: Optional[GrewCache] = None,
+        native: bool = False,
+        workers: int = 1,
+        edge_clf: bool = False,
     ) -> None:
-        grew.init()
+        self.language = language
+        # Label the 'NONE' edges with the edge classifier of the language
+        self.edge_clf = edge_clf
         self.current_grs_path = self._build_grs(grs_path, language)
-        # note that this is an index for internal grew use
-        self.grs: int = grew.grs(str(self.current_grs_path))
+
+        # Rewrite with the python implementation of the rules when asked
+        # for, grew is only started when that is not possible.
+        self.native: Optional[GrsRewriter] = None
+        if native:
+            try:
+                self.native = GrsRewriter(self.current_grs_path)
+            except SBNError as e:
+                logger.warning(f"Cannot rewrite natively, using grew: {e}")
+
+        # Cached rewrites depend on the rules and on everything the resolver
+        # uses to turn the grew output into SBN.
+        self.grs_hash = "-".join(
+            (grs_hash(grs_path, language), resolver_hash(language, edge_clf))
+        )
+        if self.native is not None:
+            self.grs_hash += "-native"
+        # Optional cache of rewritten CoNLL-U documents, see 'run_conll_str'
+        self.cache = cache
+
+        if self.native is None:
+            grew.init()
+            # note that this is an index for internal grew use
+            self.grs: int = grew.grs(str(self.current_grs_path))
+
+        # The sentences of a document are rewritten in parallel by this many
+        # worker processes, see '_run_grew_graphs'. The workers are only
+        # started for the first document with multiple sentences.
+        self.workers = workers
+        self._worker_args = (grs_path, language, None, native, edge_clf)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def close(self):
+        """Stop the sentence workers, if they were started"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> "Grew":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
 
     def run(self, conll_path: PathLike, strat: str = "main") -> SBNGraph:
-        # This is not ideal since we need to deserialize the file 2x, once
-        # here and once 'inside' GREW. It might be worth it to convert the
-        # sentence(s) to a GREW graph(s) directly. We need to this though since
-        # GREW throws an error when providing a conll-u file with > 1 sentence.
-        sentences = Path(conll_path).read_text().rstrip().split("\n\n")
-
-        if len(sentences) > 1:
-            graphs = []
-            for sent in sentences:
-                with tempfile.NamedTemporaryFile("w") as f:
-                    Path(f.name).write_text(sent)
-                    grew_graph = grew.graph(f.name)
-                    results = grew.run(self.grs, grew_graph, strat)
-                graphs.append(SBNGraph().from_grew(results[0]))
-            final_graph = self.merge_graphs(graphs)
+        return self.run_conll_str(Path(conll_path).read_text(), strat)
+
+    def run_conll_str(self, conll_str: str, strat: str = "main") -> SBNGraph:
+        """
+        Rewrite a CoNLL-U string with one or more sentences. The sentences
+        are passed to grew as graphs directly, so nothing is (re)read from
+        disk. With a cache, documents that were rewritten before with the
+        same grs files and resolver inputs are taken from the cache instead.
+        """
+        if self.cache is None:
+            return self._run_grew_graphs(self.conll_to_grew(conll_str), strat)
+
+        return self._run_cached(
+            conll_str, lambda: self.conll_to_grew(conll_str), strat
+        )
+
+    def run_graph(self, U: UDGraph, strat: str = "main") -> SBNGraph:
+        """
+        Rewrite an already parsed UDGraph, see 'run_conll_str'. Cached
+        documents are keyed on the grew graphs of U.
+        """
+        grew_graphs = self.ud_to_grew(U)
+        if self.cache is None:
+            return self._run_grew_graphs(grew_graphs, strat)
+
+        return self._run_cached(
+            json.dumps(grew_graphs, sort_keys=True), lambda: grew_graphs, strat
+        )
+
+    def _run_cached(
+        self,
+        doc_str: str,
+        get_grew_graphs: Callable[[], List[GREW_GRAPH]],
+        strat: str,
+    ) -> SBNGraph:
+        key = self.cache.key(doc_str, self.grs_hash, self.language, strat)
+        if (doc := self.cache.get(key)) is not None:
+            return doc.to_networkx()
+
+        G = self._run_grew_graphs(get_grew_graphs(), strat)
+        self.cache.put(key, SBNDocument.from_graph(G))
+        return G
+
+    def _run_grew_graphs(
+        self, grew_graphs: List[GREW_GRAPH], strat: str
+    ) -> SBNGraph:
+        # GREW cannot rewrite multiple sentences at once, so the sentences are
+        # rewritten separately (in parallel with multiple workers) and merged
+        # afterwards.
+        if not grew_graphs:
+            raise SBNError("No sentences found to rewrite")
+
+        if self.workers > 1 and len(grew_graphs) > 1:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_grew_worker,
+                    initargs=self._worker_args,
+                )
+            graphs = [
+                doc.to_networkx()
+                for doc in self._executor.map(
+                    _rewrite_sentence_worker, grew_graphs, repeat(strat)
+                )
+            ]
         else:
-            grew_graph = grew.graph(str(conll_path))
-            result = grew.run(self.grs, grew_graph, strat)
-            final_graph = SBNGraph().from_grew(result[0])
+            results = [
+                self._rewrite_sentence(grew_graph, strat)
+                for grew_graph in grew_graphs
+            ]
+            # Classify the edges of all sentences at once (if enabled).
+            get_resolver(self.language, self.edge_clf).predict_grew_edges(
+                results
+            )
+            graphs = [self._to_sbn_graph(result) for result in results]
+
+        return self.merge_graphs(graphs) if len(graphs) > 1 else graphs[0]
+
+    def _rewrite_sentence(
+        self, grew_graph: GREW_GRAPH, strat: str
+    ) -> GREW_GRAPH:
+        results = self._rewrite(grew_graph, strat)
+        if not results:
+            raise SBNError(f"Strategy '{strat}' gave no result")
+        return results[0]
+
+    def _to_sbn_graph(self, grew_graph: GREW_GRAPH) -> SBNGraph:
+        return SBNGraph().from_grew(grew_graph, self.language, self.edge_clf)
 
-        return final_graph
+    def profile(
+        self, conll_path: PathLike, strat: str = "main"
+    ) -> Tuple[SBNGraph, List[GRS_RULE_STATS]]:
+        return self.profile_conll_str(Path(conll_path).read_text(), strat)
+
+    def profile_conll_str(
+        self, conll_str: str, strat: str = "main"
+    ) -> Tuple[SBNGraph, List[GRS_RULE_STATS]]:
+        """
+        Rewrite a CoNLL-U string like 'run_conll_str', but apply the rules of
+        the strategy one at a time to record the time spent on every rule
+        and the number of times it fired. Rules of an imported package (the
+        language rules) are profiled separately as well. This is a lot
+        slower than a normal run, it is only meant to find expensive rules.
+        """
+        steps = grs_strat_steps(self.current_grs_path, strat)
+        stats = {rule: [0.0, 0] for _, rules in steps for rule in rules}
+
+        graphs = []
+        for grew_graph in self.conll_to_grew(conll_str):
+            # The sequence is repeated until nothing changes, like 'main'.
+            while True:
+                previous = grew_graph
+                for operator, rules in steps:
+                    grew_graph = self._profile_step(
+                        grew_graph, rules, operator in ("", "Try"), stats
+                    )
+                if grew_graph == previous:
+                    break
+            graphs.append(self._to_sbn_graph(grew_graph))
+
+        if not graphs:
+            raise SBNError("No sentences found to rewrite")
+
+        G = self.merge_graphs(graphs) if len(graphs) > 1 else graphs[0]
+        return G, [
+            (rule, seconds, firings)
+            for rule, (seconds, firings) in stats.items()
+        ]
+
+    def _profile_step(
+        self,
+        grew_graph: GREW_GRAPH,
+        rules: List[str],
+        once: bool,
+        stats: Dict[str, List],
+    ) -> GREW_GRAPH:
+        fired = True
+        while fired:
+            fired = False
+            for rule in rules:
+                start = time.perf_counter()
+                results = self._rewrite(grew_graph, f"Pick({rule})")
+                stats[rule][0] += time.perf_counter() - start
+                if results:
+                    stats[rule][1] += 1
+                    grew_graph = results[0]
+                    fired = True
+            if once:
+                break
+
+        return grew_graph
+
+    def _rewrite(self, grew_graph: GREW_GRAPH, strat: str) -> List[GREW_GRAPH]:
+        if self.native is not None:
+            return self.native.run(grew_graph, strat)
+        return grew.run(self.grs, grew_graph, strat)
+
+    @staticmethod
+    def conll_to_grew(conll_str: str) -> List[GREW_GRAPH]:
+        """
+        Convert the sentences in a CoNLL-U string to grew graphs, in the
+        same way grew itself loads CoNLL-U files.
+        """
+        grew_graphs = []
+        for sentence in conll_str.strip().split("\n\n"):
+            grew_graph = {GREW_ROOT_ID: ({"form": GREW_ROOT_FORM}, [])}
+            # Text forms of multiword tokens, keyed by their first word.
+            textforms = dict()
+            # Edges are added afterwards, to keep the nodes in token order.
+            edges = []
+            for line in sentence.splitlines():
+                if not (line := line.strip()) or line.startswith("#"):
+                    continue
+
+                columns = line.split("\t")
+                if len(columns) != 10:
+                    raise SBNError(f"Invalid CoNLL-U line: {line}")
+
+                token_id = columns[_ID]
+                if "-" in token_id:
+                    start, end = map(int, token_id.split("-"))
+                    textforms[str(start)] = columns[_FORM]
+                    for i in range(start + 1, end + 1):
+                        textforms[str(i)] = "_"
+                    continue
+                # Empty nodes (enhanced UD) are not part of the basic tree.
+                if "." in token_id:
+                    continue
+
+                features = {
+                    "form": columns[_FORM],
+                    "textform": textforms.get(token_id, columns[_FORM]),
+                    "wordform": columns[_FORM],
+                }
+                for key, column in (
+                    ("lemma", _LEMMA),
+                    ("upos", _UPOS),
+                    ("xpos", _XPOS),
+                ):
+                    if columns[column] != "_":
+                        features[key] = intern(columns[column])
+                # Feature columns repeat a lot, so their parses are shared.
+                for column in (_FEATS, _MISC):
+                    if columns[column] != "_":
+                        features.update(parse_conll_items(columns[column]))
+
+                grew_graph[token_id] = (features, [])
+                edges.append((columns[_HEAD], columns[_DEPREL], token_id))
+
+            for head, deprel, token_id in edges:
+                grew_graph.setdefault(head, ({}, []))[1].append(
+                    (Grew.deprel_to_grew(deprel), token_id)
+                )
+            grew_graphs.append(grew_graph)
+
+        return grew_graphs
+
+    @staticmethod
+    def ud_to_grew(U: UDGraph) -> List[GREW_GRAPH]:
+        """
+        Convert the sentences of a UDGraph to grew graphs, these are the same
+        as the graphs 'conll_to_grew' makes of the CoNLL-U of U.
+        """
+        grew_graphs: Dict[int, GREW_GRAPH] = dict()
+        for (sentence_idx, node_type, idx), node_data in U.nodes.items():
+            grew_graph = grew_graphs.setdefault(sentence_idx, dict())
+            if node_type == UD_NODE_TYPE.ROOT:
+                features = {"form": GREW_ROOT_FORM}
+            else:
+                features = {
+                    "form": node_data["token"],
+                    # UDGraphs have no multiword tokens, so the text form
+                    # is always the form of the word itself.
+                    "textform": node_data["token"],
+                    "wordform": node_data["token"],
+                    **{
+                        key: node_data[key]
+                        for key in ("lemma", "upos", "xpos")
+                        if node_data.get(key) not in (None, "_")
+                    },
+                    **(node_data.get("feats") or dict()),
+                    **(node_data.get("misc") or dict()),
+                }
+            grew_graph.setdefault(str(idx), ({}, []))[0].update(features)
+
+        for (from_id, to_id), edge_data in U.edges.items():
+            if edge_data["type"] == UD_EDGE_TYPE.SENTENCE_CONNECT:
+                continue
+
+            grew_graph = grew_graphs[from_id[0]]
+            grew_graph[str(from_id[2])][1].append(
+                (Grew.deprel_to_grew(edge_data["deprel"]), str(to_id[2]))
+            )
+
+        return [grew_graphs[idx] for idx in sorted(grew_graphs)]
+
+    @staticmethod
+    def deprel_to_grew(deprel: str) -> str:
+        """
+        Grew stores (sub)relations as edge features, 'nmod:poss' becomes
+        '1=nmod,2=poss'. This is the inverse of 'parse_edge_name'.
+        """
+        return _deprel_to_grew(deprel)
 
     @staticmethod
     def merge_graphs(graphs: List[SBNGraph]) -> SBNGraph:
@@ -63,19 +410,25 @@ class Grew:
         ids (multiple box-0's), the result keeps all boxes and ensures all ids
         are correctly added to A. The strategy of connecting boxes is by using
         the most common box indicator (currently).
+
+        All nodes and edges of the other graphs get a new id in A in a single
+        pass and are added at once, so the merge is linear in the size of the
+        document.
         """
-        A = graphs.pop(0)
-        for B in graphs:
-            nodes, edges = [], []
+        A = graphs[0]
+        is_dag = all(G.is_dag for G in graphs)
+
+        nodes, edges = [], []
+        for B in graphs[1:]:
             node_mapping = dict()
+            boxes = []
 
-            for node_id, node_data in B.nodes.items():
+            for node_id, node_data in B.nodes(data=True):
+                meta = _item_meta(node_data)
                 if node_data["type"] == SBN_NODE_TYPE.BOX:
                     active_box = A._active_box_id
                     node = A.create_node(
-                        node_data["type"],
-                        A._active_box_token,
-                        GraphResolver.filter_item_data(node_data),
+                        node_data["type"], A._active_box_token, meta
                     )
                     edges.append(
                         A.create_edge(
@@ -86,32 +439,42 @@ class Grew:
                             Config.DEFAULT_BOX_CONNECT,
                         )
                     )
+                    boxes.append(node_id)
                 else:
                     node = A.create_node(
-                        node_data["type"],
-                        node_data["token"],
-                        GraphResolver.filter_item_data(node_data),
+                        node_data["type"], node_data["token"], meta
                     )
 
                 nodes.append(node)
                 node_mapping[node_id] = node[0]
 
-            for (from_node, to_node), edge_data in B.edges.items():
-                edges.append(
-                    A.create_edge(
-                        node_mapping[from_node],
-                        node_mapping[to_node],
-                        edge_data["type"],
-                        edge_data["token"],
-                        GraphResolver.filter_item_data(edge_data),
-                    )
+            edges.extend(
+                A.create_edge(
+                    node_mapping[from_node],
+                    node_mapping[to_node],
+                    edge_data["type"],
+                    edge_data["token"],
+                    _item_meta(edge_data),
+                )
+                for from_node, to_node, edge_data in B.edges(data=True)
+            )
+
+            # The new box connects chain the boxes of B in order, these are
+            # the only new edges that could introduce a cycle (the glued
+            # graphs never point back to the graphs before them). That only
+            # happens when a box of B already leads to an earlier box.
+            if is_dag and len(boxes) > 1:
+                is_dag = not any(
+                    nx.descendants(B, box).intersection(boxes[:idx])
+                    for idx, box in enumerate(boxes[1:], start=1)
                 )
 
-            A.add_nodes_from(nodes)
-            A.add_edges_from(edges)
+        A.add_nodes_from(nodes)
+        A.add_edges_from(edges)
 
+        A.is_dag = is_dag
         # This would be very strange, but just in case.
-        if not A._check_is_dag():
+        if not A.is_dag:
             raise SBNError(
                 "Merged SBNgraphs are cyclic, incorrect box connects?"
             )
@@ -122,18 +485,255 @@ class Grew:
     def _build_grs(
         grs_path: PathLike, language: Config.SUPPORTED_LANGUAGES
     ) -> Path:
-        """Build the grs string with the current language"""
-        # Not sure if this is the best way to do this, but it works.
-        # I tried returning the grs string, which is also possible, but then
-        # the separate language grs files cannot be found.
-        grs_path = Path(grs_path)
-        grs_str = grs_path.read_text()
-        final_grs = grs_str.replace(LANGUAGE_PLACEHOLDER, language)
-        current_grs = grs_path.parent / "working_do_not_remove.grs"
-        current_grs.write_text(final_grs)
-
-        return current_grs
-
-    def __del__(self):
-        """Clean up the grs file when we're done"""
-        self.current_grs_path.unlink()
+        """Build the grs with the current language, see 'build_grs'"""
+        return build_grs(grs_path, language)
+
+
+def grs_hash(grs_path: PathLike, language: Config.SUPPORTED_LANGUAGES) -> str:
+    """
+    Hash of the language and all grs files next to 'grs_path', changing any
+    of the rule files results in a new hash.
+    """
+    grs_hasher = hashlib.sha256(f"{language}\n".encode())
+    for path in sorted(Path(grs_path).parent.glob("*.grs")):
+        grs_hasher.update(f"{path.name}\n".encode())
+        grs_hasher.update(path.read_bytes())
+    return grs_hasher.hexdigest()[:16]
+
+
+def build_grs(
+    grs_path: PathLike,
+    language: Config.SUPPORTED_LANGUAGES,
+    cache_dir: PathLike = Config.GRS_CACHE_DIR,
+) -> Path:
+    """
+    Build the grs with the current language and return its path. The main
+    grs imports the language grs files relatively, so the build is a copy of
+    all grs files in a directory per language and content hash. Builds are
+    never changed after they are created, which means processes running
+    different languages (or the same one) can safely share them and only the
+    first run after a rule change builds anything.
+    """
+    grs_path = Path(grs_path)
+    build_dir = Path(cache_dir) / f"{language}-{grs_hash(grs_path, language)}"
+    built_grs = build_dir / grs_path.name
+    if built_grs.exists():
+        return built_grs
+
+    build_dir.parent.mkdir(parents=True, exist_ok=True)
+    # Build in a private directory and move it in place at once, so other
+    # processes never see a partial build.
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".build-", dir=build_dir.parent))
+    try:
+        for path in grs_path.parent.glob("*.grs"):
+            shutil.copyfile(path, tmp_dir / path.name)
+        (tmp_dir / grs_path.name).write_text(
+            grs_path.read_text().replace(LANGUAGE_PLACEHOLDER, language)
+        )
+        os.rename(tmp_dir, build_dir)
+    except OSError:
+        # Another process finished the same build first.
+        if not built_grs.exists():
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return built_grs
+
+
+_PROTECTED_FIELDS = frozenset(GraphResolver.PROTECTED_FIELDS)
+
+
+def _item_meta(item_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The data of a node or edge without the protected fields"""
+    return {
+        key: value
+        for key, value in item_data.items()
+        if key not in _PROTECTED_FIELDS
+    }
+
+
+# The Grew instance of a GrewPool worker process, created once per process.
+_WORKER_GREW: Optional[Grew] = None
+
+
+def _init_grew_worker(
+    grs_path: PathLike,
+    language: str,
+    cache: Optional[GrewCache],
+    native: bool,
+    edge_clf: bool,
+):
+    global _WORKER_GREW
+    _WORKER_GREW = Grew(grs_path, language, cache, native, edge_clf=edge_clf)
+
+
+def _run_grew_worker(
+    conll_path: PathLike, strat: str
+) -> Union[SBNDocument, SBNError]:
+    # Errors are returned instead of raised, so a single document cannot
+    # break the stream. SBNDocuments are a lot cheaper to send back than
+    # the networkx graphs.
+    try:
+        return SBNDocument.from_graph(_WORKER_GREW.run(conll_path, strat))
+    except Exception as e:
+        return e if isinstance(e, SBNError) else SBNError(f"{e}")
+
+
+def _rewrite_sentence_worker(
+    grew_graph: GREW_GRAPH, strat: str
+) -> SBNDocument:
+    return SBNDocument.from_graph(
+        _WORKER_GREW._to_sbn_graph(
+            _WORKER_GREW._rewrite_sentence(grew_graph, strat)
+        )
+    )
+
+
+def _profile_grew_worker(
+    conll_path: PathLike, strat: str
+) -> Tuple[Union[SBNDocument, SBNError], List[GRS_RULE_STATS]]:
+    try:
+        G, stats = _WORKER_GREW.profile(conll_path, strat)
+        return SBNDocument.from_graph(G), stats
+    except Exception as e:
+        return e if isinstance(e, SBNError) else SBNError(f"{e}"), []
+
+
+GREW_POOL_ITEM = Tuple[PathLike, Union[SBNGraph, SBNError]]
+GREW_POOL_PROFILE_ITEM = Tuple[
+    PathLike, Union[SBNGraph, SBNError], List[GRS_RULE_STATS]
+]
+
+
+class GrewPool:
+    """
+    Rewrite documents with grew across worker processes. Every worker
+    initializes grew and loads the GRS once, after which the CoNLL-U paths
+    are streamed to the workers. Use it as a context manager:
+
+        with GrewPool(language, workers=8) as pool:
+            for conll_path, G in pool.imap(conll_paths):
+                ...
+
+    Documents that could not be rewritten are yielded with an SBNError
+    instead of the graph. With a GrewCache, all workers share the same
+    cache.
+    """
+
+    def __init__(
+        self,
+        language: Config.SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES.EN,
+        workers: Optional[int] = None,
+        grs_path: PathLike = Config.GRS_PATH,
+        cache: Optional[GrewCache] = None,
+        native: bool = False,
+        edge_clf: bool = False,
+    ) -> None:
+        self.language = language
+        self.workers = workers or os.cpu_count() or 1
+        self.grs_path = grs_path
+        self.cache = cache
+        self.native = native
+        self.edge_clf = edge_clf
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "GrewPool":
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_grew_worker,
+            initargs=(
+                self.grs_path,
+                self.language,
+                self.cache,
+                self.native,
+                self.edge_clf,
+            ),
+        )
+        return self
+
+    def __exit__(self, *_):
+        self._executor.shutdown(cancel_futures=True)
+        self._executor = None
+
+    def imap(
+        self,
+        conll_paths: Iterable[PathLike],
+        strat: str = "main",
+        ordered: bool = True,
+    ) -> Generator[GREW_POOL_ITEM, None, None]:
+        """
+        Yield (conll_path, SBNGraph) for all paths, in input order or as
+        soon as they are done when 'ordered' is False. Only a couple of
+        documents per worker are submitted ahead, so the paths can be a lazy
+        iterator over a large split.
+        """
+        for conll_path, result in self._imap(
+            _run_grew_worker, conll_paths, strat, ordered
+        ):
+            yield conll_path, self._to_graph(result)
+
+    def imap_profile(
+        self,
+        conll_paths: Iterable[PathLike],
+        strat: str = "main",
+        ordered: bool = True,
+    ) -> Generator[GREW_POOL_PROFILE_ITEM, None, None]:
+        """
+        Like 'imap', but the documents are rewritten with 'Grew.profile' and
+        the rule statistics are yielded as well.
+        """
+        for conll_path, (result, stats) in self._imap(
+            _profile_grew_worker, conll_paths, strat, ordered
+        ):
+            yield conll_path, self._to_graph(result), stats
+
+    def _imap(
+        self,
+        worker_fn: Callable,
+        conll_paths: Iterable[PathLike],
+        strat: str,
+        ordered: bool,
+    ) -> Generator[Tuple[PathLike, Any], None, None]:
+        if self._executor is None:
+            raise SBNError("GrewPool is not started, use it in a 'with'")
+
+        max_pending = 2 * self.workers
+        pending = deque()
+        for conll_path in conll_paths:
+            pending.append(
+                (
+                    conll_path,
+                    self._executor.submit(worker_fn, conll_path, strat),
+                )
+            )
+            if len(pending) >= max_pending:
+                yield from self._collect(pending, ordered)
+
+        while pending:
+            yield from self._collect(pending, ordered)
+
+    @staticmethod
+    def _to_graph(
+        result: Union[SBNDocument, SBNError]
+    ) -> Union[SBNGraph, SBNError]:
+        if isinstance(result, SBNDocument):
+            return result.to_networkx()
+        return result
+
+    @staticmethod
+    def _collect(
+        pending: deque, ordered: bool
+    ) -> Generator[Tuple[PathLike, Any], None, None]:
+        if ordered:
+            done_items = [pending.popleft()]
+        else:
+            done, _ = wait(
+                [future for _, future in pending], return_when=FIRST_COMPLETED
+            )
+            done_items = [item for item in pending if item[1] in done]
+            for item in done_items:
+                pending.remove(item)
+
+        for conll_path, future in done_items:
+            yield conll_path, future.result()
@@ -0,0 +1,325 @@
+"""
+Helpers to read the grs files. These are used to profile the rules of a
+strategy one by one and to find out which documents can be affected by
+changes to the rules, see RuleHitIndex.
+"""
+import hashlib
+import json
+import re
+from os import PathLike
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ud_boxer.misc import load_json
+from ud_boxer.sbn_spec import SBNError
+
+__all__ = [
+    "GREW_GRAPH",
+    "GRS_STEP",
+    "LANGUAGE_PLACEHOLDER",
+    "STRAT_PREFIX",
+    "strip_grs_comments",
+    "grs_block",
+    "grs_strat_steps",
+    "grs_rules",
+    "grs_rule_hashes",
+    "rule_assignments",
+    "rule_requirements",
+    "conll_features",
+    "RuleHitIndex",
+]
+
+# Placeholder to dynamically build a grs file for a specific language.
+LANGUAGE_PLACEHOLDER = "$$LANGUAGE$$"
+
+# The (old) grew graph format: {node_id: (features, [(edge_label, to_id)])}
+GREW_GRAPH = Dict[str, Tuple[Dict[str, str], List[Tuple[str, str]]]]
+
+# (operator, rules) of a single step in a strategy, e.g. ('Onf', ['a_rule'])
+GRS_STEP = Tuple[str, List[str]]
+
+# Prefix of strategy names in 'grs_rules', to tell them apart from rules.
+STRAT_PREFIX = "strat:"
+
+# Features that are (almost) never changed by the rules, so the values found
+# in the CoNLL-U input are the only values these features can have while
+# rewriting, apart from the values the rules assign (see 'rule_assignments').
+_STABLE_FEATURES = ("lemma", "upos")
+
+
+def strip_grs_comments(grs_str: str) -> str:
+    return re.sub(r"%.*", "", grs_str)
+
+
+def grs_block(grs_str: str, start: int) -> str:
+    """Content of the bracketed block that opens at 'start'"""
+    opening = grs_str[start]
+    closing = {"{": "}", "(": ")"}[opening]
+    depth = 0
+    for idx in range(start, len(grs_str)):
+        if grs_str[idx] == opening:
+            depth += 1
+        elif grs_str[idx] == closing:
+            depth -= 1
+            if depth == 0:
+                return grs_str[start + 1 : idx]
+
+    raise SBNError(f"Unbalanced '{opening}' in grs")
+
+
+def _grs_blocks(grs_str: str, keyword: str) -> Dict[str, str]:
+    """All named blocks ('rule name { ... }') of a single kind"""
+    return {
+        match.group(1): grs_block(grs_str, match.end() - 1)
+        for match in re.finditer(rf"\b{keyword}\s+(\w+)\s*{{", grs_str)
+    }
+
+
+def _read_grs(grs_path: PathLike, language: Optional[str] = None) -> str:
+    grs_str = strip_grs_comments(Path(grs_path).read_text())
+    if language is not None:
+        grs_str = grs_str.replace(LANGUAGE_PLACEHOLDER, str(language))
+    return grs_str
+
+
+def _grs_packages(grs_str: str, grs_dir: Path) -> Dict[str, Dict[str, str]]:
+    """The rules of the imported grs files, by package name"""
+    return {
+        name: _grs_blocks(_read_grs(grs_dir / f"{name}.grs"), "rule")
+        for name in re.findall(r'\bimport\s+"(\w+)\.grs"', grs_str)
+    }
+
+
+def grs_rules(
+    grs_path: PathLike, language: Optional[str] = None
+) -> Dict[str, str]:
+    """
+    Get the body of every rule and strategy of a grs and the files it
+    imports. Rules of imported packages are prefixed with the package name
+    ('en.box_negation_det') and strategies with 'strat:'. The language is
+    only needed for grs files that still contain the language placeholder.
+    """
+    grs_str = _read_grs(grs_path, language)
+    rules = _grs_blocks(grs_str, "rule")
+    for package, package_rules in _grs_packages(
+        grs_str, Path(grs_path).parent
+    ).items():
+        rules.update(
+            (f"{package}.{name}", body) for name, body in package_rules.items()
+        )
+    rules.update(
+        (f"{STRAT_PREFIX}{name}", body)
+        for name, body in _grs_blocks(grs_str, "strat").items()
+    )
+    return rules
+
+
+def grs_rule_hashes(rules: Dict[str, str]) -> Dict[str, str]:
+    """Hash the rule bodies of 'grs_rules', ignoring whitespace changes"""
+    return {
+        name: hashlib.sha256(" ".join(body.split()).encode()).hexdigest()[:16]
+        for name, body in rules.items()
+    }
+
+
+def grs_strat_steps(
+    grs_path: PathLike, strat: str, language: Optional[str] = None
+) -> List[GRS_STEP]:
+    """
+    Get the (operator, rules) steps of the (first) sequence in a strategy,
+    or of the whole strategy if it has no sequence. An imported package is
+    expanded to its rules ('en.box_negation_det').
+    """
+    grs_str = _read_grs(grs_path, language)
+    strat_start = rf"\bstrat\s+{re.escape(strat)}\s*{{"
+    if not (match := re.search(strat_start, grs_str)):
+        raise SBNError(f"Strategy '{strat}' not found in grs")
+
+    body = grs_block(grs_str, match.end() - 1)
+    if seq := re.search(r"\bSeq\s*\(", body):
+        body = grs_block(body, seq.end() - 1)
+
+    items, depth, current = [], 0, ""
+    for char in body:
+        depth += (char == "(") - (char == ")")
+        if char == "," and depth == 0:
+            items.append(current)
+            current = ""
+        else:
+            current += char
+    items.append(current)
+
+    packages = {
+        name: [f"{name}.{rule}" for rule in rules]
+        for name, rules in _grs_packages(
+            grs_str, Path(grs_path).parent
+        ).items()
+    }
+    steps = []
+    for step in (item.strip() for item in items if item.strip()):
+        if match := re.fullmatch(r"(\w+)\s*\(\s*([\w.]+)\s*\)", step):
+            operator, target = match.groups()
+        elif re.fullmatch(r"[\w.]+", step):
+            operator, target = "", step
+        else:
+            raise SBNError(f"Unsupported strategy step: {step}")
+        steps.append((operator, packages.get(target, [target])))
+
+    return steps
+
+
+def rule_assignments(rule_body: str) -> Set[Tuple[str, Optional[str]]]:
+    """
+    Get the (feature, value) pairs of the _STABLE_FEATURES that the commands
+    of a rule assign ('A.upos = VERB'). The value is None when it cannot be
+    determined from the rule itself, like in 'A.lemma = B.lemma'.
+    """
+    if not (match := re.search(r"\bcommands\s*{", rule_body)):
+        return set()
+
+    commands = grs_block(rule_body, match.end() - 1)
+    assignments = set()
+    for feature, value in re.findall(
+        r"\b\w+\s*\.\s*(\w+)\s*=\s*([^;}]+)", commands
+    ):
+        if feature not in _STABLE_FEATURES:
+            continue
+
+        value = value.strip()
+        if re.fullmatch(r'"[^"]*"|[\w-]+', value):
+            assignments.add((feature, value.strip('"')))
+        else:
+            assignments.add((feature, None))
+
+    return assignments
+
+
+def rule_requirements(
+    rule_body: str, assigned: Set[Tuple[str, Optional[str]]] = frozenset()
+) -> List[Set[Tuple[str, str]]]:
+    """
+    Get the (feature, value) pairs a document needs for the rule to be able
+    to fire. Every node in the pattern that requires a lemma or upos adds a
+    set of allowed pairs, and a document needs at least one pair of every
+    set. Apart from the 'assigned' pairs (see 'rule_assignments'), the rules
+    do not change these features, so the CoNLL-U input is enough to check
+    this. Sets with an assigned pair are left out, the rule could match any
+    document there.
+    """
+    if not (match := re.search(r"\bpattern\s*{", rule_body)):
+        return []
+
+    pattern = grs_block(rule_body, match.end() - 1)
+    requirements = []
+    for node in re.findall(r"\[([^\]]*)\]", pattern):
+        for feature, values in re.findall(r"(\w+)\s*=\s*([^,]+)", node):
+            # Regular expressions cannot be checked against the input.
+            if feature not in _STABLE_FEATURES or values.startswith('re"'):
+                continue
+
+            allowed = {
+                (feature, value.strip().strip('"'))
+                for value in values.split("|")
+            }
+            if not allowed & assigned:
+                requirements.append(allowed)
+
+    return requirements
+
+
+def conll_features(conll_str: str) -> Set[Tuple[str, str]]:
+    """The (feature, value) pairs of the _STABLE_FEATURES in a CoNLL-U"""
+    features = set()
+    for line in conll_str.splitlines():
+        columns = line.split("\t")
+        if len(columns) == 10 and not line.startswith("#"):
+            features.add(("lemma", columns[2]))
+            features.add(("upos", columns[3]))
+    return features
+
+
+class RuleHitIndex:
+    """
+    The rules that fired per document, together with the hashes of the
+    rules that were used. Given a new version of the rules, this tells
+    which documents could give a different result, so only those have to be
+    rewritten and scored again:
+
+        - documents in which a changed or removed rule fired before,
+        - documents that meet the 'rule_requirements' of a changed or new
+          rule, these could be matched by it now,
+        - all documents when a strategy changed, or when a rule assigns a
+          lemma or upos that cannot be determined (see 'rule_assignments').
+    """
+
+    def __init__(
+        self,
+        rule_hashes: Dict[str, str],
+        hits: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        self.rule_hashes = rule_hashes
+        self.hits = hits or dict()
+
+    @classmethod
+    def from_path(cls, path: PathLike) -> "RuleHitIndex":
+        index = load_json(path)
+        return cls(index["rule_hashes"], index["hits"])
+
+    def to_path(self, path: PathLike) -> Path:
+        path = Path(path)
+        path.write_text(
+            json.dumps(
+                {"rule_hashes": self.rule_hashes, "hits": self.hits},
+                indent=2,
+                sort_keys=True,
+            )
+        )
+        return path
+
+    def add(self, pmb_id: str, fired_rules: Iterable[str]):
+        self.hits[pmb_id] = sorted(set(fired_rules))
+
+    def changed_rules(self, rule_hashes: Dict[str, str]) -> Set[str]:
+        return {
+            name
+            for name in self.rule_hashes.keys() | rule_hashes.keys()
+            if self.rule_hashes.get(name) != rule_hashes.get(name)
+        }
+
+    def affected_docs(
+        self,
+        rules: Dict[str, str],
+        doc_features: Dict[str, Set[Tuple[str, str]]],
+    ) -> Set[str]:
+        """
+        Get the documents that could be affected by the changes from the
+        indexed rules to 'rules' (see 'grs_rules'). The documents to check
+        are given with their 'conll_features'. Documents that are not in the
+        index yet are always affected.
+        """
+        changed = self.changed_rules(grs_rule_hashes(rules))
+        if any(name.startswith(STRAT_PREFIX) for name in changed):
+            return set(doc_features)
+
+        assigned = set()
+        for name, body in rules.items():
+            if not name.startswith(STRAT_PREFIX):
+                assigned.update(rule_assignments(body))
+        # Any value is possible, so the requirements cannot be checked.
+        if changed and any(value is None for _, value in assigned):
+            return set(doc_features)
+
+        affected = {
+            pmb_id
+            for pmb_id in doc_features
+            if pmb_id not in self.hits or changed & set(self.hits[pmb_id])
+        }
+        for name in changed & rules.keys():
+            requirements = rule_requirements(rules[name], assigned)
+            affected.update(
+                pmb_id
+                for pmb_id, features in doc_features.items()
+                if all(features & allowed for allowed in requirements)
+            )
+
+        return affected
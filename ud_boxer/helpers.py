@@ -1,19 +1,49 @@
 import json
+import os
 import subprocess
+import tempfile
+from argparse import ArgumentParser, Namespace
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from os import PathLike
 from pathlib import Path
-from typing import Any, Dict, Generator, Optional
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+import penman
 from tqdm import tqdm
 
 from ud_boxer.config import Config
-from ud_boxer.sbn import SBNSource
+from ud_boxer.sbn import SBNDocument, SBNGraph, SBNSource
 from ud_boxer.sbn_spec import SBNError, get_base_id
+from ud_boxer.smatch import (
+    DEFAULT_RESTARTS,
+    compute_f,
+    penman_triples,
+    smatch_counts,
+)
 
 __all__ = [
     "PMB",
     "pmb_generator",
+    "iter_sbn_corpus",
     "smatch_score",
+    "smatch_score_graphs",
+    "mtool_score_graphs",
+    "smatch_score_corpus",
+    "smatch_corpus_counts",
+    "mtool_corpus_counts",
+    "aggregate_smatch_counts",
+    "check_edge_clf_arg",
 ]
 
 
@@ -74,6 +104,75 @@ def pmb_generator(
     )
 
 
+SBN_CORPUS_ITEM = Tuple[str, Union[SBNGraph, SBNDocument, SBNError]]
+
+
+def iter_sbn_corpus(
+    path: PathLike,
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    source: SBNSource = SBNSource.SEQ2SEQ,
+    compact: bool = False,
+) -> Generator[SBN_CORPUS_ITEM, None, None]:
+    """
+    Lazily parse a seq2seq SBN file with '<p>/<d>,<sbn>' lines, yielding
+    (doc_id, SBNGraph) in input order. Documents that cannot be parsed are
+    yielded as (doc_id, SBNError) so one bad line does not stop the run.
+
+    The lines are parsed in chunks across a process pool with 'workers'
+    processes (defaults to the number of cores, 1 parses in the current
+    process). Only a couple of chunks per worker are read ahead, so memory
+    stays bounded regardless of the size of the file.
+
+    With 'compact' the documents are yielded as SBNDocuments, which are a lot
+    smaller to keep around and cheaper to send back from the workers.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    with open(path) as f:
+        chunks = iter(lambda: list(islice(f, chunk_size)), [])
+
+        if workers == 1:
+            for chunk in chunks:
+                yield from _parse_sbn_lines(chunk, source, compact)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(
+                    executor.submit(
+                        _parse_sbn_lines, chunk, source, compact
+                    )
+                )
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+
+            while pending:
+                yield from pending.popleft().result()
+
+
+def _parse_sbn_lines(
+    lines: Iterable[str], source: SBNSource, compact: bool
+) -> List[SBN_CORPUS_ITEM]:
+    results: List[SBN_CORPUS_ITEM] = []
+    for line in lines:
+        if not (line := line.strip()):
+            continue
+
+        # Names can contain commas, so only split on the first one.
+        doc_id, _, sbn = line.partition(",")
+        try:
+            if not sbn:
+                raise SBNError(f"No SBN found for doc '{doc_id}'")
+            doc = SBNDocument.from_string(sbn, source)
+            results.append((doc_id, doc if compact else doc.to_networkx()))
+        except SBNError as e:
+            results.append((doc_id, e))
+
+    return results
+
+
 _KEY_MAPPING = {
     "n": "input_graphs",
     "g": "gold_graphs_generated",
@@ -88,20 +187,7 @@ _RELEVANT_ITEMS = ["p", "r", "f"]
 
 def smatch_score(gold: PathLike, test: PathLike) -> Dict[str, float]:
     """Use mtool to score two amr-like graphs using SMATCH"""
-    try:
-        # NOTE: this is not ideal, but mtool is quite esoteric in how it reads
-        # in graphs, so it's quite hard to just plug two amr-like strings
-        # in it. Maybe we can run this as a deamon to speed it up a bit or
-        # put some time into creating a usable package to import for this use-
-        # case.
-        smatch_cmd = f"mtool --read amr --score smatch --gold {gold} {test}"
-        response = subprocess.check_output(smatch_cmd, shell=True)
-        decoded = json.loads(response)
-    except subprocess.CalledProcessError as e:
-        raise SBNError(
-            f"Could not call mtool smatch with command '{smatch_cmd}'\n{e}"
-        )
-
+    decoded = _run_mtool(gold, test)
     clean_dict = {
         _KEY_MAPPING.get(k, k): v
         for k, v in decoded.items()
@@ -111,6 +197,262 @@ def smatch_score(gold: PathLike, test: PathLike) -> Dict[str, float]:
     return clean_dict
 
 
+def _run_mtool(
+    gold: PathLike,
+    test: PathLike,
+    timeout: Optional[float] = None,
+    trace: bool = False,
+) -> Dict[str, Any]:
+    # NOTE: mtool cannot be imported next to this repo (its entry point is a
+    # module called 'main', like ours) and it only reads graphs from files,
+    # so every call starts a new mtool process. With 'trace', mtool adds
+    # the counts of every graph to the result ('scores', by graph id).
+    smatch_cmd = ["mtool", "--read", "amr", "--score", "smatch"]
+    if trace:
+        smatch_cmd.append("--trace")
+    smatch_cmd.extend(["--gold", str(gold), str(test)])
+    try:
+        response = subprocess.check_output(smatch_cmd, timeout=timeout)
+        decoded = json.loads(response)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        raise SBNError(
+            f"Could not call mtool smatch with command "
+            f"'{' '.join(smatch_cmd)}'\n{e}"
+        )
+
+    return decoded
+
+
+def _run_mtool_graphs(
+    gold: Union[SBNGraph, str],
+    test: Union[SBNGraph, str],
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Run mtool on two graphs, mtool only reads them from files"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gold_path = Path(tmp_dir) / "gold.penman"
+        gold_path.write_text(_penman_string(gold))
+        test_path = Path(tmp_dir) / "test.penman"
+        test_path.write_text(_penman_string(test))
+        return _run_mtool(gold_path, test_path, timeout)
+
+
+def mtool_score_graphs(
+    gold: Union[SBNGraph, str],
+    test: Union[SBNGraph, str],
+    restarts: int = DEFAULT_RESTARTS,
+    seed: Optional[int] = 42,
+    timeout: Optional[float] = None,
+) -> Dict[str, float]:
+    """
+    Score two graphs with mtool, the reference scorer, in the same way as
+    'smatch_score_graphs'. The restarts and seed are only there to share the
+    signature, mtool uses its own.
+    """
+    decoded = _run_mtool_graphs(gold, test, timeout)
+    return {_KEY_MAPPING[k]: decoded[k] for k in _RELEVANT_ITEMS}
+
+
+def smatch_score_graphs(
+    gold: Union[SBNGraph, str],
+    test: Union[SBNGraph, str],
+    restarts: int = DEFAULT_RESTARTS,
+    seed: Optional[int] = 42,
+) -> Dict[str, float]:
+    """
+    Score two graphs using SMATCH in-process, without writing them to disk
+    and calling mtool. The graphs can be SBNGraphs or Penman strings, the
+    result has the same keys as 'smatch_score'.
+
+    The hill-climbing uses 'restarts' random restarts, seeded with 'seed' to
+    make the scores reproducible (use None for a random seed).
+    """
+    gold_triples, test_triples = _smatch_triples(gold), _smatch_triples(test)
+    precision, recall, f1 = compute_f(
+        *smatch_counts(test_triples, gold_triples, restarts, seed)
+    )
+
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+# (pmb_id, gold, test), a test graph that could not be created is passed as
+# the SBNError explaining why.
+SMATCH_DOC = Tuple[str, Union[SBNGraph, str], Union[SBNGraph, str, SBNError]]
+# (pmb_id, (matching, test, gold) triple counts, error)
+SMATCH_DOC_COUNTS = Tuple[str, Tuple[int, int, int], Optional[str]]
+
+
+def smatch_score_corpus(
+    docs: Iterable[SMATCH_DOC],
+    restarts: int = DEFAULT_RESTARTS,
+    seed: Optional[int] = 42,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+    """
+    Score all documents of a split with SMATCH in one go. Returns the scores
+    per pmb_id (with an 'error' key, None if the document could be scored)
+    and the micro and macro averaged scores of the whole split.
+
+    Documents that failed count as empty predictions: they score 0 and their
+    gold triples still count towards the micro averaged recall, so failures
+    are not silently left out of the corpus scores.
+    """
+    return aggregate_smatch_counts(
+        smatch_corpus_counts(list(docs), restarts, seed)
+    )
+
+
+def aggregate_smatch_counts(
+    doc_counts: Iterable[SMATCH_DOC_COUNTS],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+    """Turn per document triple counts into per document and split scores"""
+    doc_scores = dict()
+    total_counts = [0, 0, 0]
+    n_failed = 0
+    for pmb_id, counts, error in doc_counts:
+        precision, recall, f1 = compute_f(*counts)
+        doc_scores[pmb_id] = {
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+            "error": error,
+        }
+        total_counts = [t + c for t, c in zip(total_counts, counts)]
+        n_failed += error is not None
+
+    micro = compute_f(*total_counts)
+    n_docs = len(doc_scores)
+    overall = {"docs": n_docs, "failed_docs": n_failed}
+    for i, key in enumerate(("precision", "recall", "f1")):
+        overall[f"micro_{key}"] = micro[i]
+        overall[f"macro_{key}"] = (
+            sum(scores[key] for scores in doc_scores.values()) / n_docs
+            if n_docs
+            else 0.0
+        )
+
+    return doc_scores, overall
+
+
+def smatch_corpus_counts(
+    docs: List[SMATCH_DOC], restarts: int, seed: Optional[int]
+) -> List[SMATCH_DOC_COUNTS]:
+    """Get the SMATCH triple counts of (pmb_id, gold, test) documents"""
+    results = []
+    for pmb_id, gold, test in docs:
+        try:
+            gold_triples = _smatch_triples(gold)
+        except SBNError as e:
+            results.append((pmb_id, (0, 0, 0), f"Invalid gold graph: {e}"))
+            continue
+
+        try:
+            if isinstance(test, SBNError):
+                raise test
+            counts = smatch_counts(
+                _smatch_triples(test), gold_triples, restarts, seed
+            )
+            results.append((pmb_id, counts, None))
+        except SBNError as e:
+            n_gold = sum(len(triples) for triples in gold_triples)
+            results.append((pmb_id, (0, 0, n_gold), str(e)))
+
+    return results
+
+
+def mtool_corpus_counts(
+    docs: List[SMATCH_DOC],
+    restarts: int,
+    seed: Optional[int],
+    timeout: Optional[float] = None,
+) -> List[SMATCH_DOC_COUNTS]:
+    """
+    Get the SMATCH triple counts of (pmb_id, gold, test) documents with
+    mtool, see 'smatch_corpus_counts'. All documents are scored with a
+    single mtool run, the counts per document come from its trace. The
+    gold triples of documents without a test graph are counted here.
+    """
+    results: List[SMATCH_DOC_COUNTS] = []
+    pairs = dict()
+    for pmb_id, gold, test in docs:
+        try:
+            n_gold = sum(len(triples) for triples in _smatch_triples(gold))
+        except SBNError as e:
+            results.append((pmb_id, (0, 0, 0), f"Invalid gold graph: {e}"))
+            continue
+
+        try:
+            if isinstance(test, SBNError):
+                raise test
+            pairs[len(results)] = (_penman_string(gold), _penman_string(test))
+        except SBNError as e:
+            results.append((pmb_id, (0, 0, n_gold), str(e)))
+            continue
+        # Kept in case mtool fails on this document
+        results.append((pmb_id, (0, 0, n_gold), None))
+
+    if not pairs:
+        return results
+
+    try:
+        scores = _run_mtool_pairs(pairs, timeout)
+    except SBNError:
+        # A single graph mtool cannot handle fails the whole run, so the
+        # documents are scored one by one to find out which one it was.
+        scores = dict()
+
+    for idx, (gold, test) in pairs.items():
+        pmb_id, failed_counts, _ = results[idx]
+        try:
+            decoded = scores.get(str(idx)) or _run_mtool_graphs(
+                gold, test, timeout
+            )
+            counts = (decoded["c"], decoded["s"], decoded["g"])
+            results[idx] = (pmb_id, counts, None)
+        except SBNError as e:
+            results[idx] = (pmb_id, failed_counts, str(e))
+
+    return results
+
+
+def _run_mtool_pairs(
+    pairs: Dict[int, Tuple[str, str]], timeout: Optional[float] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Score (gold, test) Penman pairs with a single mtool run, the result has
+    the counts of every pair by (the string of) its key.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gold_path = Path(tmp_dir) / "gold.penman"
+        test_path = Path(tmp_dir) / "test.penman"
+        for path, graphs in (
+            (gold_path, (gold for gold, _ in pairs.values())),
+            (test_path, (test for _, test in pairs.values())),
+        ):
+            path.write_text(
+                "".join(
+                    f"# ::id {idx}\n{graph.strip()}\n\n"
+                    for idx, graph in zip(pairs, graphs)
+                )
+            )
+        decoded = _run_mtool(gold_path, test_path, timeout, trace=True)
+
+    if "scores" not in decoded:
+        raise SBNError("mtool gave no scores per graph")
+    return {str(idx): scores for idx, scores in decoded["scores"].items()}
+
+
+def _penman_string(G: Union[SBNGraph, str]) -> str:
+    return G.to_penman_string() if isinstance(G, SBNGraph) else G
+
+
+def _smatch_triples(G: Union[SBNGraph, str]):
+    penman_str = _penman_string(G)
+    try:
+        return penman_triples(penman_str)
+    except penman.DecodeError as e:
+        raise SBNError(f"Could not decode penman graph for smatch\n{e}")
+
+
 def create_record(
     pmb_id: str,
     raw_sent: str,
@@ -131,3 +473,17 @@ def create_record(
         **strict_scores,
         **{f"{k}_lenient": v for k, v in lenient_scores.items()},
     }
+
+
+def check_edge_clf_arg(parser: ArgumentParser, args: Namespace):
+    """
+    Exit with a usage error when --edge_clf is given for a language without
+    an edge classifier. Better to find out now than after loading (and
+    running) everything else.
+    """
+    edge_clf_path = Config.get_edge_clf_path(args.language)
+    if args.edge_clf and not edge_clf_path.exists():
+        parser.error(
+            f"--edge_clf: no edge classifier for '{args.language}', "
+            f"{edge_clf_path} does not exist"
+        )
@@ -0,0 +1,167 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from collections.abc import Mapping
+from os import PathLike
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from ud_boxer.misc import load_json
+from ud_boxer.sbn_spec import SBNError
+
+__all__ = [
+    "LemmaStore",
+    "compile_lemma_store",
+    "load_lemma_store",
+]
+
+# File layout: magic, entry count, then three tables of little-endian uint32:
+#   - (count + 1) bucket starts, the entries are grouped by the crc32 of their
+#     key modulo count, so a lookup only compares the keys of one bucket,
+#   - (count + 1) key offsets followed by (count + 1) value offsets,
+# followed by all keys and all values as UTF-8.
+_MAGIC = b"UDBXLEM1"
+_COUNT = struct.Struct("<I")
+_HEADER_SIZE = len(_MAGIC) + _COUNT.size
+_UINT32_SIZE = 4
+
+
+def _bucket(key: bytes, n_buckets: int) -> int:
+    return zlib.crc32(key) % n_buckets
+
+
+class LemmaStore(Mapping):
+    """
+    Read-only lemma -> synset lookup on a file built by
+    'compile_lemma_store'. The file is memory mapped, so nothing is parsed
+    when it is opened and processes that use the same store share a single
+    copy of it through the page cache. It behaves like the dict from the
+    JSON file it was compiled from.
+    """
+
+    def __init__(self, path: PathLike) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[: len(_MAGIC)] != _MAGIC:
+            self._mm.close()
+            raise SBNError(f"Not a compiled lemma store: {self.path}")
+
+        (self._count,) = _COUNT.unpack_from(self._mm, len(_MAGIC))
+        self._data_start = _HEADER_SIZE + 3 * (self._count + 1) * _UINT32_SIZE
+        tables = memoryview(self._mm)[_HEADER_SIZE : self._data_start]
+        if sys.byteorder == "little":
+            self._tables = tables.cast("I")
+        else:
+            self._tables = array("I", tables)
+            self._tables.byteswap()
+            tables.release()
+
+    def _item(self, idx: int) -> bytes:
+        """Key 'idx', or value 'idx - count - 1' when idx > count"""
+        # The offsets come after the count + 1 bucket starts.
+        idx += self._count + 1
+        return self._mm[
+            self._data_start
+            + self._tables[idx] : self._data_start
+            + self._tables[idx + 1]
+        ]
+
+    def _find(self, key: str) -> Optional[int]:
+        if not self._count:
+            return None
+
+        encoded = key.encode()
+        bucket = _bucket(encoded, self._count)
+        for idx in range(self._tables[bucket], self._tables[bucket + 1]):
+            if self._item(idx) == encoded:
+                return idx
+        return None
+
+    def __getitem__(self, key: str) -> str:
+        if not isinstance(key, str) or (idx := self._find(key)) is None:
+            raise KeyError(key)
+        return self._item(self._count + 1 + idx).decode()
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._item(idx).decode() for idx in range(self._count))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        if isinstance(self._tables, memoryview):
+            self._tables.release()
+        self._mm.close()
+
+    def __reduce__(self):
+        # The map itself cannot be pickled, the copy maps the file again.
+        return (self.__class__, (self.path,))
+
+
+def compile_lemma_store(lookup: Dict[str, str], path: PathLike) -> Path:
+    """
+    Write a lemma -> synset lookup in the format of LemmaStore. The file is
+    written next to its destination and moved in place at once, so
+    processes that open the store never see a partial file.
+    """
+    path = Path(path)
+    n_buckets = max(len(lookup), 1)
+    entries = sorted(
+        (_bucket(key.encode(), n_buckets), key.encode(), value.encode())
+        for key, value in lookup.items()
+    )
+
+    bucket_starts = array("I", [0] * (len(entries) + 1))
+    for bucket, _, _ in entries:
+        bucket_starts[bucket + 1] += 1
+    for bucket in range(len(entries)):
+        bucket_starts[bucket + 1] += bucket_starts[bucket]
+
+    offsets = array("I", [0])
+    for _, key, _ in entries:
+        offsets.append(offsets[-1] + len(key))
+    offsets.append(offsets[-1])
+    for _, _, value in entries:
+        offsets.append(offsets[-1] + len(value))
+
+    if sys.byteorder != "little":
+        bucket_starts.byteswap()
+        offsets.byteswap()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".build-", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MAGIC)
+            f.write(_COUNT.pack(len(entries)))
+            f.write(bucket_starts.tobytes())
+            f.write(offsets.tobytes())
+            f.writelines(key for _, key, _ in entries)
+            f.writelines(value for _, _, value in entries)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return path
+
+
+def load_lemma_store(json_path: PathLike, store_dir: PathLike) -> LemmaStore:
+    """
+    Open the compiled version of a lemma lookup JSON file, compiling it into
+    'store_dir' first if it is missing or older than the JSON file.
+    """
+    json_path = Path(json_path)
+    store_path = Path(store_dir) / f"{json_path.stem}.lemmas"
+    if (
+        not store_path.exists()
+        or store_path.stat().st_mtime_ns < json_path.stat().st_mtime_ns
+    ):
+        compile_lemma_store(load_json(json_path), store_path)
+    return LemmaStore(store_path)
@@ -1,8 +1,22 @@
 import logging
+import re
+from os import PathLike
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from ud_boxer.base import BaseGraph
+from ud_boxer.config import Config
+from ud_boxer.grs import GREW_GRAPH, STRAT_PREFIX, grs_block, grs_rules
 from ud_boxer.sbn import SBNGraph
-from ud_boxer.sbn_spec import SBN_EDGE_TYPE, SBN_NODE_TYPE
+from ud_boxer.sbn_spec import SBN_EDGE_TYPE, SBN_NODE_TYPE, SBNError
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +27,13 @@ logger = logging.getLogger(__name__)
 #   - https://universaldependencies.org/u/feat/Mood.html similar to Aspect and Tense
 
 
-__all__ = ["GraphTransformer", "BoxRemover"]
+__all__ = [
+    "GraphTransformer",
+    "BoxRemover",
+    "RewriteGraph",
+    "GrsRule",
+    "GrsRewriter",
+]
 
 
 class GraphTransformer:
@@ -41,3 +61,550 @@ class BoxRemover(GraphTransformer):
         G.remove_nodes_from(nodes_to_remove)
 
         return G
+
+
+# Features of a node or edge: (feature, allowed values, negated). Without
+# allowed values the feature only has to be present (or absent if negated).
+_CONSTRAINT = Tuple[str, Optional[Set[str]], bool]
+
+# Pattern items, a node ('node', name, constraints) or an edge ('edge',
+# name, source, constraints, target). Anonymous nodes and edges are '*' and
+# None respectively.
+_PATTERN_ITEM = Tuple
+
+# Strategies are nested (operator, arguments) tuples, rules are ('', name)
+_STRAT = Tuple[str, Any]
+
+# Upper bound of rule applications in a single Onf or Iter, to turn rules
+# that never reach a normal form into an error instead of a hang.
+MAX_REWRITE_STEPS = 10_000
+
+_NODE_ITEM = re.compile(r"(\w+)\s*\[([^\]]*)\]")
+_EDGE_ITEM = re.compile(
+    r"(?:(\w+)\s*:\s*)?(\w+|\*)\s*-(?:\[([^\]]*)\]-)?>\s*(\w+|\*)"
+)
+_FEATURE_REF = re.compile(r"(\w+)\.(\w+)")
+
+
+class _Edge:
+    __slots__ = ("source", "features", "target")
+
+    def __init__(self, source: str, features: Dict[str, str], target: str):
+        self.source = source
+        self.features = features
+        self.target = target
+
+
+class RewriteGraph:
+    """
+    Mutable graph the native rules work on, with the same nodes, features
+    and edge features as the grew graphs it is created from.
+    """
+
+    def __init__(self) -> None:
+        self.nodes: Dict[str, Dict[str, str]] = dict()
+        self.out_edges: Dict[str, List[_Edge]] = dict()
+        # Grew lists the nodes added by rules before the original ones.
+        self.added_nodes: List[str] = []
+
+    @classmethod
+    def from_grew(cls, grew_graph: GREW_GRAPH) -> "RewriteGraph":
+        G = cls()
+        for node_id, (features, _) in grew_graph.items():
+            G.nodes[node_id] = dict(features)
+            G.out_edges[node_id] = []
+        for node_id, (_, edges) in grew_graph.items():
+            for label, target in edges:
+                G.out_edges[node_id].append(
+                    _Edge(node_id, dict(_split_label(label)), target)
+                )
+        return G
+
+    def to_grew(self) -> GREW_GRAPH:
+        node_ids = [n for n in self.added_nodes if n in self.nodes] + [
+            n for n in self.nodes if n not in self.added_nodes
+        ]
+        return {
+            node_id: (
+                dict(features),
+                [
+                    (
+                        ",".join(f"{k}={v}" for k, v in e.features.items()),
+                        e.target,
+                    )
+                    for e in self.out_edges[node_id]
+                ],
+            )
+            for node_id, features in (
+                (node_id, self.nodes[node_id]) for node_id in node_ids
+            )
+        }
+
+    def copy(self) -> "RewriteGraph":
+        G = RewriteGraph.from_grew(self.to_grew())
+        G.added_nodes = list(self.added_nodes)
+        return G
+
+    def restore(self, backup: "RewriteGraph"):
+        self.nodes = backup.nodes
+        self.out_edges = backup.out_edges
+        self.added_nodes = backup.added_nodes
+
+    def edges(self) -> Iterable[_Edge]:
+        for edges in self.out_edges.values():
+            yield from edges
+
+    def add_node(self, name: str) -> str:
+        node_id = f"{name}_{len(self.added_nodes)}"
+        self.added_nodes.append(node_id)
+        self.nodes[node_id] = dict()
+        self.out_edges[node_id] = []
+        return node_id
+
+    def add_edge(self, source: str, features: Dict[str, str], target: str):
+        # Like grew, an edge that already exists is not added twice.
+        if not any(
+            e.target == target and e.features == features
+            for e in self.out_edges[source]
+        ):
+            # Added edges come first as well, like the added nodes.
+            self.out_edges[source].insert(0, _Edge(source, features, target))
+
+    def remove_edge(self, edge: _Edge):
+        edges = self.out_edges.get(edge.source, [])
+        # Edges are compared by identity, parallel edges can be equal.
+        for idx, other in enumerate(edges):
+            if other is edge:
+                del edges[idx]
+                return
+
+    def remove_node(self, node_id: str):
+        del self.nodes[node_id]
+        del self.out_edges[node_id]
+        for source, edges in self.out_edges.items():
+            self.out_edges[source] = [e for e in edges if e.target != node_id]
+
+
+def _split_label(label: str) -> Iterable[Tuple[str, str]]:
+    return (item.split("=", 1) for item in label.split(",") if item)
+
+
+def _strip_quotes(value: str) -> str:
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _parse_constraints(items: str, is_edge: bool) -> List[_CONSTRAINT]:
+    constraints = []
+    for item in (item.strip() for item in items.split(",")):
+        if not item:
+            continue
+        if match := re.fullmatch(r"(!?)(\w+)", item):
+            # A bare edge label is grew's compact deprel notation.
+            if is_edge and not match.group(1):
+                raise SBNError(f"Unsupported edge label: {item}")
+            constraints.append((match.group(2), None, bool(match.group(1))))
+        elif match := re.fullmatch(r"(\w+)\s*=\s*([^=<>]+)", item):
+            feature, values = match.groups()
+            if values.startswith('re"') or _FEATURE_REF.fullmatch(values):
+                raise SBNError(f"Unsupported feature constraint: {item}")
+            constraints.append(
+                (feature, {_strip_quotes(v) for v in values.split("|")}, False)
+            )
+        else:
+            raise SBNError(f"Unsupported feature constraint: {item}")
+    return constraints
+
+
+def _satisfies(
+    features: Dict[str, str], constraints: List[_CONSTRAINT]
+) -> bool:
+    for feature, allowed, negated in constraints:
+        if negated:
+            if feature in features:
+                return False
+        elif feature not in features or (
+            allowed is not None and features[feature] not in allowed
+        ):
+            return False
+    return True
+
+
+def _parse_statements(block: str) -> List[str]:
+    return [
+        statement.strip()
+        for line in block.splitlines()
+        for statement in line.split(";")
+        if statement.strip()
+    ]
+
+
+class _Pattern:
+    """A 'pattern' or 'without' clause"""
+
+    def __init__(self, block: str, edge_names: Set[str] = frozenset()):
+        self.node_constraints: Dict[str, List[_CONSTRAINT]] = dict()
+        self.edge_constraints: Dict[str, List[_CONSTRAINT]] = dict()
+        self.edges: List[Tuple] = []
+
+        for statement in _parse_statements(block):
+            if match := _NODE_ITEM.fullmatch(statement):
+                name, items = match.groups()
+                target = (
+                    self.edge_constraints
+                    if name in edge_names
+                    else self.node_constraints
+                )
+                target.setdefault(name, []).extend(
+                    _parse_constraints(items, name in edge_names)
+                )
+            elif match := _EDGE_ITEM.fullmatch(statement):
+                name, source, items, target = match.groups()
+                for node in (source, target):
+                    if node != "*":
+                        self.node_constraints.setdefault(node, [])
+                constraints = _parse_constraints(items or "", True)
+                self.edges.append((name, source, constraints, target))
+            else:
+                raise SBNError(f"Unsupported pattern clause: {statement}")
+
+    @property
+    def edge_names(self) -> Set[str]:
+        return {name for name, *_ in self.edges if name}
+
+    def matches(
+        self, G: RewriteGraph, nodes: Dict[str, str], edges: Dict[str, _Edge]
+    ) -> Generator[Tuple[Dict[str, str], Dict[str, _Edge]], None, None]:
+        """
+        Yield all extensions of the (node, edge) bindings that match this
+        clause. Named nodes are matched injectively, like grew does.
+        """
+        for name, constraints in self.edge_constraints.items():
+            if not _satisfies(edges[name].features, constraints):
+                return
+
+        yield from self._match_edges(G, 0, dict(nodes), dict(edges))
+
+    def _bind(
+        self, G: RewriteGraph, name: str, node_id: str, nodes: Dict[str, str]
+    ) -> Optional[bool]:
+        """Bind a node, True if newly bound and None if it does not fit"""
+        if name == "*":
+            return False
+        if name in nodes:
+            return False if nodes[name] == node_id else None
+        if node_id in nodes.values() or not _satisfies(
+            G.nodes[node_id], self.node_constraints.get(name, [])
+        ):
+            return None
+        nodes[name] = node_id
+        return True
+
+    def _match_edges(self, G, idx, nodes, edges):
+        if idx == len(self.edges):
+            names = list(self.node_constraints)
+            yield from self._match_nodes(G, names, nodes, edges)
+            return
+
+        name, source, constraints, target = self.edges[idx]
+        candidates = (
+            G.out_edges[nodes[source]] if source in nodes else G.edges()
+        )
+        for edge in list(candidates):
+            if not _satisfies(edge.features, constraints):
+                continue
+            bound_source = self._bind(G, source, edge.source, nodes)
+            if bound_source is None:
+                continue
+            bound_target = self._bind(G, target, edge.target, nodes)
+            if bound_target is None:
+                if bound_source:
+                    del nodes[source]
+                continue
+
+            if name:
+                edges[name] = edge
+            yield from self._match_edges(G, idx + 1, nodes, edges)
+            if name:
+                del edges[name]
+            if bound_source:
+                del nodes[source]
+            if bound_target:
+                del nodes[target]
+
+    def _match_nodes(self, G, names, nodes, edges):
+        if not names:
+            yield nodes, edges
+            return
+
+        name, rest = names[0], names[1:]
+        if name in nodes:
+            if _satisfies(G.nodes[nodes[name]], self.node_constraints[name]):
+                yield from self._match_nodes(G, rest, nodes, edges)
+            return
+
+        for node_id in list(G.nodes):
+            if self._bind(G, name, node_id, nodes):
+                yield from self._match_nodes(G, rest, nodes, edges)
+                del nodes[name]
+
+
+class GrsRule(GraphTransformer):
+    """
+    Single grs rule, matched and applied natively. This supports what the
+    rules in this project use: node and edge feature constraints, 'without'
+    clauses and the commands to add and delete nodes, edges and features.
+    Anything else raises an SBNError when the rule is parsed.
+    """
+
+    def __init__(self, name: str, body: str) -> None:
+        self.name = name
+        self.pattern: Optional[_Pattern] = None
+        self.withouts: List[_Pattern] = []
+        self.commands: List[Tuple] = []
+
+        for match in re.finditer(r"\b(pattern|without|commands)\s*{", body):
+            block = grs_block(body, match.end() - 1)
+            if match.group(1) == "pattern":
+                self.pattern = _Pattern(block)
+            elif match.group(1) == "without":
+                self.withouts.append(_Pattern(block, self.pattern.edge_names))
+            else:
+                self.commands = self._parse_commands(block)
+
+        if self.pattern is None:
+            raise SBNError(f"Rule '{name}' has no pattern")
+
+    def _parse_commands(self, block: str) -> List[Tuple]:
+        names = set(self.pattern.node_constraints) | self.pattern.edge_names
+        commands = []
+        for statement in _parse_statements(block):
+            if match := re.fullmatch(
+                r"(del_node|del_edge|add_node) (\w+)", statement
+            ):
+                command, name = match.groups()
+                if command == "add_node":
+                    names.add(name)
+                commands.append((command, name))
+            elif match := re.fullmatch(r"del_feat (\w+)\.(\w+)", statement):
+                commands.append(("del_feat", *match.groups()))
+            elif statement.startswith("add_edge ") and (
+                match := _EDGE_ITEM.fullmatch(statement[len("add_edge ") :])
+            ):
+                name, source, items, target = match.groups()
+                features = dict(
+                    (key.strip(), _strip_quotes(value))
+                    for key, value in _split_label(items or "")
+                )
+                if name or "*" in (source, target) or not features:
+                    raise SBNError(f"Unsupported command: {statement}")
+                commands.append(("add_edge", source, features, target))
+            elif match := re.fullmatch(r"(\w+)\.(\w+)\s*=\s*(.+)", statement):
+                name, feature, expression = match.groups()
+                terms = []
+                for term in re.findall(r'"[^"]*"|[^+"]+', expression):
+                    if not (term := term.strip()):
+                        continue
+                    ref = _FEATURE_REF.fullmatch(term)
+                    if ref and ref.group(1) in names:
+                        terms.append(ref.groups())
+                    else:
+                        terms.append(_strip_quotes(term))
+                commands.append(("set_feat", name, feature, terms))
+            else:
+                raise SBNError(f"Unsupported command: {statement}")
+        return commands
+
+    def match(
+        self, G: RewriteGraph
+    ) -> Optional[Tuple[Dict[str, str], Dict[str, _Edge]]]:
+        """The first match of the pattern without any of its exceptions"""
+        for nodes, edges in self.pattern.matches(G, dict(), dict()):
+            if not any(
+                next(without.matches(G, nodes, edges), None)
+                for without in self.withouts
+            ):
+                return dict(nodes), dict(edges)
+        return None
+
+    def transform(self, G: RewriteGraph, **kwargs) -> Optional[RewriteGraph]:
+        """Apply the rule once, None if the rule does not match"""
+        if (match := self.match(G)) is None:
+            return None
+
+        nodes, edges = match
+        for command, *args in self.commands:
+            if command == "del_node":
+                G.remove_node(nodes.pop(args[0]))
+            elif command == "del_edge":
+                G.remove_edge(edges.pop(args[0]))
+            elif command == "add_node":
+                nodes[args[0]] = G.add_node(args[0])
+            elif command == "add_edge":
+                source, features, target = args
+                G.add_edge(nodes[source], dict(features), nodes[target])
+            elif command == "del_feat":
+                name, feature = args
+                self._features(G, name, nodes, edges).pop(feature, None)
+            else:
+                name, feature, terms = args
+                self._features(G, name, nodes, edges)[feature] = "".join(
+                    term
+                    if isinstance(term, str)
+                    else self._feature(G, *term, nodes, edges)
+                    for term in terms
+                )
+        return G
+
+    def _features(self, G, name, nodes, edges) -> Dict[str, str]:
+        if name in edges:
+            return edges[name].features
+        if name in nodes:
+            return G.nodes[nodes[name]]
+        raise SBNError(f"Rule '{self.name}' uses unknown item '{name}'")
+
+    def _feature(self, G, name, feature, nodes, edges) -> str:
+        features = self._features(G, name, nodes, edges)
+        if feature not in features:
+            raise SBNError(
+                f"Rule '{self.name}' uses missing feature {name}.{feature}"
+            )
+        return features[feature]
+
+
+class GrsRewriter(GraphTransformer):
+    """
+    Native replacement for grew for the rule sets it can fully express (see
+    GrsRule), so no grew process is needed and the graphs never have to be
+    serialized. The strategies follow grew, but only a single result is
+    computed: where grew would pick one of several normal forms (Iter,
+    Pick), the first match in node order is used.
+    """
+
+    STRAT_OPERATORS = ("Pick", "Iter", "Onf", "Try", "Seq", "Alt")
+
+    def __init__(
+        self,
+        grs_path: PathLike = Config.GRS_PATH,
+        language: Optional[Config.SUPPORTED_LANGUAGES] = None,
+    ) -> None:
+        self.rules: Dict[str, GrsRule] = dict()
+        self.packages: Dict[str, List[str]] = dict()
+        self.strats: Dict[str, _STRAT] = dict()
+
+        for name, body in grs_rules(grs_path, language).items():
+            if name.startswith(STRAT_PREFIX):
+                self.strats[name[len(STRAT_PREFIX) :]] = self._parse_strat(
+                    body
+                )
+                continue
+            self.rules[name] = GrsRule(name, body)
+            if "." in name:
+                self.packages.setdefault(name.split(".")[0], []).append(name)
+
+    def run(
+        self, grew_graph: GREW_GRAPH, strat: str = "main"
+    ) -> List[GREW_GRAPH]:
+        """
+        Rewrite a grew graph like 'grew.run' does: the result is a list with
+        the rewritten graph, or an empty list when the strategy fails. Both
+        a strategy name and a strategy expression can be used.
+        """
+        G = RewriteGraph.from_grew(grew_graph)
+        expression = self.strats.get(strat) or self._parse_strat(strat)
+        if self._run(expression, G) is None:
+            return []
+        return [G.to_grew()]
+
+    def transform(
+        self, G: RewriteGraph, strat: str = "main", **kwargs
+    ) -> RewriteGraph:
+        if self._run(self.strats[strat], G) is None:
+            raise SBNError(f"Strategy '{strat}' failed")
+        return G
+
+    def _run(self, strat: _STRAT, G: RewriteGraph) -> Optional[bool]:
+        """
+        Run a strategy on the graph in place. The result is None if the
+        strategy failed and otherwise whether the graph changed.
+        """
+        operator, args = strat
+        if operator == "":
+            if args in self.rules:
+                return None if self.rules[args].transform(G) is None else True
+            if args in self.packages:
+                return self._run(
+                    ("Alt", [("", rule) for rule in self.packages[args]]), G
+                )
+            if args in self.strats:
+                return self._run(self.strats[args], G)
+            raise SBNError(f"Unknown rule or strategy '{args}'")
+
+        if operator == "Pick":
+            return self._run(args[0], G)
+        if operator == "Try":
+            return self._run(args[0], G) or False
+        if operator in ("Iter", "Onf"):
+            changed = False
+            for _ in range(MAX_REWRITE_STEPS):
+                if not self._run(args[0], G):
+                    return changed
+                changed = True
+            raise SBNError(f"No normal form after {MAX_REWRITE_STEPS} steps")
+        if operator == "Alt":
+            for arg in args:
+                if (result := self._run(arg, G)) is not None:
+                    return result
+            return None
+
+        # Seq, a failing step fails the whole sequence, so the graph has to
+        # be restored when that can happen.
+        backup = G.copy() if any(map(self._can_fail, args)) else None
+        changed = False
+        for arg in args:
+            if (result := self._run(arg, G)) is None:
+                G.restore(backup)
+                return None
+            changed = changed or result
+        return changed
+
+    def _can_fail(self, strat: _STRAT) -> bool:
+        operator, args = strat
+        if operator in ("Iter", "Onf", "Try"):
+            return False
+        if operator == "":
+            return args not in self.strats or self._can_fail(self.strats[args])
+        return any(map(self._can_fail, args))
+
+    @classmethod
+    def _parse_strat(cls, strat_str: str) -> _STRAT:
+        tokens = re.findall(r"[\w.$]+|[(),]|\S", strat_str)
+        strat, end = cls._parse_strat_tokens(tokens, 0)
+        if end != len(tokens):
+            raise SBNError(f"Unsupported strategy: {strat_str.strip()}")
+        return strat
+
+    @classmethod
+    def _parse_strat_tokens(
+        cls, tokens: List[str], idx: int
+    ) -> Tuple[_STRAT, int]:
+        if idx >= len(tokens) or not re.fullmatch(r"[\w.]+", tokens[idx]):
+            raise SBNError(f"Unsupported strategy near: {tokens[idx:]}")
+
+        name = tokens[idx]
+        if idx + 1 >= len(tokens) or tokens[idx + 1] != "(":
+            return ("", name), idx + 1
+        if name not in cls.STRAT_OPERATORS:
+            raise SBNError(f"Unsupported strategy operator: {name}")
+
+        args, idx = [], idx + 2
+        while idx < len(tokens) and tokens[idx] != ")":
+            arg, idx = cls._parse_strat_tokens(tokens, idx)
+            args.append(arg)
+            if idx < len(tokens) and tokens[idx] == ",":
+                idx += 1
+        if idx >= len(tokens) or not args:
+            raise SBNError(f"Unsupported strategy near: {tokens}")
+        return (name, args), idx + 1
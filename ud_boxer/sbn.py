@@ -1,16 +1,18 @@
 from __future__ import annotations
 
 import logging
-from copy import deepcopy
+from array import array
 from os import PathLike
 from pathlib import Path
+from sys import intern
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 import networkx as nx
 import penman
 
 from ud_boxer.base import BaseEnum, BaseGraph
-from ud_boxer.graph_resolver import GraphResolver
+from ud_boxer.config import Config
+from ud_boxer.graph_resolver import GraphResolver, get_resolver
 from ud_boxer.misc import ensure_ext
 from ud_boxer.penman_model import pm_model
 from ud_boxer.sbn_spec import (
@@ -25,10 +27,9 @@ from ud_boxer.sbn_spec import (
 
 logger = logging.getLogger(__name__)
 
-RESOLVER = GraphResolver()
-
 __all__ = [
     "SBN_ID",
+    "SBNDocument",
     "SBNGraph",
     "sbn_graphs_are_isomorphic",
 ]
@@ -38,6 +39,27 @@ __all__ = [
 # document.
 SBN_ID = Tuple[Union[SBN_NODE_TYPE, SBN_EDGE_TYPE], int]
 
+# The enum repr is relatively expensive and ids are converted to strings for
+# every node and edge that gets created, so cache the type part.
+_TYPE_REPR = {t: repr(t) for t in [*SBN_NODE_TYPE, *SBN_EDGE_TYPE]}
+
+
+def _id_to_str(_id: SBN_ID) -> str:
+    """Same as str(_id), but without the repeated enum repr calls."""
+    return f"({_TYPE_REPR[_id[0]]}, {_id[1]})"
+
+
+# Integer codes for the node and edge types, used by the SBNDocument arrays.
+_NODE_TYPES = tuple(SBN_NODE_TYPE)
+_EDGE_TYPES = tuple(SBN_EDGE_TYPE)
+_NODE_CODES = {t: code for code, t in enumerate(_NODE_TYPES)}
+_EDGE_CODES = {t: code for code, t in enumerate(_EDGE_TYPES)}
+_SYNSET = _NODE_CODES[SBN_NODE_TYPE.SYNSET]
+_CONSTANT = _NODE_CODES[SBN_NODE_TYPE.CONSTANT]
+_BOX = _NODE_CODES[SBN_NODE_TYPE.BOX]
+_ROLE = _EDGE_CODES[SBN_EDGE_TYPE.ROLE]
+_BOX_CONNECT = _EDGE_CODES[SBN_EDGE_TYPE.BOX_CONNECT]
+
 
 class SBNSource(BaseEnum):
     # The SBNGraph is created from an SBN file that comes from the PMB directly
@@ -70,200 +92,22 @@ class SBNGraph(BaseGraph):
 
     def from_string(self, input_string: str) -> SBNGraph:
         """Construct a graph from a single SBN string."""
-        # Determine if we're dealing with an SBN file with newlines (from the
-        # PMB for instance) or without (from neural output).
-        if "\n" not in input_string:
-            input_string = split_single(input_string)
-
-        lines = split_comments(input_string)
-
-        if not lines:
-            raise SBNError(
-                "SBN doc appears to be empty, cannot read from string"
-            )
-
-        self.__init_type_indices()
-
-        starting_box = self.create_node(
-            SBN_NODE_TYPE.BOX, self._active_box_token
-        )
-
-        nodes, edges = [starting_box], []
-
-        max_wn_idx = len(lines) - 1
-
-        for sbn_line, comment in lines:
-            tokens = sbn_line.split()
-
-            tok_count = 0
-            while len(tokens) > 0:
-                # Try to 'consume' all tokens from left to right
-                token: str = tokens.pop(0)
-
-                # No need to check all tokens for this since only the first
-                # might be a sense id.
-                if tok_count == 0 and (
-                    synset_match := SBNSpec.SYNSET_PATTERN.match(token)
-                ):
-                    synset_node = self.create_node(
-                        SBN_NODE_TYPE.SYNSET,
-                        token,
-                        {
-                            "wn_lemma": synset_match.group(1),
-                            "wn_pos": synset_match.group(2),
-                            "wn_id": synset_match.group(3),
-                            "comment": comment,
-                        },
-                    )
-                    box_edge = self.create_edge(
-                        self._active_box_id,
-                        self._active_synset_id,
-                        SBN_EDGE_TYPE.BOX_CONNECT,
-                    )
-
-                    nodes.append(synset_node)
-                    edges.append(box_edge)
-                elif token in SBNSpec.NEW_BOX_INDICATORS:
-                    # In the entire dataset there are no indices for box
-                    # references other than -1. Maybe they are needed later and
-                    # the exception triggers if something different comes up.
-                    if not tokens:
-                        raise SBNError(
-                            f"Missing box index in line: {sbn_line}"
-                        )
-
-                    if (box_index := self._try_parse_idx(tokens.pop(0))) != -1:
-                        raise SBNError(
-                            f"Unexpected box index found '{box_index}'"
-                        )
-
-                    current_box_id = self._active_box_id
-
-                    # Connect the current box to the one indicated by the index
-                    new_box = self.create_node(
-                        SBN_NODE_TYPE.BOX, self._active_box_token
-                    )
-                    box_edge = self.create_edge(
-                        current_box_id,
-                        self._active_box_id,
-                        SBN_EDGE_TYPE.BOX_BOX_CONNECT,
-                        token,
-                    )
-
-                    nodes.append(new_box)
-                    edges.append(box_edge)
-                elif (is_role := token in SBNSpec.ROLES) or (
-                    token in SBNSpec.DRS_OPERATORS
-                ):
-                    if not tokens:
-                        raise SBNError(
-                            f"Missing target for '{token}' in line {sbn_line}"
-                        )
-
-                    target = tokens.pop(0)
-                    edge_type = (
-                        SBN_EDGE_TYPE.ROLE
-                        if is_role
-                        else SBN_EDGE_TYPE.DRS_OPERATOR
-                    )
-
-                    if index_match := SBNSpec.INDEX_PATTERN.match(target):
-                        idx = self._try_parse_idx(index_match.group(0))
-                        active_id = self._active_synset_id
-                        target_idx = active_id[1] + idx
-                        to_id = (active_id[0], target_idx)
-
-                        if SBNSpec.MIN_SYNSET_IDX <= target_idx <= max_wn_idx:
-                            role_edge = self.create_edge(
-                                self._active_synset_id,
-                                to_id,
-                                edge_type,
-                                token,
-                            )
-
-                            edges.append(role_edge)
-                        else:
-                            # A special case where a constant looks like an idx
-                            # Example:
-                            # pmb-4.0.0/data/en/silver/p15/d3131/en.drs.sbn
-                            # This is detected by checking if the provided
-                            # index points at an 'impossible' line (synset) in
-                            # the file.
-
-                            # NOTE: we have seen that the neural parser does
-                            # this very (too) frequently, resulting in arguably
-                            # ill-formed graphs.
-                            self.is_possibly_ill_formed = True
-
-                            const_node = self.create_node(
-                                SBN_NODE_TYPE.CONSTANT,
-                                target,
-                                {"comment": comment},
-                            )
-                            role_edge = self.create_edge(
-                                self._active_synset_id,
-                                const_node[0],
-                                edge_type,
-                                token,
-                            )
-                            nodes.append(const_node)
-                            edges.append(role_edge)
-                    elif SBNSpec.NAME_CONSTANT_PATTERN.match(target):
-                        name_parts = [target]
-
-                        # Some names contain whitspace and need to be
-                        # reconstructed
-                        while not target.endswith('"'):
-                            target = tokens.pop(0)
-                            name_parts.append(target)
-
-                        # This is faster than constantly creating new strings
-                        name = " ".join(name_parts)
-
-                        name_node = self.create_node(
-                            SBN_NODE_TYPE.CONSTANT,
-                            name,
-                            {"comment": comment},
-                        )
-                        role_edge = self.create_edge(
-                            self._active_synset_id,
-                            name_node[0],
-                            SBN_EDGE_TYPE.ROLE,
-                            token,
-                        )
-
-                        nodes.append(name_node)
-                        edges.append(role_edge)
-                    else:
-                        const_node = self.create_node(
-                            SBN_NODE_TYPE.CONSTANT,
-                            target,
-                            {"comment": comment},
-                        )
-                        role_edge = self.create_edge(
-                            self._active_synset_id,
-                            const_node[0],
-                            SBN_EDGE_TYPE.ROLE,
-                            token,
-                        )
-
-                        nodes.append(const_node)
-                        edges.append(role_edge)
-                else:
-                    raise SBNError(
-                        f"Invalid token found '{token}' in line: {sbn_line}"
-                    )
-                tok_count += 1
-
-        self.add_nodes_from(nodes)
-        self.add_edges_from(edges)
-
-        self._check_is_dag()
+        return SBNDocument.from_string(input_string)._fill_graph(self)
 
-        return self
-
-    def from_grew(self, grew_graph: Dict[str, List[Any]]) -> SBNGraph:
-        """Create an SBNGraph from a grew output format graph."""
+    def from_grew(
+        self,
+        grew_graph: Dict[str, List[Any]],
+        language: Config.SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES.EN,
+        edge_clf: bool = False,
+    ) -> SBNGraph:
+        """
+        Create an SBNGraph from a grew output format graph. The nodes and
+        edges are resolved with the mappings and lookups of the language,
+        and optionally with the edge classifier of the language.
+        """
+        resolver = get_resolver(language, edge_clf)
+        # Classify all edges of the graph at once instead of one by one.
+        resolver.predict_grew_edges([grew_graph])
         self.__init_type_indices()
 
         starting_box = self.create_node(
@@ -277,7 +121,7 @@ class SBNGraph(BaseGraph):
         # the current graph ids.
         for grew_node_id, (node_data, _) in grew_graph.items():
             node_data['token_id'] = grew_node_id
-            node_components = RESOLVER.node_token_type(node_data)
+            node_components = resolver.node_token_type(node_data)
             node = self.create_node(*node_components)
             id_mapping[grew_node_id] = node[0]
             nodes.append(node)
@@ -288,6 +132,8 @@ class SBNGraph(BaseGraph):
         # to connect the new box. This only considers the starting box as
         # a starting point. Other box constructions are not supported currently
         box_count = self.type_indices[SBN_NODE_TYPE.BOX]
+        # The time role depends on all nodes, resolve it once for all edges.
+        time_role = resolver.time_role(self.nodes)
         for grew_from_node_id, (_, grew_edges) in grew_graph.items():
             from_id = id_mapping[grew_from_node_id]
             from_type = from_id[0]
@@ -313,11 +159,12 @@ class SBNGraph(BaseGraph):
 
             for edge_name, grew_to_node_id in grew_edges:
                 to_id = id_mapping[grew_to_node_id]
-                edge_components = RESOLVER.edge_token_type(
+                edge_components = resolver.edge_token_type(
                     edge_name,
                     self.nodes,
                     from_id,
                     to_id,
+                    time_role,
                 )
 
                 edge = self.create_edge(from_id, to_id, *edge_components)
@@ -339,15 +186,16 @@ class SBNGraph(BaseGraph):
     ):
         """Create an edge, if no token is provided, the id will be used."""
         edge_id = self._id_for_type(type)
+        edge_id_str = _id_to_str(edge_id)
         meta = meta or dict()
         return (
             from_node_id,
             to_node_id,
             {
-                "_id": str(edge_id),
+                "_id": edge_id_str,
                 "type": type,
                 "type_idx": edge_id[1],
-                "token": token or str(edge_id),
+                "token": token or edge_id_str,
                 **meta,
             },
         )
@@ -360,14 +208,15 @@ class SBNGraph(BaseGraph):
     ):
         """Create a node, if no token is provided, the id will be used."""
         node_id = self._id_for_type(type)
+        node_id_str = _id_to_str(node_id)
         meta = meta or dict()
         return (
             node_id,
             {
-                "_id": str(node_id),
+                "_id": node_id_str,
                 "type": type,
                 "type_idx": node_id[1],
-                "token": token or str(node_id),
+                "token": token or node_id_str,
                 **meta,
             },
         )
@@ -515,19 +364,28 @@ class SBNGraph(BaseGraph):
         return sbn_string
 
     def to_penman(
-        self, path: PathLike, evaluate_sense: bool = True, strict: bool = True
+        self,
+        path: PathLike,
+        evaluate_sense: bool = True,
+        strict: bool = True,
+        validate: bool = True,
     ) -> PathLike:
         """
         Writes the SBNGraph to a file in Penman (AMR-like) format.
 
-        See `to_penman_string` for an explanation of `strict`.
+        See `to_penman_string` for an explanation of `strict` and `validate`.
         """
         final_path = ensure_ext(path, ".penman")
-        final_path.write_text(self.to_penman_string(evaluate_sense, strict))
+        final_path.write_text(
+            self.to_penman_string(evaluate_sense, strict, validate)
+        )
         return final_path
 
     def to_penman_string(
-        self, evaluate_sense: bool = True, strict: bool = True
+        self,
+        evaluate_sense: bool = True,
+        strict: bool = True,
+        validate: bool = True,
     ) -> str:
         """
         Creates a string in Penman (AMR-like) format from the SBNGraph.
@@ -547,10 +405,32 @@ class SBNGraph(BaseGraph):
         also ill-formed, but these are not even allowed to be exported to
         Penman.
 
+        The 'validate' option decodes the result again with penman and checks
+        it against the SBN Penman model. This is relatively expensive, so it
+        can be disabled when the output is checked later on anyway (by mtool
+        for instance). Checking if all edges ended up in the output is always
+        done.
+
         FIXME: the DRS/SBN constants technically don't need a variable. As long
         as this is consistent between the gold and generated data, it's not a
         problem.
         """
+        penman_str, penman_no_sense_str = self.to_penman_variants(
+            strict, validate
+        )
+        return penman_str if evaluate_sense else penman_no_sense_str
+
+    def to_penman_variants(
+        self, strict: bool = True, validate: bool = True
+    ) -> Tuple[str, str]:
+        """
+        Creates the Penman strings with and without the sense number in a
+        single traversal of the graph. The variables, the traversal and the
+        validation are shared, so this is cheaper than calling
+        `to_penman_string` twice. See `to_penman_string` for the options.
+
+        Returns (<penman with sense>, <penman without sense>)
+        """
         if not self.is_dag:
             raise SBNError(
                 "Exporting a cyclic SBN graph to Penman is not possible."
@@ -562,93 +442,130 @@ class SBNGraph(BaseGraph):
                 "exported."
             )
 
-        # Make a copy just in case since strange side-effects such as token
-        # changes are no fun to debug.
-        G = deepcopy(self)
-
-        prefix_map = {
-            SBN_NODE_TYPE.BOX: ["b", 0],
-            SBN_NODE_TYPE.CONSTANT: ["c", 0],
-            SBN_NODE_TYPE.SYNSET: ["s", 0],
-        }
-
-        for node_id, node_data in G.nodes.items():
-            pre, count = prefix_map[node_data["type"]]
-            prefix_map[node_data["type"]][1] += 1  # type: ignore
-            G.nodes[node_id]["var_id"] = f"{pre}{count}"
-
-            # A box is always an instance of the same type (or concept), the
-            # specification of what that type does is shown by the
-            # box-box-connection, such as NEGATION or EXPLANATION.
-            if node_data["type"] == SBN_NODE_TYPE.BOX:
-                G.nodes[node_id]["token"] = "box"
-
-        for edge in G.edges:
-            # Add a proper token to the box connectors
-            if G.edges[edge]["type"] == SBN_EDGE_TYPE.BOX_CONNECT:
-                G.edges[edge]["token"] = "member"
-
-        def __to_penman_str(S: SBNGraph, current_n, visited, out_str, tabs):
-            node_data = S.nodes[current_n]
-            var_id = node_data["var_id"]
+        # The variables are kept in a side table, so the graph itself does
+        # not need to be copied and changed.
+        var_ids = self._penman_var_ids()
+        buffer: List[str] = []
+        # Positions of the sense lines in the buffer, these are left out for
+        # the variant without the sense.
+        sense_positions = set()
+        visited = set()
+        n_edges = 0
+
+        def open_node(node_id, tabs: int):
+            """
+            Writes the start of a node and returns its out edges, returns None
+            if the node has been written already (re-entrancy).
+            """
+            var_id = var_ids[node_id]
             if var_id in visited:
-                out_str += var_id
-                return out_str
+                buffer.append(var_id)
+                return None
 
             indents = tabs * "\t"
-            node_tok = node_data["token"]
-            if node_data["type"] == SBN_NODE_TYPE.SYNSET:
+            node_data = self.nodes[node_id]
+            node_type = node_data["type"]
+            if node_type == SBN_NODE_TYPE.SYNSET:
+                node_tok = node_data["token"]
                 if not (components := split_synset_id(node_tok)):
                     raise SBNError(f"Cannot split synset id: {node_tok}")
 
                 lemma, pos, sense = [self.quote(i) for i in components]
 
-                out_str += f'({var_id} / {self.quote("synset")}'
-                out_str += f"\n{indents}:lemma {lemma}"
-                out_str += f"\n{indents}:pos {pos}"
+                buffer.append(f'({var_id} / {self.quote("synset")}')
+                buffer.append(f"\n{indents}:lemma {lemma}")
+                buffer.append(f"\n{indents}:pos {pos}")
 
-                if evaluate_sense:
-                    out_str += f"\n{indents}:sense {sense}"
+                sense_positions.add(len(buffer))
+                buffer.append(f"\n{indents}:sense {sense}")
+            # A box is always an instance of the same type (or concept), the
+            # specification of what that type does is shown by the
+            # box-box-connection, such as NEGATION or EXPLANATION.
+            elif node_type == SBN_NODE_TYPE.BOX:
+                buffer.append(f'({var_id} / {self.quote("box")}')
             else:
-                out_str += f"({var_id} / {self.quote(node_tok)}"
-
-            if S.out_degree(current_n) > 0:
-                for edge_id in S.edges(current_n):
-                    edge_name = S.edges[edge_id]["token"]
-                    if edge_name in SBNSpec.INVERTIBLE_ROLES:
-                        # SMATCH can invert edges that end in '-of'.
-                        # This means that,
-                        #   A -[AttributeOf]-> B
-                        #   B -[Attribute]-> A
-                        # are treated the same, but they need to be in the
-                        # right notation for this to work.
-                        edge_name = edge_name.replace("Of", "-of")
-
-                    _, child_node = edge_id
-                    out_str += f"\n{indents}:{edge_name} "
-                    out_str = __to_penman_str(
-                        S, child_node, visited, out_str, tabs + 1
-                    )
-            out_str += ")"
-            visited.add(var_id)
+                buffer.append(
+                    f'({var_id} / {self.quote(node_data["token"])}'
+                )
 
-            return out_str
+            return iter(self._adj[node_id].items())
 
-        # Assume there always is the starting box to serve as the "root"
+        # Assume there always is the starting box to serve as the "root".
+        # Walk the graph depth first with an explicit stack of
+        # (node, depth, out edges) instead of recursion.
         starting_node = (SBN_NODE_TYPE.BOX, 0)
-        final_result = __to_penman_str(G, starting_node, set(), "", 1)
+        stack = [(starting_node, 1, open_node(starting_node, 1))]
+        while stack:
+            node_id, tabs, out_edges = stack[-1]
+            if (edge := next(out_edges, None)) is None:
+                buffer.append(")")
+                visited.add(var_ids[node_id])
+                stack.pop()
+                continue
+
+            child_node, edge_data = edge
+            n_edges += 1
+
+            # Add a proper token to the box connectors
+            if edge_data["type"] == SBN_EDGE_TYPE.BOX_CONNECT:
+                edge_name = "member"
+            else:
+                edge_name = edge_data["token"]
+
+            if edge_name in SBNSpec.INVERTIBLE_ROLES:
+                # SMATCH can invert edges that end in '-of'.
+                # This means that,
+                #   A -[AttributeOf]-> B
+                #   B -[Attribute]-> A
+                # are treated the same, but they need to be in the
+                # right notation for this to work.
+                edge_name = edge_name.replace("Of", "-of")
+
+            indents = tabs * "\t"
+            buffer.append(f"\n{indents}:{edge_name} ")
+            if child_edges := open_node(child_node, tabs + 1):
+                stack.append((child_node, tabs + 1, child_edges))
+
+        penman_str = "".join(buffer)
+        penman_no_sense_str = "".join(
+            item
+            for pos, item in enumerate(buffer)
+            if pos not in sense_positions
+        )
 
         try:
-            g = penman.decode(final_result)
+            # Nodes that cannot be reached from the starting box are lost.
+            assert n_edges == len(self.edges), "Wrong number of edges"
+
+            # The variants only differ in the sense attributes, so checking
+            # the full one is enough.
+            if validate:
+                g = penman.decode(penman_str)
 
-            if errors := pm_model.errors(g):
-                raise penman.DecodeError(str(errors))
+                if errors := pm_model.errors(g):
+                    raise penman.DecodeError(str(errors))
 
-            assert len(g.edges()) == len(self.edges), "Wrong number of edges"
+                assert len(g.edges()) == n_edges, "Wrong number of edges"
         except (penman.DecodeError, AssertionError) as e:
             raise SBNError(f"Generated Penman output is invalid: {e}")
 
-        return final_result
+        return penman_str, penman_no_sense_str
+
+    def _penman_var_ids(self) -> Dict[SBN_ID, str]:
+        """Penman variable per node: b0, b1, ... s0, s1, ... c0, c1 ..."""
+        prefix_map = {
+            SBN_NODE_TYPE.BOX: ["b", 0],
+            SBN_NODE_TYPE.CONSTANT: ["c", 0],
+            SBN_NODE_TYPE.SYNSET: ["s", 0],
+        }
+
+        var_ids = dict()
+        for node_id, node_data in self.nodes.items():
+            pre, count = prefix_map[node_data["type"]]
+            prefix_map[node_data["type"]][1] += 1  # type: ignore
+            var_ids[node_id] = f"{pre}{count}"
+
+        return var_ids
 
     def __init_type_indices(self):
         self.type_indices = {
@@ -743,6 +660,433 @@ class SBNGraph(BaseGraph):
         }
 
 
+class SBNDocument:
+    """
+    Compact, array-backed representation of an SBN document.
+
+    Nodes and edges are stored in parallel arrays and referred to by their
+    position in those arrays. Tokens are interned, so the roles, operators and
+    synsets that occur over and over again are shared between documents. This
+    makes it a lot cheaper than an SBNGraph to keep many documents in memory
+    or to send them between processes. Use `to_networkx` to get a regular
+    SBNGraph once the graph algorithms are actually needed.
+    """
+
+    __slots__ = (
+        "source",
+        "is_possibly_ill_formed",
+        "node_types",
+        "node_type_indices",
+        "node_tokens",
+        "node_comments",
+        "node_meta",
+        "edge_sources",
+        "edge_targets",
+        "edge_types",
+        "edge_type_indices",
+        "edge_tokens",
+        "edge_meta",
+    )
+
+    def __init__(self, source: SBNSource = SBNSource.UNKNOWN) -> None:
+        self.source = source
+        self.is_possibly_ill_formed: bool = False
+
+        # Node and edge types are stored as codes that index _NODE_TYPES and
+        # _EDGE_TYPES. Together with the type index these make up the SBN_ID.
+        self.node_types = array("b")
+        self.node_type_indices = array("i")
+        # Indices can point at synsets that are never created, networkx then
+        # silently adds an empty node. These nodes have None as token.
+        self.node_tokens: List[Optional[str]] = []
+        self.node_comments: List[Optional[str]] = []
+        # Only filled when the document is built from an SBNGraph, in that
+        # case it contains all non-protected node data.
+        self.node_meta: Optional[List[Optional[Dict[str, Any]]]] = None
+
+        self.edge_sources = array("i")
+        self.edge_targets = array("i")
+        self.edge_types = array("b")
+        self.edge_type_indices = array("i")
+        # None means the edge id is used as token, see `SBNGraph.create_edge`
+        self.edge_tokens: List[Optional[str]] = []
+        self.edge_meta: Optional[List[Optional[Dict[str, Any]]]] = None
+
+    def __len__(self) -> int:
+        return len(self.node_types)
+
+    @classmethod
+    def from_path(
+        cls, path: PathLike, source: SBNSource = SBNSource.UNKNOWN
+    ) -> SBNDocument:
+        """Construct a document from the provided filepath."""
+        return cls.from_string(Path(path).read_text(), source)
+
+    @classmethod
+    def from_string(
+        cls, input_string: str, source: SBNSource = SBNSource.UNKNOWN
+    ) -> SBNDocument:
+        """Construct a document from a single SBN string."""
+        # Determine if we're dealing with an SBN file with newlines (from the
+        # PMB for instance) or without (from neural output).
+        if "\n" not in input_string:
+            input_string = split_single(input_string)
+
+        lines = split_comments(input_string)
+
+        if not lines:
+            raise SBNError(
+                "SBN doc appears to be empty, cannot read from string"
+            )
+
+        doc = cls(source)
+        node_counts = [0] * len(_NODE_TYPES)
+        edge_counts = [0] * len(_EDGE_TYPES)
+        # While parsing, edges point at (type code, type index) pairs since
+        # an index can refer to a synset that does not exist yet.
+        edge_keys: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
+
+        def add_node(
+            code: int, token: str, comment: Optional[str] = None
+        ) -> Tuple[int, int]:
+            type_idx = node_counts[code]
+            node_counts[code] += 1
+            doc.node_types.append(code)
+            doc.node_type_indices.append(type_idx)
+            doc.node_tokens.append(intern(token))
+            doc.node_comments.append(comment)
+            return code, type_idx
+
+        def add_edge(
+            from_key: Tuple[int, int],
+            to_key: Tuple[int, int],
+            code: int,
+            token: Optional[str] = None,
+        ):
+            doc.edge_types.append(code)
+            doc.edge_type_indices.append(edge_counts[code])
+            doc.edge_tokens.append(intern(token) if token else None)
+            edge_counts[code] += 1
+            edge_keys.append((from_key, to_key))
+
+        def active_key(code: int) -> Tuple[int, int]:
+            return code, node_counts[code] - 1
+
+        add_node(_BOX, "B-0")
+
+        max_wn_idx = len(lines) - 1
+
+        for sbn_line, comment in lines:
+            # Single pass over the tokens of the line, 'consuming' them from
+            # left to right by moving a cursor instead of popping from the
+            # front of the list.
+            tokens = sbn_line.split()
+            n_tokens = len(tokens)
+            cursor = 0
+
+            while cursor < n_tokens:
+                token: str = tokens[cursor]
+                cursor += 1
+
+                # No need to check all tokens for this since only the first
+                # might be a sense id.
+                if cursor == 1 and SBNSpec.SYNSET_PATTERN.match(token):
+                    synset_key = add_node(_SYNSET, token, comment)
+                    add_edge(active_key(_BOX), synset_key, _BOX_CONNECT)
+                    continue
+
+                token_type = SBNSpec.TOKEN_TYPES.get(token)
+                if token_type is None:
+                    raise SBNError(
+                        f"Invalid token found '{token}' in line: {sbn_line}"
+                    )
+
+                if cursor == n_tokens:
+                    if token_type == SBN_EDGE_TYPE.BOX_BOX_CONNECT:
+                        raise SBNError(
+                            f"Missing box index in line: {sbn_line}"
+                        )
+                    raise SBNError(
+                        f"Missing target for '{token}' in line {sbn_line}"
+                    )
+
+                target = tokens[cursor]
+                cursor += 1
+                edge_code = _EDGE_CODES[token_type]
+
+                if token_type == SBN_EDGE_TYPE.BOX_BOX_CONNECT:
+                    # In the entire dataset there are no indices for box
+                    # references other than -1. Maybe they are needed later and
+                    # the exception triggers if something different comes up.
+                    if (box_index := SBNGraph._try_parse_idx(target)) != -1:
+                        raise SBNError(
+                            f"Unexpected box index found '{box_index}'"
+                        )
+
+                    # Connect the current box to the one indicated by the index
+                    current_box_key = active_key(_BOX)
+                    new_box_key = add_node(_BOX, f"B-{node_counts[_BOX]}")
+                    add_edge(current_box_key, new_box_key, edge_code, token)
+                elif target[0] in "+-" and (
+                    index_match := SBNSpec.INDEX_PATTERN.match(target)
+                ):
+                    idx = SBNGraph._try_parse_idx(index_match.group(0))
+                    active_synset_key = active_key(_SYNSET)
+                    target_idx = active_synset_key[1] + idx
+
+                    if SBNSpec.MIN_SYNSET_IDX <= target_idx <= max_wn_idx:
+                        add_edge(
+                            active_synset_key,
+                            (_SYNSET, target_idx),
+                            edge_code,
+                            token,
+                        )
+                    else:
+                        # A special case where a constant looks like an idx
+                        # Example:
+                        # pmb-4.0.0/data/en/silver/p15/d3131/en.drs.sbn
+                        # This is detected by checking if the provided
+                        # index points at an 'impossible' line (synset) in
+                        # the file.
+
+                        # NOTE: we have seen that the neural parser does
+                        # this very (too) frequently, resulting in arguably
+                        # ill-formed graphs.
+                        doc.is_possibly_ill_formed = True
+
+                        const_key = add_node(_CONSTANT, target, comment)
+                        add_edge(
+                            active_synset_key, const_key, edge_code, token
+                        )
+                else:
+                    # Equivalent to NAME_CONSTANT_PATTERN, but without the
+                    # regex call for every target.
+                    if target[0] == '"' and len(target) > 1:
+                        name_start = cursor - 1
+
+                        # Some names contain whitspace and need to be
+                        # reconstructed, move the cursor to the closing quote.
+                        while not tokens[cursor - 1].endswith('"'):
+                            if cursor == n_tokens:
+                                raise SBNError(
+                                    f"Unterminated name constant in line: "
+                                    f"{sbn_line}"
+                                )
+                            cursor += 1
+
+                        target = " ".join(tokens[name_start:cursor])
+
+                    # NOTE: constants are always connected with a role, also
+                    # when the token is a DRS operator.
+                    active_synset_key = active_key(_SYNSET)
+                    const_key = add_node(_CONSTANT, target, comment)
+                    add_edge(active_synset_key, const_key, _ROLE, token)
+
+        doc._resolve_edge_keys(edge_keys)
+
+        return doc
+
+    @classmethod
+    def from_grew(
+        cls,
+        grew_graph: Dict[str, List[Any]],
+        source: SBNSource = SBNSource.GREW,
+        language: Config.SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES.EN,
+        edge_clf: bool = False,
+    ) -> SBNDocument:
+        """
+        Construct a document from a grew output format graph, see
+        'SBNGraph.from_grew'.
+        """
+        return cls.from_graph(
+            SBNGraph(source=source).from_grew(grew_graph, language, edge_clf)
+        )
+
+    @classmethod
+    def from_graph(cls, G: SBNGraph) -> SBNDocument:
+        """Construct a document from an existing SBNGraph."""
+        doc = cls(G.source)
+        doc.is_possibly_ill_formed = G.is_possibly_ill_formed
+        doc.node_meta, doc.edge_meta = [], []
+
+        node_positions: Dict[SBN_ID, int] = dict()
+        for node_id, node_data in G.nodes.items():
+            node_positions[node_id] = len(doc.node_types)
+            doc.node_types.append(_NODE_CODES[node_id[0]])
+            doc.node_type_indices.append(node_id[1])
+            token = node_data.get("token")
+            doc.node_tokens.append(intern(token) if token else None)
+            doc.node_comments.append(node_data.get("comment"))
+            doc.node_meta.append(_strip_protected(node_data))
+
+        for (from_id, to_id), edge_data in G.edges.items():
+            doc.edge_sources.append(node_positions[from_id])
+            doc.edge_targets.append(node_positions[to_id])
+            doc.edge_types.append(_EDGE_CODES[edge_data["type"]])
+            doc.edge_type_indices.append(edge_data["type_idx"])
+            doc.edge_tokens.append(intern(edge_data["token"]))
+            doc.edge_meta.append(_strip_protected(edge_data))
+
+        return doc
+
+    def to_networkx(self) -> SBNGraph:
+        """Build a regular (networkx based) SBNGraph from the document."""
+        return self._fill_graph(SBNGraph(source=self.source))
+
+    @property
+    def is_dag(self) -> bool:
+        """Check for cycles directly on the arrays (Kahn's algorithm)."""
+        successors: List[List[int]] = [[] for _ in self.node_types]
+        in_degree = [0] * len(self.node_types)
+        for from_pos, to_pos in zip(self.edge_sources, self.edge_targets):
+            successors[from_pos].append(to_pos)
+            in_degree[to_pos] += 1
+
+        queue = [pos for pos, degree in enumerate(in_degree) if degree == 0]
+        visited = 0
+        while queue:
+            pos = queue.pop()
+            visited += 1
+            for succ in successors[pos]:
+                in_degree[succ] -= 1
+                if in_degree[succ] == 0:
+                    queue.append(succ)
+
+        return visited == len(self.node_types)
+
+    def _node_id(self, pos: int) -> SBN_ID:
+        return (
+            _NODE_TYPES[self.node_types[pos]],
+            self.node_type_indices[pos],
+        )
+
+    def _resolve_edge_keys(
+        self, edge_keys: List[Tuple[Tuple[int, int], Tuple[int, int]]]
+    ):
+        """
+        Convert the (type code, type index) edge endpoints to positions in
+        the node arrays. Endpoints that do not exist are added as empty nodes
+        in order of appearance, which is exactly what networkx does.
+        """
+        positions = {
+            key: pos
+            for pos, key in enumerate(
+                zip(self.node_types, self.node_type_indices)
+            )
+        }
+
+        def position(key: Tuple[int, int]) -> int:
+            if (pos := positions.get(key)) is None:
+                pos = positions[key] = len(self.node_types)
+                self.node_types.append(key[0])
+                self.node_type_indices.append(key[1])
+                self.node_tokens.append(None)
+                self.node_comments.append(None)
+            return pos
+
+        for from_key, to_key in edge_keys:
+            self.edge_sources.append(position(from_key))
+            self.edge_targets.append(position(to_key))
+
+    def _fill_graph(self, G: SBNGraph) -> SBNGraph:
+        """Add all nodes and edges of the document to the provided graph."""
+        node_ids = [self._node_id(pos) for pos in range(len(self))]
+
+        nodes = []
+        for pos, node_id in enumerate(node_ids):
+            if (token := self.node_tokens[pos]) is None:
+                nodes.append((node_id, dict()))
+                continue
+
+            node_type, type_idx = node_id
+            if self.node_meta is not None:
+                meta = self.node_meta[pos] or dict()
+            elif node_type == SBN_NODE_TYPE.SYNSET:
+                lemma, pos_tag, sense = split_synset_id(token)  # type: ignore
+                meta = {
+                    "wn_lemma": lemma,
+                    "wn_pos": pos_tag,
+                    "wn_id": sense,
+                    "comment": self.node_comments[pos],
+                }
+            elif node_type == SBN_NODE_TYPE.CONSTANT:
+                meta = {"comment": self.node_comments[pos]}
+            else:
+                meta = dict()
+
+            nodes.append(
+                (
+                    node_id,
+                    {
+                        "_id": _id_to_str(node_id),
+                        "type": node_type,
+                        "type_idx": type_idx,
+                        "token": token,
+                        **meta,
+                    },
+                )
+            )
+
+        edges = []
+        for pos, (from_pos, to_pos) in enumerate(
+            zip(self.edge_sources, self.edge_targets)
+        ):
+            edge_type = _EDGE_TYPES[self.edge_types[pos]]
+            type_idx = self.edge_type_indices[pos]
+            edge_id_str = _id_to_str((edge_type, type_idx))
+            meta = (self.edge_meta[pos] if self.edge_meta else None) or {}
+            edges.append(
+                (
+                    node_ids[from_pos],
+                    node_ids[to_pos],
+                    {
+                        "_id": edge_id_str,
+                        "type": edge_type,
+                        "type_idx": type_idx,
+                        "token": self.edge_tokens[pos] or edge_id_str,
+                        **meta,
+                    },
+                )
+            )
+
+        G.add_nodes_from(nodes)
+        G.add_edges_from(edges)
+
+        # Keep the id counters in sync, so nodes and edges can be added to
+        # the graph later on (when merging for instance).
+        # Duplicate edges are merged by networkx, so use the highest index
+        # instead of counting.
+        G.type_indices = {
+            **{t: 0 for t in _NODE_TYPES},
+            **{t: 0 for t in _EDGE_TYPES},
+        }
+        for pos, token in enumerate(self.node_tokens):
+            if token is not None:
+                node_type, type_idx = node_ids[pos]
+                G.type_indices[node_type] = max(
+                    G.type_indices[node_type], type_idx + 1
+                )
+        for code, type_idx in zip(self.edge_types, self.edge_type_indices):
+            edge_type = _EDGE_TYPES[code]
+            G.type_indices[edge_type] = max(
+                G.type_indices[edge_type], type_idx + 1
+            )
+
+        G.is_possibly_ill_formed = self.is_possibly_ill_formed
+        G._check_is_dag()
+
+        return G
+
+
+def _strip_protected(item_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    meta = {
+        k: v
+        for k, v in item_data.items()
+        if k not in GraphResolver.PROTECTED_FIELDS
+    }
+    return meta or None
+
+
 def sbn_graphs_are_isomorphic(A: SBNGraph, B: SBNGraph) -> bool:
     """
     Checks if two SBNGraphs are isomorphic this is based on node and edge
@@ -13,7 +13,7 @@ There are some know issues with SBN that are being looked at:
 import re
 from os import PathLike
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from ud_boxer.base import BaseEnum
 
@@ -23,7 +23,9 @@ __all__ = [
     "SBNError",
     "SBNSpec",
     "split_comments",
+    "split_single",
     "split_synset_id",
+    "is_synset_token",
     "get_doc_id",
 ]
 
@@ -201,6 +203,16 @@ class SBNSpec:
     INDEX_PATTERN = re.compile(r"((-|\+)\d)")
     NAME_CONSTANT_PATTERN = re.compile(r"\"(.+)\"|\"(.+)")
 
+    # Token class table, maps every reserved (non-synset) token to the edge
+    # type it introduces. This way the tokenizer only needs a single dict
+    # lookup per token instead of checking all sets in turn. The sets above
+    # are disjoint, so the order of unpacking does not matter.
+    TOKEN_TYPES: Dict[str, SBN_EDGE_TYPE] = {
+        **{k: SBN_EDGE_TYPE.BOX_BOX_CONNECT for k in NEW_BOX_INDICATORS},
+        **{k: SBN_EDGE_TYPE.DRS_OPERATOR for k in DRS_OPERATORS},
+        **{k: SBN_EDGE_TYPE.ROLE for k in ROLES},
+    }
+
     # NOTE: Now roles are properly handled instead of indirectly, but these
     # constant patterns might still be handy.
 
@@ -273,20 +285,33 @@ def split_single(sbn_string: str) -> str:
     Helper to convert SBN that is in a single, flat string (no newlines) into
     separate lines.
     """
-    tokens = sbn_string.split(" ")
-    final_tokens = []
-
-    for token in tokens:
-        if SBNSpec.SYNSET_PATTERN.match(token) or (
-            token in SBNSpec.NEW_BOX_INDICATORS
-        ):
-            token = f"\n{token}"
-        final_tokens.append(token)
+    final_tokens = [
+        f"\n{token}"
+        if (
+            SBNSpec.TOKEN_TYPES.get(token) == SBN_EDGE_TYPE.BOX_BOX_CONNECT
+            or is_synset_token(token)
+        )
+        else token
+        for token in sbn_string.split(" ")
+    ]
 
     final_string = " ".join(final_tokens).strip()
     return final_string
 
 
+def is_synset_token(token: str) -> bool:
+    """
+    Cheap check to see if a token is a WordNet synset. Reserved tokens and
+    tokens without a '.' can never be synsets, so the regex is only used when
+    it can actually match.
+    """
+    return (
+        "." in token
+        and token not in SBNSpec.TOKEN_TYPES
+        and SBNSpec.SYNSET_PATTERN.match(token) is not None
+    )
+
+
 def split_synset_id(syn_id: str) -> Optional[Tuple[str, str, str]]:
     """
     Splits a WordNet synset into its components: lemma, pos, sense_number.
@@ -0,0 +1,282 @@
+import logging
+import multiprocessing as mp
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from multiprocessing.connection import Connection
+from queue import Queue
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from ud_boxer.base import BaseEnum
+from ud_boxer.helpers import (
+    SMATCH_DOC,
+    SMATCH_DOC_COUNTS,
+    aggregate_smatch_counts,
+    mtool_corpus_counts,
+    mtool_score_graphs,
+    smatch_corpus_counts,
+    smatch_score_graphs,
+)
+from ud_boxer.sbn import SBNGraph
+from ud_boxer.sbn_spec import SBNError
+from ud_boxer.smatch import DEFAULT_RESTARTS
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "SMATCH_BACKEND",
+    "DEFAULT_SCORER_TIMEOUT",
+    "SmatchScorer",
+]
+
+# Seconds a worker gets for a single task (a pair or a chunk of documents)
+# before it is considered hanging and replaced.
+DEFAULT_SCORER_TIMEOUT = 600.0
+
+
+class SMATCH_BACKEND(BaseEnum):
+    """SMATCH implementations the scorer workers can run"""
+
+    # The reference scorer, scores are comparable with earlier results.
+    MTOOL = "mtool"
+    # In-process implementation, see 'smatch_score_graphs'.
+    NATIVE = "native"
+
+
+# (pair scoring function, corpus counting function) per backend
+_SCORE_FNS = {
+    SMATCH_BACKEND.MTOOL: (mtool_score_graphs, mtool_corpus_counts),
+    SMATCH_BACKEND.NATIVE: (smatch_score_graphs, smatch_corpus_counts),
+}
+
+
+def _score_worker(conn: Connection, restarts: int, seed: Optional[int]):
+    """
+    Loop of a single scorer process: receive (scoring function, arguments)
+    over the pipe and send back ("ok", result) or ("error", message) until
+    None is received.
+    """
+    while (task := conn.recv()) is not None:
+        score_fn, args = task
+        try:
+            conn.send(("ok", score_fn(*args, restarts, seed)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, ctx, restarts: int, seed: Optional[int]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_score_worker,
+            args=(child_conn, restarts, seed),
+            daemon=True,
+        )
+        self.process.start()
+        # Only the worker should hold its end, otherwise a crash of the
+        # worker is never noticed on this side of the pipe.
+        child_conn.close()
+
+    def run(
+        self, task: Tuple[Callable, Tuple], timeout: Optional[float]
+    ) -> Tuple[str, Any]:
+        self.conn.send(task)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"No smatch result within {timeout}s")
+        return self.conn.recv()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class SmatchScorer:
+    """
+    Score (gold, test) graph pairs or whole splits with SMATCH, at most
+    'workers' at a time. Calls to 'score' are thread-safe, so a scorer can be
+    shared by a ThreadPoolExecutor:
+
+        with SmatchScorer(workers=4) as scorer:
+            scores = scorer.score(gold_penman, G)
+
+    By default the graphs are scored with mtool. mtool cannot be imported
+    here and only reads graphs from files, so every pair (or chunk of a
+    split, see 'corpus_counts') is a new mtool process, started from the
+    calling thread. Such a process is stopped after 'timeout' seconds and
+    a failing process is an SBNError for the pair(s) it was scoring.
+
+    With backend=SMATCH_BACKEND.NATIVE, the graphs are scored by a pool of
+    long-lived processes instead. Workers are started once and then keep
+    receiving pairs over a pipe, which avoids starting a new process for
+    every document. Workers that crash or take longer than 'timeout' are
+    replaced, the pair is retried once on a fresh worker before giving up
+    with an SBNError.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        backend: SMATCH_BACKEND = SMATCH_BACKEND.MTOOL,
+        restarts: int = DEFAULT_RESTARTS,
+        seed: Optional[int] = 42,
+        timeout: Optional[float] = DEFAULT_SCORER_TIMEOUT,
+        retries: int = 1,
+    ):
+        if backend not in _SCORE_FNS:
+            raise SBNError(f"Unsupported smatch backend: {backend}")
+
+        self.n_workers = workers
+        self.backend = SMATCH_BACKEND(backend)
+        self.restarts = restarts
+        self.seed = seed
+        self.timeout = timeout
+        self.retries = retries
+
+        self._ctx = mp.get_context()
+        self._lock = threading.Lock()
+        self._started = False
+        # Idle native workers and all live ones, busy ones included.
+        self._idle: Queue = Queue()
+        self._workers: Set[_Worker] = set()
+        # Limits the number of mtool processes that run at the same time.
+        self._mtool_slots = threading.BoundedSemaphore(workers)
+
+    def __enter__(self) -> "SmatchScorer":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        if self.backend == SMATCH_BACKEND.NATIVE:
+            for _ in range(self.n_workers):
+                self._idle.put(self._new_worker())
+
+    def close(self):
+        """Stop all workers, the ones that are still scoring as well"""
+        with self._lock:
+            self._started = False
+            workers, self._workers = self._workers, set()
+            self._idle = Queue()
+
+        for worker in workers:
+            worker.close()
+
+    def score(
+        self,
+        gold: Union[SBNGraph, str],
+        test: Union[SBNGraph, str],
+    ) -> Dict[str, float]:
+        """
+        Score a test graph against a gold graph, both given as SBNGraphs or
+        Penman strings. The result has the same keys as 'smatch_score'.
+        """
+        if not self._started:
+            raise SBNError("SmatchScorer is not started, use it in a 'with'")
+
+        pair = tuple(
+            G.to_penman_string() if isinstance(G, SBNGraph) else G
+            for G in (gold, test)
+        )
+        score_graphs, _ = _SCORE_FNS[self.backend]
+        return self._run((score_graphs, pair))
+
+    def score_corpus(
+        self, docs: Iterable[SMATCH_DOC], chunk_size: int = 64
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, float]]:
+        """
+        Score all (pmb_id, gold, test) documents of a split, spread over the
+        workers in chunks. The result is the same as 'smatch_score_corpus':
+        the scores per pmb_id and the micro and macro scores of the split.
+        """
+        return aggregate_smatch_counts(self.corpus_counts(docs, chunk_size))
+
+    def corpus_counts(
+        self, docs: Iterable[SMATCH_DOC], chunk_size: int = 64
+    ) -> List[SMATCH_DOC_COUNTS]:
+        """
+        Get the triple counts of all (pmb_id, gold, test) documents, in
+        input order, to aggregate them with 'aggregate_smatch_counts'.
+        """
+        if not self._started:
+            raise SBNError("SmatchScorer is not started, use it in a 'with'")
+
+        _, corpus_counts = _SCORE_FNS[self.backend]
+        docs = iter(docs)
+        chunks = iter(lambda: list(islice(docs, chunk_size)), [])
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            chunk_counts = executor.map(
+                lambda chunk: self._run((corpus_counts, (chunk,))),
+                chunks,
+            )
+            return [doc for counts in chunk_counts for doc in counts]
+
+    def _run(self, task: Tuple[Callable, Tuple]) -> Any:
+        if self.backend == SMATCH_BACKEND.MTOOL:
+            score_fn, args = task
+            with self._mtool_slots:
+                return score_fn(
+                    *args, self.restarts, self.seed, timeout=self.timeout
+                )
+
+        idle = self._idle
+        for _ in range(self.retries + 1):
+            worker = idle.get()
+            try:
+                status, result = worker.run(task, self.timeout)
+            except (EOFError, OSError, TimeoutError) as e:
+                logger.warning(
+                    f"smatch worker {worker.process.pid} failed "
+                    f"(exit code {worker.process.exitcode}), restarting: {e}"
+                )
+                self._discard_worker(worker)
+                worker = self._new_worker()
+                continue
+            finally:
+                idle.put(worker)
+
+            if status == "error":
+                raise SBNError(result)
+            return result
+
+        raise SBNError(
+            f"smatch workers failed {self.retries + 1} times on the same task"
+        )
+
+    def _new_worker(self) -> _Worker:
+        with self._lock:
+            if not self._started:
+                raise SBNError("SmatchScorer was closed")
+            worker = _Worker(self._ctx, self.restarts, self.seed)
+            self._workers.add(worker)
+        return worker
+
+    def _discard_worker(self, worker: _Worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.close()
@@ -0,0 +1,304 @@
+"""
+In-memory SMATCH, scoring two Penman graphs without going through mtool.
+
+The search follows the reference implementation (Cai & Knight, 2013): the
+candidate node mappings and the triples they would match are computed once,
+after which a hill-climbing search over the node mapping is started from a
+'smart' initialization (matching concepts) and a number of random ones. Only
+the random source is scoped to a single call, so with a fixed seed the scores
+are fully reproducible.
+"""
+import random
+from typing import Dict, List, Optional, Tuple, Union
+
+import penman
+
+__all__ = [
+    "SMATCH_TRIPLES",
+    "DEFAULT_RESTARTS",
+    "penman_triples",
+    "smatch_counts",
+    "compute_f",
+]
+
+# mtool uses 20 random restarts on top of the smart initialization
+DEFAULT_RESTARTS = 20
+
+# (instances, attributes, relations) with the variables replaced by indices:
+#   instances:  (node, concept)
+#   attributes: (node, role, value)
+#   relations:  (source node, role, target node)
+SMATCH_TRIPLES = Tuple[
+    List[Tuple[int, str]],
+    List[Tuple[int, str, str]],
+    List[Tuple[int, str, int]],
+]
+
+# Weights per node pair, -1 holds the triples matched by the pair alone,
+# other keys are node pairs that match relation triples together with it.
+_WEIGHTS = Dict[Tuple[int, int], Dict[Union[int, Tuple[int, int]], int]]
+
+
+def _normalize(item: str) -> str:
+    # Like the reference, only a single trailing underscore is removed.
+    item = item.lower()
+    return item[:-1] if item.endswith("_") else item
+
+
+def _strip_quotes(item: str) -> str:
+    if len(item) > 1 and item[0] == item[-1] == '"':
+        return item[1:-1]
+    return item
+
+
+def penman_triples(penman_string: str) -> SMATCH_TRIPLES:
+    """
+    Decode a Penman string into the normalized SMATCH triples. Inverted roles
+    are normalized by penman and, like the reference implementation, the top
+    node gets an additional 'TOP' attribute.
+    """
+    graph = penman.decode(penman_string)
+
+    var_ids = {}
+    instances = []
+    for source, _, target in graph.instances():
+        var_ids[source] = len(var_ids)
+        instances.append((var_ids[source], _normalize(target or "")))
+
+    attributes = [(var_ids[graph.top], "top", "top")] if var_ids else []
+    for source, role, target in graph.attributes():
+        attributes.append(
+            (
+                var_ids[source],
+                _normalize(role.lstrip(":")),
+                _normalize(_strip_quotes(target)),
+            )
+        )
+
+    relations = [
+        (var_ids[source], _normalize(role.lstrip(":")), var_ids[target])
+        for source, role, target in graph.edges()
+    ]
+
+    return instances, attributes, relations
+
+
+def _compute_pool(
+    test: SMATCH_TRIPLES, gold: SMATCH_TRIPLES
+) -> Tuple[List[set], _WEIGHTS]:
+    test_instances, test_attributes, test_relations = test
+    gold_instances, gold_attributes, gold_relations = gold
+
+    candidates = [set() for _ in test_instances]
+    weights: _WEIGHTS = dict()
+
+    def add_single(pair):
+        candidates[pair[0]].add(pair[1])
+        pair_weights = weights.setdefault(pair, {-1: 0})
+        pair_weights[-1] += 1
+
+    for test_node, test_concept in test_instances:
+        for gold_node, gold_concept in gold_instances:
+            if test_concept == gold_concept:
+                add_single((test_node, gold_node))
+
+    for test_node, test_role, test_value in test_attributes:
+        for gold_node, gold_role, gold_value in gold_attributes:
+            if test_role == gold_role and test_value == gold_value:
+                add_single((test_node, gold_node))
+
+    for test_source, test_role, test_target in test_relations:
+        for gold_source, gold_role, gold_target in gold_relations:
+            if test_role != gold_role:
+                continue
+
+            pair_a = (test_source, gold_source)
+            pair_b = (test_target, gold_target)
+            if pair_a == pair_b:
+                add_single(pair_a)
+                continue
+
+            candidates[test_source].add(gold_source)
+            candidates[test_target].add(gold_target)
+            for first, second in ((pair_a, pair_b), (pair_b, pair_a)):
+                pair_weights = weights.setdefault(first, {-1: 0})
+                pair_weights[second] = pair_weights.get(second, 0) + 1
+
+    return candidates, weights
+
+
+def _smart_init(
+    candidates: List[set],
+    test_instances: List[Tuple[int, str]],
+    gold_instances: List[Tuple[int, str]],
+    rng: random.Random,
+) -> List[int]:
+    """Map nodes with the same concept first, others randomly."""
+    used = set()
+    mapping = []
+    no_concept_match = []
+    for node, node_candidates in enumerate(candidates):
+        concept = test_instances[node][1]
+        for candidate in sorted(node_candidates - used):
+            if gold_instances[candidate][1] == concept:
+                used.add(candidate)
+                mapping.append(candidate)
+                break
+        else:
+            if node_candidates:
+                no_concept_match.append(node)
+            mapping.append(-1)
+
+    for node in no_concept_match:
+        mapping[node] = _pick_unused(candidates[node], used, rng)
+
+    return mapping
+
+
+def _random_init(candidates: List[set], rng: random.Random) -> List[int]:
+    used = set()
+    return [_pick_unused(c, used, rng) for c in candidates]
+
+
+def _pick_unused(node_candidates: set, used: set, rng: random.Random) -> int:
+    options = sorted(node_candidates - used)
+    if not options:
+        return -1
+    candidate = options[rng.randrange(len(options))]
+    used.add(candidate)
+    return candidate
+
+
+def _pair_score(
+    pair: Tuple[int, int], mapping: List[int], weights: _WEIGHTS, skip=None
+) -> int:
+    score = 0
+    for key, weight in weights.get(pair, {}).items():
+        if key == -1:
+            score += weight
+        elif key[0] != skip and mapping[key[0]] == key[1]:
+            score += weight
+    return score
+
+
+def _compute_match(mapping: List[int], weights: _WEIGHTS) -> int:
+    match_num = 0
+    for node, gold_node in enumerate(mapping):
+        if gold_node == -1:
+            continue
+        for key, weight in weights.get((node, gold_node), {}).items():
+            if key == -1:
+                match_num += weight
+            # Relation matches are stored for both pairs, count them once.
+            elif key[0] > node and mapping[key[0]] == key[1]:
+                match_num += weight
+    return match_num
+
+
+def _best_step(
+    mapping: List[int],
+    candidates: List[set],
+    weights: _WEIGHTS,
+    n_gold: int,
+) -> Tuple[int, Optional[List[int]]]:
+    """Find the single move or swap in the mapping with the largest gain."""
+    best_gain, best_step = 0, None
+
+    # The mapping is changed in place while scoring and restored afterwards,
+    # this runs for every candidate so copying it adds up quickly.
+    unmatched = set(range(n_gold)).difference(mapping)
+    for node, gold_node in enumerate(mapping):
+        old_score = _pair_score((node, gold_node), mapping, weights)
+        for new_gold_node in sorted(unmatched & candidates[node]):
+            mapping[node] = new_gold_node
+            gain = (
+                _pair_score((node, new_gold_node), mapping, weights)
+                - old_score
+            )
+            if gain > best_gain:
+                best_gain, best_step = gain, {node: new_gold_node}
+        mapping[node] = gold_node
+
+    for node_a in range(len(mapping)):
+        gold_a = mapping[node_a]
+        for node_b in range(node_a + 1, len(mapping)):
+            gold_b = mapping[node_b]
+            # The relation between the two swapped nodes would otherwise be
+            # counted twice.
+            old_score = _pair_score(
+                (node_a, gold_a), mapping, weights
+            ) + _pair_score((node_b, gold_b), mapping, weights, skip=node_a)
+            mapping[node_a], mapping[node_b] = gold_b, gold_a
+            new_score = _pair_score(
+                (node_a, gold_b), mapping, weights
+            ) + _pair_score((node_b, gold_a), mapping, weights, skip=node_a)
+            mapping[node_a], mapping[node_b] = gold_a, gold_b
+
+            if new_score - old_score > best_gain:
+                best_gain = new_score - old_score
+                best_step = {node_a: gold_b, node_b: gold_a}
+
+    if best_step is None:
+        return best_gain, None
+
+    best_mapping = mapping[:]
+    for node, gold_node in best_step.items():
+        best_mapping[node] = gold_node
+
+    return best_gain, best_mapping
+
+
+def smatch_counts(
+    test: SMATCH_TRIPLES,
+    gold: SMATCH_TRIPLES,
+    restarts: int = DEFAULT_RESTARTS,
+    seed: Optional[int] = 42,
+) -> Tuple[int, int, int]:
+    """
+    Find the best node mapping between 'test' and 'gold' and return the
+    (matching, test, gold) triple counts. The first search starts from the
+    smart initialization, followed by 'restarts' random initializations.
+    """
+    candidates, weights = _compute_pool(test, gold)
+    rng = random.Random(seed)
+    n_gold = len(gold[0])
+
+    best_match_num = 0
+    for iteration in range(restarts + 1):
+        if iteration == 0:
+            mapping = _smart_init(candidates, test[0], gold[0], rng)
+        else:
+            mapping = _random_init(candidates, rng)
+
+        match_num = _compute_match(mapping, weights)
+        while True:
+            gain, new_mapping = _best_step(
+                mapping, candidates, weights, n_gold
+            )
+            if gain <= 0:
+                break
+            match_num += gain
+            mapping = new_mapping
+
+        best_match_num = max(best_match_num, match_num)
+
+    return (
+        best_match_num,
+        sum(len(triples) for triples in test),
+        sum(len(triples) for triples in gold),
+    )
+
+
+def compute_f(
+    match_num: int, test_num: int, gold_num: int
+) -> Tuple[float, float, float]:
+    """Compute the precision, recall and f1 from the triple counts."""
+    if test_num == 0 or gold_num == 0:
+        return 0.0, 0.0, 0.0
+
+    precision = match_num / test_num
+    recall = match_num / gold_num
+    if precision + recall == 0:
+        return precision, recall, 0.0
+
+    return precision, recall, 2 * precision * recall / (precision + recall)
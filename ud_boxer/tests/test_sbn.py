@@ -1,18 +1,53 @@
+import json
+import shutil
+import subprocess
+import threading
+import time
+from argparse import ArgumentParser
 from pathlib import Path
 
 import pytest
 
-from ud_boxer.sbn import SBNGraph, sbn_graphs_are_isomorphic
+from ud_boxer.config import Config
+from ud_boxer.graph_resolver import (
+    GraphResolver,
+    get_resolver,
+    resolver_hash,
+)
+from ud_boxer.grew_cache import GrewCache
+from ud_boxer.grew_rewrite import Grew
+from ud_boxer.grs import (
+    RuleHitIndex,
+    conll_features,
+    grs_rule_hashes,
+    grs_rules,
+    rule_assignments,
+)
+from ud_boxer.helpers import (
+    check_edge_clf_arg,
+    iter_sbn_corpus,
+    smatch_score,
+    smatch_score_corpus,
+    smatch_score_graphs,
+)
+from ud_boxer.lemma_store import LemmaStore, compile_lemma_store
+from ud_boxer.rewrite import GrsRewriter
+from ud_boxer.sbn import SBNDocument, SBNGraph, sbn_graphs_are_isomorphic
 from ud_boxer.sbn_spec import (
     SBN_EDGE_TYPE,
     SBN_NODE_TYPE,
+    SBNError,
     split_comments,
     split_single,
 )
+from ud_boxer.scorer import SMATCH_BACKEND, SmatchScorer
+from ud_boxer.smatch import penman_triples
+from ud_boxer.ud import UDGraph
 
 EXAMPLES_DIR = Path(__file__).parent / "examples"
 SBN_DIR = EXAMPLES_DIR / "sbn"
 PM_DIR = EXAMPLES_DIR / "penman"
+SMATCH_DIR = EXAMPLES_DIR / "smatch"
 
 NORMAL_EXAMPLE_SBN = Path(SBN_DIR / "normal_example.sbn").read_text()
 NORMAL_EXAMPLE_PM = Path(PM_DIR / "normal_example.penman").read_text()
@@ -128,3 +163,715 @@ def test_can_parse_single_line_sbn():
 
     assert len(graph.nodes) == (6 + 1)  # 6 sbn nodes, 1 box
     assert len(graph.edges) == (5 + 4)  # 5 sbn edges, 4 box edges
+
+
+@pytest.mark.parametrize(
+    "invalid_string",
+    [
+        "male.n.02 Name",
+        "male.n.02 NEGATION",
+        "male.n.02 NEGATION -2",
+        'male.n.02 Name "Tom',
+        "male.n.02 Agent -1 not_a_role +1",
+    ],
+)
+def test_invalid_sbn_raises(invalid_string):
+    with pytest.raises(SBNError):
+        SBNGraph().from_string(invalid_string)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_iter_sbn_corpus(tmp_path, workers):
+    lines = [
+        'p00/d0001,male.n.02 Name "Tom" see.v.01 Experiencer -1 Time +1',
+        "p00/d0002,male.n.02 Name",
+        "p00/d0003",
+        'p00/d0004,entity.n.01 Name "Tom, Jr."',
+    ]
+    corpus_path = tmp_path / "corpus.txt"
+    corpus_path.write_text("\n".join(lines * 3))
+
+    results = list(iter_sbn_corpus(corpus_path, workers, chunk_size=2))
+
+    assert [doc_id for doc_id, _ in results] == [
+        line.split(",")[0] for line in lines * 3
+    ]
+    assert [type(G) for _, G in results[:4]] == [
+        SBNGraph,
+        SBNError,
+        SBNError,
+        SBNGraph,
+    ]
+    assert results[3][1].nodes[(SBN_NODE_TYPE.CONSTANT, 0)]["token"] == (
+        '"Tom, Jr."'
+    )
+
+
+@pytest.mark.parametrize("example_string", ALL_EXAMPLES)
+def test_sbn_document_to_networkx(example_string):
+    G = SBNGraph().from_string(example_string)
+    doc = SBNDocument.from_string(example_string)
+
+    from_graph = SBNDocument.from_graph(G)
+    assert from_graph.node_comments == doc.node_comments
+
+    for D in [doc.to_networkx(), from_graph.to_networkx()]:
+        assert list(D.nodes.items()) == list(G.nodes.items())
+        assert list(D.edges.items()) == list(G.edges.items())
+        assert D.type_indices == G.type_indices
+        assert D.is_dag == G.is_dag == doc.is_dag
+
+
+def test_sbn_document_expected_graph():
+    sbn_str = "\n".join(
+        [
+            'person.n.01 Name "Tom"             % Tom [0-3]',
+            "sleep.v.01  Agent -1 Time +1       % sleeps [4-10]",
+            "time.n.08   EQU now",
+            "NEGATION -1",
+            "eat.v.01",
+        ]
+    )
+    BOX, SYNSET, CONSTANT = (
+        SBN_NODE_TYPE.BOX,
+        SBN_NODE_TYPE.SYNSET,
+        SBN_NODE_TYPE.CONSTANT,
+    )
+
+    def node(node_type, idx, token, **meta):
+        return (
+            (node_type, idx),
+            {
+                "_id": str((node_type, idx)),
+                "type": node_type,
+                "type_idx": idx,
+                "token": token,
+                **meta,
+            },
+        )
+
+    def synset(idx, token, comment):
+        lemma, pos, sense = token.split(".")
+        return node(
+            SYNSET,
+            idx,
+            token,
+            wn_lemma=lemma,
+            wn_pos=pos,
+            wn_id=sense,
+            comment=comment,
+        )
+
+    def edge(from_id, to_id, edge_type, idx, token=None):
+        edge_id = str((edge_type, idx))
+        return (
+            (from_id, to_id),
+            {
+                "_id": edge_id,
+                "type": edge_type,
+                "type_idx": idx,
+                "token": token or edge_id,
+            },
+        )
+
+    expected_nodes = [
+        node(BOX, 0, "B-0"),
+        synset(0, "person.n.01", "Tom [0-3]"),
+        node(CONSTANT, 0, '"Tom"', comment="Tom [0-3]"),
+        synset(1, "sleep.v.01", "sleeps [4-10]"),
+        synset(2, "time.n.08", None),
+        node(CONSTANT, 1, "now", comment=None),
+        node(BOX, 1, "B-1"),
+        synset(3, "eat.v.01", None),
+    ]
+    box_connect = SBN_EDGE_TYPE.BOX_CONNECT
+    role = SBN_EDGE_TYPE.ROLE
+    expected_edges = [
+        edge((BOX, 0), (SYNSET, 0), box_connect, 0),
+        edge((BOX, 0), (SYNSET, 1), box_connect, 1),
+        edge((BOX, 0), (SYNSET, 2), box_connect, 2),
+        edge((BOX, 0), (BOX, 1), SBN_EDGE_TYPE.BOX_BOX_CONNECT, 0, "NEGATION"),
+        edge((SYNSET, 0), (CONSTANT, 0), role, 0, "Name"),
+        edge((SYNSET, 1), (SYNSET, 0), role, 1, "Agent"),
+        edge((SYNSET, 1), (SYNSET, 2), role, 2, "Time"),
+        edge((SYNSET, 2), (CONSTANT, 1), role, 3, "EQU"),
+        edge((BOX, 1), (SYNSET, 3), box_connect, 3),
+    ]
+
+    G = SBNGraph().from_string(sbn_str)
+    doc = SBNDocument.from_string(sbn_str)
+    for D in [G, doc.to_networkx(), SBNDocument.from_graph(G).to_networkx()]:
+        assert list(D.nodes.items()) == expected_nodes
+        assert list(D.edges.items()) == expected_edges
+
+
+def test_sbn_document_interns_tokens():
+    A = SBNDocument.from_string(NORMAL_EXAMPLE_SBN)
+    B = SBNDocument.from_string(NORMAL_EXAMPLE_SBN)
+
+    assert all(a is b for a, b in zip(A.node_tokens, B.node_tokens))
+
+
+def test_to_penman_string_deep_graph():
+    # Every negation adds a nested box, deeper than the recursion limit.
+    deep_sbn = "\n".join(["entity.n.01", "NEGATION -1"] * 2000)
+    G = SBNGraph().from_string(deep_sbn)
+
+    pm_str = G.to_penman_string(validate=False)
+
+    assert pm_str.count(":NEGATION") == 2000
+    assert pm_str.count("(") == pm_str.count(")") == len(G.nodes)
+
+
+@pytest.mark.parametrize(
+    "example, strict",
+    [
+        ("normal_example", True),
+        ("normal_example", False),
+        # Possibly ill-formed, only exported in lenient mode.
+        ("constant_looks_like_index_example", False),
+    ],
+)
+def test_to_penman_variants(example, strict):
+    G = SBNGraph().from_path(SBN_DIR / f"{example}.sbn")
+    expected = (
+        (PM_DIR / f"{example}.sense.penman").read_text(),
+        (PM_DIR / f"{example}.no_sense.penman").read_text(),
+    )
+
+    assert G.to_penman_variants(strict=strict) == expected
+    assert G.to_penman_string(strict=strict) == expected[0]
+    assert (
+        G.to_penman_string(evaluate_sense=False, strict=strict) == expected[1]
+    )
+
+
+def test_to_penman_strict_rejects_ill_formed():
+    G = SBNGraph().from_path(SBN_DIR / "constant_looks_like_index_example.sbn")
+
+    with pytest.raises(SBNError):
+        G.to_penman_variants(strict=True)
+
+
+def test_smatch_score_graphs():
+    G = SBNGraph().from_string(NORMAL_EXAMPLE_SBN)
+    penman_str, penman_no_sense_str = G.to_penman_variants()
+
+    assert smatch_score_graphs(G, penman_str) == {
+        "precision": 1.0,
+        "recall": 1.0,
+        "f1": 1.0,
+    }
+
+    # Leaving out the senses only removes triples, so nothing is wrong.
+    scores = smatch_score_graphs(penman_str, penman_no_sense_str)
+    assert scores["precision"] == 1.0
+    assert scores["recall"] < 1.0
+    assert scores == smatch_score_graphs(penman_str, penman_no_sense_str)
+
+
+@pytest.mark.skipif(shutil.which("mtool") is None, reason="needs mtool")
+@pytest.mark.parametrize(
+    "conll_path",
+    sorted((Config.DATA_DIR / "test_cases").glob("**/en.ud.stanza.conll")),
+)
+def test_smatch_score_graphs_matches_mtool(tmp_path, conll_path):
+    G = Grew(language="en", native=True).run(conll_path)
+    pairs = zip(
+        [
+            (conll_path.parent / "en.drs.penman").read_text(),
+            (conll_path.parent / "en.drs.lenient.penman").read_text(),
+        ],
+        G.to_penman_variants(strict=False),
+    )
+
+    for gold, test in pairs:
+        (tmp_path / "gold.penman").write_text(gold)
+        (tmp_path / "test.penman").write_text(test)
+        expected = smatch_score(
+            tmp_path / "gold.penman", tmp_path / "test.penman"
+        )
+
+        scores = smatch_score_graphs(gold, test)
+        assert scores == pytest.approx(expected, abs=1e-4)
+
+
+# Scores mtool gave for the test cases in the results of earlier runs
+# (data/results), together with the gold and test graphs they were for. The
+# test graphs were exported back then with "sense" instead of "synset".
+MTOOL_SCORES = [
+    json.loads(line)
+    for line in (SMATCH_DIR / "mtool_scores.jsonl").read_text().splitlines()
+]
+
+
+@pytest.mark.parametrize(
+    "mtool_scores",
+    MTOOL_SCORES,
+    ids=[f"{item['pmb_id']}-{item['variant']}" for item in MTOOL_SCORES],
+)
+def test_smatch_score_graphs_matches_mtool_scores(mtool_scores):
+    scores = smatch_score_graphs(mtool_scores["gold"], mtool_scores["test"])
+    assert scores == pytest.approx(
+        {key: mtool_scores[key] for key in ("precision", "recall", "f1")}
+    )
+
+
+def test_smatch_normalizes_single_trailing_underscore():
+    penman_str = '(b0 / "box" :member (s0 / "synset" :lemma "{}"))'.format
+
+    assert smatch_score_graphs(penman_str("a_"), penman_str("A"))["f1"] == 1
+    assert smatch_score_graphs(penman_str("a__"), penman_str("a_"))["f1"] < 1
+
+
+def test_smatch_scorer_restarts_crashed_worker():
+    G = SBNGraph().from_string(NORMAL_EXAMPLE_SBN)
+    penman_str, penman_no_sense_str = G.to_penman_variants()
+    expected = smatch_score_graphs(penman_str, penman_no_sense_str)
+
+    with SmatchScorer(workers=1, backend=SMATCH_BACKEND.NATIVE) as scorer:
+        assert scorer.score(penman_str, penman_no_sense_str) == expected
+
+        scorer._idle.queue[0].process.kill()
+        assert scorer.score(penman_str, penman_no_sense_str) == expected
+
+        with pytest.raises(SBNError):
+            scorer.score(penman_str, "(b0 / ")
+
+
+def _sleep_score(seconds, restarts, seed):
+    time.sleep(seconds)
+
+
+def test_smatch_scorer_close_stops_busy_workers():
+    scorer = SmatchScorer(workers=1, backend=SMATCH_BACKEND.NATIVE)
+    scorer.start()
+    (worker,) = scorer._workers
+
+    errors = []
+
+    def run():
+        try:
+            scorer._run((_sleep_score, (30,)))
+        except SBNError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    time.sleep(0.5)
+    scorer.close()
+    thread.join(timeout=10)
+
+    assert not worker.process.is_alive()
+    assert not thread.is_alive()
+    assert len(errors) == 1 and scorer._workers == set()
+
+
+def test_smatch_scorer_runs_mtool_per_task(monkeypatch):
+    commands = []
+
+    def check_output(cmd, timeout):
+        commands.append((cmd[0], timeout))
+        return b'{"p": 1.0, "r": 0.5, "f": 0.6}'
+
+    monkeypatch.setattr(subprocess, "check_output", check_output)
+    with SmatchScorer(workers=2, timeout=5) as scorer:
+        # mtool runs from the calling thread, no processes are kept around.
+        assert scorer._workers == set()
+        assert scorer.score("(b0 / box)", "(b0 / box)") == {
+            "precision": 1.0,
+            "recall": 0.5,
+            "f1": 0.6,
+        }
+    assert commands == [("mtool", 5)]
+
+
+def test_smatch_score_corpus():
+    G = SBNGraph().from_string(NORMAL_EXAMPLE_SBN)
+    penman_str, penman_no_sense_str = G.to_penman_variants()
+    docs = [
+        ("a", penman_str, G),
+        ("b", penman_str, SBNError("Could not create graph")),
+        ("c", penman_str, penman_no_sense_str),
+    ]
+
+    doc_scores, overall = smatch_score_corpus(docs)
+    with SmatchScorer(workers=2, backend=SMATCH_BACKEND.NATIVE) as scorer:
+        assert scorer.score_corpus(docs, chunk_size=1) == (
+            doc_scores,
+            overall,
+        )
+
+    assert list(doc_scores) == ["a", "b", "c"]
+    assert doc_scores["a"]["f1"] == 1.0
+    assert doc_scores["b"] == {
+        "precision": 0.0,
+        "recall": 0.0,
+        "f1": 0.0,
+        "error": "Could not create graph",
+    }
+    assert doc_scores["c"]["error"] is None
+    assert overall["failed_docs"] == 1
+    assert overall["macro_f1"] == pytest.approx(
+        sum(scores["f1"] for scores in doc_scores.values()) / 3
+    )
+    # The failed document only counts towards the gold triples.
+    assert overall["micro_precision"] == 1.0
+    assert overall["micro_recall"] < 2 / 3
+
+
+
+def test_mtool_corpus_counts_runs_mtool_once(monkeypatch):
+    G = SBNGraph().from_string(NORMAL_EXAMPLE_SBN)
+    penman_str, penman_no_sense_str = G.to_penman_variants()
+    n_gold = sum(len(triples) for triples in penman_triples(penman_str))
+    docs = [
+        ("a", penman_str, penman_str),
+        ("b", "(b0 / box", penman_str),
+        ("c", penman_str, SBNError("Could not create graph")),
+        ("d", penman_str, penman_no_sense_str),
+    ]
+    commands = []
+
+    def check_output(cmd, timeout):
+        commands.append(cmd)
+        ids = [
+            line.split()[-1]
+            for line in Path(cmd[-1]).read_text().splitlines()
+            if line.startswith("# ::id")
+        ]
+        scores = {idx: {"g": 10, "s": 8, "c": int(idx)} for idx in ids}
+        return json.dumps({"scores": scores}).encode()
+
+    monkeypatch.setattr(subprocess, "check_output", check_output)
+    with SmatchScorer(workers=1) as scorer:
+        counts = scorer.corpus_counts(docs)
+
+    assert len(commands) == 1 and "--trace" in commands[0]
+    assert counts[0] == ("a", (0, 8, 10), None)
+    assert counts[1][:2] == ("b", (0, 0, 0))
+    assert counts[1][2].startswith("Invalid gold graph")
+    # The gold triples of the failed document are counted without mtool.
+    assert counts[2] == ("c", (0, 0, n_gold), "Could not create graph")
+    assert counts[3] == ("d", (3, 8, 10), None)
+
+
+def test_grew_cache_keys_cover_resolver_inputs(tmp_path, monkeypatch):
+    conll_path = (
+        Config.DATA_DIR / "test_cases" / "p00" / "d1593" / "en.ud.stanza.conll"
+    )
+    cache = GrewCache(tmp_path / "grew.sqlite")
+    grew = Grew(language="en", native=True, cache=cache)
+    expected = grew.run(conll_path).to_sbn_string()
+    U = UDGraph().from_path(conll_path)
+    assert grew.run_graph(U).to_sbn_string() == expected
+    assert len(cache) == 2
+
+    # Both documents come from the cache now.
+    def fail(*_):
+        raise AssertionError("Not taken from the cache")
+
+    monkeypatch.setattr(grew, "_run_grew_graphs", fail)
+    assert grew.run(conll_path).to_sbn_string() == expected
+    assert grew.run_graph(U).to_sbn_string() == expected
+
+    # Other mappings or an edge classifier give other keys.
+    assert resolver_hash("en", True) != resolver_hash("en", False)
+    mappings_dir = tmp_path / "mappings"
+    shutil.copytree(Config.MAPPINGS_DIR, mappings_dir)
+    monkeypatch.setattr(Config, "MAPPINGS_DIR", mappings_dir)
+    assert resolver_hash("en") == grew.grs_hash.split("-")[1]
+    edge_mappings = mappings_dir / "en_edge_mappings_train.json"
+    edge_mappings.write_text(edge_mappings.read_text() + "\n")
+    assert resolver_hash("en") != grew.grs_hash.split("-")[1]
+
+def test_grew_cache_evicts_least_recently_used(tmp_path):
+    doc = SBNDocument.from_string(NORMAL_EXAMPLE_SBN)
+    cache = GrewCache(tmp_path / "grew.sqlite")
+    keys = [GrewCache.key(f"{i}", "grs", "en", "main") for i in range(3)]
+
+    cache.put(keys[0], doc)
+    cache.put(keys[1], doc)
+    assert cache.get(keys[0]).node_tokens == doc.node_tokens
+    assert cache.get(keys[2]) is None
+
+    # Room for two documents, the first one was used after the second one.
+    cache.max_size = 2 * cache.conn.execute(
+        "SELECT MAX(size) FROM rewrites"
+    ).fetchone()[0]
+    cache.put(keys[2], doc)
+    assert len(cache) == 2
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    cache.close()
+
+
+def test_grew_cache_keeps_running_total_size(tmp_path):
+    doc = SBNDocument.from_string(NORMAL_EXAMPLE_SBN)
+    other_doc = SBNDocument.from_string("person.n.01 Name \"Tom\"")
+    cache = GrewCache(tmp_path / "grew.sqlite")
+    keys = [GrewCache.key(f"{i}", "grs", "en", "main") for i in range(4)]
+
+    def sizes():
+        return cache.conn.execute(
+            "SELECT (SELECT SUM(size) FROM rewrites), total_size "
+            "FROM rewrites_size"
+        ).fetchone()
+
+    for key in keys[:3]:
+        cache.put(key, doc)
+    # Replacing a document only counts its new size.
+    cache.put(keys[1], other_doc)
+    total_size, running_total = sizes()
+    assert running_total == total_size
+
+    cache.max_size = total_size
+    cache.put(keys[3], other_doc)
+    total_size, running_total = sizes()
+    assert len(cache) == 3
+    assert running_total == total_size <= cache.max_size
+    cache.close()
+
+    # Reopening the database continues with the stored total.
+    cache = GrewCache(tmp_path / "grew.sqlite")
+    assert sizes() == (total_size, running_total)
+    cache.close()
+
+
+def test_rule_hit_index_affected_docs():
+    rules = grs_rules(Config.GRS_PATH, "en")
+    index = RuleHitIndex(
+        grs_rule_hashes(rules),
+        {
+            "a": ["add_token_nodes"],
+            "b": ["en.box_negation_det"],
+            "c": ["add_token_nodes"],
+        },
+    )
+    doc_features = {
+        "a": conll_features("1\tHe\the\tPRON\t_\t_\t0\troot\t_\t_"),
+        "b": conll_features("1\tNo\tno\tDET\t_\t_\t0\troot\t_\t_"),
+        "c": conll_features("1\tNot\tnot\tPART\t_\t_\t0\troot\t_\t_"),
+        "d": conll_features("1\tNo\tno\tDET\t_\t_\t0\troot\t_\t_"),
+    }
+    # Documents that are not indexed yet are always affected.
+    assert index.affected_docs(rules, doc_features) == {"d"}
+    del doc_features["d"]
+    assert index.affected_docs(rules, doc_features) == set()
+
+    # Rules that fired before (b) or that can match now, based on the lemmas
+    # (c, the rule did not fire there before).
+    rules["en.box_negation_det"] += " "
+    assert index.affected_docs(rules, doc_features) == set()
+    rules["en.box_negation_det"] += "changed"
+    assert index.affected_docs(rules, doc_features) == {"b", "c"}
+
+    rules["strat:main"] += "changed"
+    assert index.affected_docs(rules, doc_features) == {"a", "b", "c"}
+
+
+def test_rule_hit_index_assigned_values():
+    rules = grs_rules(Config.GRS_PATH, "en")
+    assert {
+        (name, assignment)
+        for name, body in rules.items()
+        for assignment in rule_assignments(body)
+    } == {("combine_compound_prt", ("upos", "VERB"))}
+
+    index = RuleHitIndex(
+        grs_rule_hashes(rules), {"a": ["add_token_nodes"], "b": []}
+    )
+    doc_features = {
+        "a": conll_features("1\tHe\the\tPRON\t_\t_\t0\troot\t_\t_"),
+        "b": conll_features("1\tNo\tno\tDET\t_\t_\t0\troot\t_\t_"),
+    }
+    # A new rule that only matches nouns, which a rule now assigns.
+    rules["noun_rule"] = "pattern { A [upos=NOUN] } commands { del_node A }"
+    assert index.affected_docs(rules, doc_features) == set()
+    rules["make_noun"] = (
+        "pattern { A [upos=PRON] } commands { A.upos = NOUN }"
+    )
+    assert index.affected_docs(rules, doc_features) == {"a", "b"}
+
+    # A lemma copied from another node can be anything.
+    del rules["make_noun"]
+    rules["copy_lemma"] = (
+        "pattern { A [upos=X]; B [] } commands { A.lemma = B.lemma }"
+    )
+    assert rule_assignments(rules["copy_lemma"]) == {("lemma", None)}
+    assert index.affected_docs(rules, doc_features) == {"a", "b"}
+
+
+def test_grs_rewriter():
+    # 'Tracy lost her glasses.' (en/p04/d1646) as grew graph.
+    grew_graph = {
+        "0": ({"form": "__0__"}, [("1=root", "2")]),
+        "1": ({"textform": "Tracy", "lemma": "Tracy", "upos": "PROPN"}, []),
+        "2": (
+            {"lemma": "lose", "upos": "VERB", "Tense": "Past"},
+            [("1=nsubj", "1"), ("1=obj", "4"), ("1=punct", "5")],
+        ),
+        "3": ({"lemma": "she", "upos": "PRON", "Person": "3"}, []),
+        "4": ({"lemma": "glasses", "upos": "NOUN"}, [("1=nmod,2=poss", "3")]),
+        "5": ({"lemma": ".", "upos": "PUNCT"}, []),
+    }
+    rewriter = GrsRewriter(language="en")
+
+    results = rewriter.run(grew_graph)
+    assert rewriter.run(grew_graph, "Pick(en.box_negation_det)") == []
+    assert "token" not in grew_graph["1"][0]
+
+    G = SBNGraph().from_grew(results[0])
+    assert G.to_sbn_string().split("\n") == [
+        "time.n.08    TPR now",
+        "person.n.01  Name Tracy",
+        "lose.v.02    Time -2 Agent -1 Theme +1",
+        "glasses.n.01 User -2",
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_grew_merges_sentences(workers):
+    conll_str = "\n".join(
+        (Config.DATA_DIR / "test_cases" / doc / "en.ud.stanza.conll")
+        .read_text()
+        .strip()
+        + "\n"
+        for doc in ("p00/d1593", "p04/d0778", "p04/d1646")
+    )
+
+    with Grew(language="en", native=True, workers=workers) as grew:
+        G = grew.run_conll_str(conll_str)
+    assert grew._executor is None
+
+    assert G.is_dag
+    assert G.to_sbn_string().split("\n") == [
+        "NEGATION     -1",
+        "time.n.08    EQU now",
+        "person.n.01  EQU speaker",
+        "lie.v.05     Time -2 Agent -1 Time +1",
+        "female.n.02",
+        "CONTINUATION -1",
+        "NEGATION     -1",
+        "NEGATION     -1",
+        "time.n.08    EQU now",
+        "eat.v.01     Time -1",
+        "person.n.01  EQU hearer",
+        "like.v.02    Agent -1",
+        "CONTINUATION -1",
+        "time.n.08    TPR now",
+        "person.n.01  Name Tracy",
+        "lose.v.02    Time -2 Agent -1 Theme +1",
+        "glasses.n.01 User -2",
+    ]
+
+
+def test_grew_merge_graphs_detects_cycle():
+    A = SBNGraph().from_string("person.n.01")
+    B = SBNGraph().from_string("person.n.01\nNEGATION -1\nsleep.v.01")
+    # B is still acyclic with its box connect reversed, but the merge chains
+    # its boxes in order, which leads back to the first box.
+    first_box, second_box = (SBN_NODE_TYPE.BOX, 0), (SBN_NODE_TYPE.BOX, 1)
+    box_connect = B.edges[first_box, second_box]
+    B.remove_edge(first_box, second_box)
+    B.add_edge(second_box, first_box, **box_connect)
+    assert B.is_dag
+
+    with pytest.raises(SBNError, match="cyclic"):
+        Grew.merge_graphs([A, B])
+
+
+def test_grew_profile_matches_run():
+    conll_path = (
+        Config.DATA_DIR / "test_cases" / "p00" / "d1593" / "en.ud.stanza.conll"
+    )
+    grew = Grew(language="en", native=True)
+
+    G, stats = grew.profile(conll_path)
+    expected = grew.run(conll_path)
+    assert G.to_sbn_string() == expected.to_sbn_string()
+    assert sbn_graphs_are_isomorphic(G, expected)
+
+    # Every rule of the strategy is profiled, also the ones that never fire.
+    assert len(stats) == len({rule for rule, _, _ in stats}) == 21
+    assert {rule: firings for rule, _, firings in stats if firings} == {
+        "add_token_nodes": 7,
+        "add_token_edges": 7,
+        "expand_first_person": 1,
+        "expand_third_person": 1,
+        "add_time": 1,
+        "en.box_negation_det": 1,
+        "remove_root_punct": 1,
+        "remove_explicit_root": 1,
+        "remove_unwanted_pos": 2,
+    }
+
+
+def test_from_grew_uses_resolver_of_language():
+    def mary_graph():
+        return {"1": ({"token": "Mary", "upos": "NOUN"}, [])}
+
+    assert get_resolver("nl") is get_resolver(Config.SUPPORTED_LANGUAGES.NL)
+    assert SBNGraph().from_grew(mary_graph()).to_sbn_string() == "Mary.n.01"
+    # 'Mary' is in the Dutch lemma lookup, but not in the English one.
+    G = SBNGraph().from_grew(mary_graph(), "nl")
+    assert G.to_sbn_string() == "female.n.02"
+    doc = SBNDocument.from_grew(mary_graph(), language="nl", edge_clf=False)
+    assert doc.to_networkx().to_sbn_string() == "female.n.02"
+
+    # Only English comes with an edge classifier, the CLIs check this.
+    parser = ArgumentParser()
+    parser.add_argument("--language")
+    parser.add_argument("--edge_clf", action="store_true")
+    check_edge_clf_arg(parser, parser.parse_args(["--language", "nl"]))
+    check_edge_clf_arg(
+        parser, parser.parse_args(["--language", "en", "--edge_clf"])
+    )
+    with pytest.raises(SystemExit):
+        check_edge_clf_arg(
+            parser, parser.parse_args(["--language", "nl", "--edge_clf"])
+        )
+
+
+def test_lemma_store_matches_lookup(tmp_path):
+    lookup = {
+        "dog.n": "dog.n.01",
+        "Mary.n": "female.n.02",
+        "ĳs.n": "ĳs.n.01",
+    }
+    store = LemmaStore(compile_lemma_store(lookup, tmp_path / "t.lemmas"))
+
+    assert dict(store) == lookup
+    assert store.get("ĳs.n") == "ĳs.n.01"
+    assert store.get("cat.n") is None and "dog" not in store
+    assert len(LemmaStore(compile_lemma_store({}, tmp_path / "e"))) == 0
+
+
+def test_predict_edges_batches_and_memoizes():
+    class CountingPipeline:
+        batches = []
+
+        def predict(self, X):
+            self.batches.append(X)
+            return ["Theme" if x[0] == "obj" else "Agent" for x in X]
+
+    resolver = GraphResolver()
+    resolver.edge_clf_pipeline = CountingPipeline()
+    verb, noun = {"upos": "VERB"}, {"upos": "NOUN"}
+
+    edges = [("nsubj", verb, noun), ("obj", verb, noun), ("nsubj", verb, noun)]
+    assert resolver.predict_edges(edges) == ["Agent", "Theme", "Agent"]
+    assert resolver.predict_edge("obj", verb, noun) == "Theme"
+    # The repeated edge is only classified once and the single edge is known.
+    assert [len(X) for X in CountingPipeline.batches] == [2]
+
+
+def test_parse_edge_name_returns_fresh_dicts():
+    edge_data = GraphResolver.parse_edge_name("1=nmod,2=poss,token=NONE")
+    assert edge_data == {"token": "NONE", "deprel": "nmod:poss"}
+
+    edge_data["token"] = "User"
+    assert GraphResolver.parse_edge_name("1=nmod,2=poss,token=NONE") == {
+        "token": "NONE",
+        "deprel": "nmod:poss",
+    }
@@ -0,0 +1,287 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ud_boxer.config import Config
+from ud_boxer.grew_rewrite import Grew
+from ud_boxer.ud import (
+    UD_EDGE_TYPE,
+    UD_NODE_TYPE,
+    UDError,
+    UDGraph,
+    UDParser,
+    iter_ud_graphs,
+)
+from ud_boxer.ud_cache import UDCache
+
+TEST_CASES = sorted((Config.DATA_DIR / "test_cases").glob("**/*.conll"))
+GREW_DIR = Path(__file__).parent / "examples" / "grew"
+
+
+def test_parse_many_batches_by_length():
+    batches = []
+
+    # Only the batching is tested, not the (heavy) pipelines themselves.
+    parser = UDParser.__new__(UDParser)
+    parser.cache = None
+    parser.parse_batch = lambda texts: batches.append(texts) or texts
+    parser.to_conll = lambda result: f"# text = {result}\n"
+
+    texts = ["ccc", "a", "bbbb", "dd", "e"]
+    conll_strs = parser.parse_many(texts, batch_size=2)
+
+    assert conll_strs == [f"# text = {text}\n" for text in texts]
+    assert batches == [["a", "e"], ["dd", "ccc"], ["bbbb"]]
+
+
+@pytest.mark.parametrize("conll_path", TEST_CASES)
+def test_from_string_matches_from_path(conll_path):
+    from_path = UDGraph().from_path(conll_path)
+    from_string = UDGraph().from_string(conll_path.read_text())
+
+    assert dict(from_string.nodes) == dict(from_path.nodes)
+    assert dict(from_string.edges) == dict(from_path.edges)
+    assert from_string.root_node_ids == from_path.root_node_ids
+
+
+def test_ud_graph_expected_graph():
+    conll_path = Config.DATA_DIR / "test_cases/p04/d0778/en.ud.stanza.conll"
+    U = UDGraph().from_path(conll_path)
+    ROOT, TOKEN = UD_NODE_TYPE.ROOT, UD_NODE_TYPE.TOKEN
+
+    def token(idx, form, lemma, upos, xpos, feats, deprel, start, end):
+        return (
+            (0, TOKEN, idx),
+            {
+                "_id": (0, TOKEN, idx),
+                "token": form,
+                "lemma": lemma,
+                "deprel": deprel,
+                "upos": upos,
+                "xpos": xpos,
+                "feats": feats,
+                "misc": {"start_char": str(start), "end_char": str(end)},
+                "connl_id": (idx,),
+                "type": TOKEN,
+            },
+        )
+
+    def edge(from_idx, to_idx, deprel):
+        return (
+            ((0, TOKEN, from_idx), (0, TOKEN, to_idx)),
+            {
+                "token": deprel,
+                "deprel": deprel,
+                "type": UD_EDGE_TYPE.DEPENDENCY_RELATION,
+            },
+        )
+
+    root_id = (0, ROOT, 0)
+    assert dict(U.nodes) == dict(
+        [
+            (
+                root_id,
+                {
+                    "_id": root_id,
+                    "token": "ROOT",
+                    "lemma": None,
+                    "deprel": None,
+                    "upos": None,
+                    "xpos": None,
+                    "feats": None,
+                    "misc": None,
+                    "connl_id": None,
+                    "type": ROOT,
+                },
+            ),
+            token(
+                1,
+                "Eat",
+                "eat",
+                "VERB",
+                "VB",
+                {"Mood": "Imp", "VerbForm": "Fin"},
+                "root",
+                0,
+                3,
+            ),
+            token(
+                2,
+                "whatever",
+                "whatever",
+                "PRON",
+                "WP",
+                {"PronType": "Int"},
+                "obj",
+                4,
+                12,
+            ),
+            token(
+                3,
+                "you",
+                "you",
+                "PRON",
+                "PRP",
+                {"Case": "Nom", "Person": "2", "PronType": "Prs"},
+                "nsubj",
+                13,
+                16,
+            ),
+            token(
+                4,
+                "like",
+                "like",
+                "VERB",
+                "VBP",
+                {"Mood": "Ind", "Tense": "Pres", "VerbForm": "Fin"},
+                "acl:relcl",
+                17,
+                21,
+            ),
+            # Empty FEATS ('_')
+            token(5, ".", ".", "PUNCT", ".", {}, "punct", 21, 22),
+        ]
+    )
+    assert dict(U.edges) == dict(
+        [
+            (
+                (root_id, (0, TOKEN, 1)),
+                {
+                    "token": "root",
+                    "deprel": "root",
+                    "type": UD_EDGE_TYPE.EXPLICIT_ROOT,
+                },
+            ),
+            edge(1, 2, "obj"),
+            edge(1, 5, "punct"),
+            edge(2, 4, "acl:relcl"),
+            edge(4, 3, "nsubj"),
+        ]
+    )
+    assert U.root_node_ids == [(0, TOKEN, 1)]
+
+    # Other empty ('_') columns become None.
+    U = UDGraph().from_string("1\tHi\t_\tINTJ\t_\t_\t0\troot\t_\t_")
+    node_data = U.nodes[(0, TOKEN, 1)]
+    assert (node_data["lemma"], node_data["xpos"]) == (None, None)
+    assert (node_data["feats"], node_data["misc"]) == ({}, {})
+
+
+@pytest.mark.parametrize(
+    "token_id",
+    [
+        # Multiword token
+        "1-2",
+        # Empty node (enhanced UD)
+        "1.1",
+    ],
+)
+def test_ud_graph_rejects_unsupported_ids(token_id):
+    conll_str = "\n".join(
+        [
+            "1\tHi\thi\tINTJ\t_\t_\t0\troot\t_\t_",
+            f"{token_id}\tthere\tthere\tADV\t_\t_\t1\tadvmod\t_\t_",
+        ]
+    )
+    with pytest.raises(UDError):
+        UDGraph().from_string(conll_str)
+
+
+def test_iter_ud_graphs_per_sentence_and_document(tmp_path):
+    documents = [path.read_text().strip() for path in TEST_CASES[:3]]
+    conll_path = tmp_path / "documents.conll"
+    conll_path.write_text(
+        "".join(
+            f"# newdoc id = {idx}\n{document}\n\n"
+            for idx, document in enumerate(documents)
+        )
+    )
+
+    per_document = list(iter_ud_graphs(conll_path, per_document=True))
+    per_sentence = list(iter_ud_graphs(conll_path))
+
+    assert len(per_document) == len(documents)
+    for U, document in zip(per_document, documents):
+        expected = UDGraph().from_string(document)
+        assert dict(U.nodes) == dict(expected.nodes)
+        assert dict(U.edges) == dict(expected.edges)
+
+    n_sentences = sum(len(U.root_node_ids) for U in per_document)
+    assert len(per_sentence) == n_sentences
+    assert all(len(U.root_node_ids) == 1 for U in per_sentence)
+
+
+def test_parse_many_only_parses_uncached_texts(tmp_path):
+    batches = []
+
+    parser = UDParser.__new__(UDParser)
+    parser.system, parser.language, parser.model_version = "stanza", "en", "1"
+    parser.cache = UDCache(tmp_path / "ud.sqlite", memory_size=1)
+    parser.parse_batch = lambda texts: batches.append(texts) or texts
+    parser.to_conll = lambda result: f"# text = {result}\n"
+
+    assert parser.parse_many(["a", "b"]) == ["# text = a\n", "# text = b\n"]
+    assert parser.parse_many(["b", "c", "a"]) == [
+        "# text = b\n",
+        "# text = c\n",
+        "# text = a\n",
+    ]
+    assert batches == [["a", "b"], ["c"]]
+
+    # Only one parse is kept in memory, the others come from disk.
+    assert len(parser.cache._memory) == 1
+    assert len(parser.cache) == 3
+
+    # Another model version does not use the cached parses.
+    parser.model_version = "2"
+    parser.parse_many(["a"])
+    assert batches[-1] == ["a"]
+    parser.cache.close()
+
+
+@pytest.mark.parametrize("conll_path", TEST_CASES)
+def test_ud_to_grew_matches_conll_to_grew(conll_path):
+    conll_str = conll_path.read_text()
+    grew_graphs = Grew.ud_to_grew(UDGraph().from_string(conll_str))
+
+    assert grew_graphs == Grew.conll_to_grew(conll_str)
+    if "stanza" in conll_path.name:
+        # Stanza fills the MISC column, which ends up in the graphs as well.
+        assert grew_graphs[0]["1"][0]["start_char"] == "0"
+
+
+
+def test_conll_to_grew_matches_grew_loading():
+    # The graphs grew itself makes of the CoNLL-U: node ids in token order,
+    # multiword token forms on the first word only and subrelations split
+    # into edge features.
+    expected = json.loads((GREW_DIR / "multiword.json").read_text())
+    conll_str = (GREW_DIR / "multiword.conll").read_text()
+    grew_graphs = Grew.conll_to_grew(conll_str)
+
+    assert len(grew_graphs) == len(expected)
+    for grew_graph, expected_graph in zip(grew_graphs, expected):
+        assert list(grew_graph) == list(expected_graph)
+        for node_id, (features, edges) in expected_graph.items():
+            assert list(grew_graph[node_id][0].items()) == list(
+                features.items()
+            )
+            assert grew_graph[node_id][1] == [tuple(edge) for edge in edges]
+
+def test_ud_cache_evicts_with_running_total(tmp_path):
+    cache = UDCache(tmp_path / "ud.sqlite", max_size=1024, memory_size=1)
+    keys = [UDCache.key(f"{i}", "stanza", "en", "1") for i in range(100)]
+    for idx, key in enumerate(keys):
+        cache.put(key, f"# text = {idx}\n" * 20)
+
+    total_size, running_total = cache.conn.execute(
+        "SELECT (SELECT SUM(size) FROM parses), total_size FROM parses_size"
+    ).fetchone()
+    assert running_total == total_size <= cache.max_size
+    assert 0 < len(cache) < len(keys)
+    # The oldest parses are gone from disk, the newest one is still there.
+    cache._memory.clear()
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[-1]) == "# text = 99\n" * 20
+    cache.close()
@@ -1,12 +1,29 @@
+from bisect import bisect_right
+from functools import lru_cache
 from os import PathLike
 from pathlib import Path
-from typing import Set
-
-from stanza.utils.conll import CoNLL
+from sys import intern
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from ud_boxer.base import BaseEnum, BaseGraph
 from ud_boxer.config import Config
-from ud_boxer.ud_spec import UDSpecBasic
+from ud_boxer.conll import (
+    CONLL_SENTENCE,
+    iter_conll_documents,
+    iter_conll_sentences,
+    parse_conll_items,
+)
+from ud_boxer.ud_cache import UDCache
+from ud_boxer.ud_spec import UDError, UDSpecBasic
 
 __all__ = [
     "UD_NODE_TYPE",
@@ -14,13 +31,38 @@ __all__ = [
     "UD_SYSTEM",
     "UDError",
     "UDGraph",
+    "iter_ud_graphs",
     "UDParser",
     "Collector",
 ]
 
 
-class UDError(Exception):
-    pass
+# Max number of distinct FEATS columns to remember the parse of.
+FEATS_CACHE_SIZE = 1 << 14
+
+
+@lru_cache(maxsize=FEATS_CACHE_SIZE)
+def _parse_feats(feats_str: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    Morphological features are optional and are encoded as follows:
+        <feat_1_key>=<feat_1_val>|<feat_2_key>=<feat_2_val> ...
+    So for instance: Mood=Ind|Tense=Past|VerbForm=Fin
+    None of the features are required on a token level. The same columns
+    come back all the time, so they are parsed and checked only once.
+    """
+    if feats_str == "_":
+        return tuple()
+
+    feats = []
+    for key, value in [item.split("=") for item in feats_str.split("|")]:
+        if key not in UDSpecBasic.Feats.KEYS:
+            raise UDError(f"Unknown Feat key found: {key}")
+        feats.append((intern(key), intern(value)))
+    return tuple(feats)
+
+
+def _optional(value: str) -> Optional[str]:
+    return None if value == "_" else value
 
 
 class UD_NODE_TYPE(BaseEnum):
@@ -48,8 +90,17 @@ class UDGraph(BaseGraph):
 
     def from_path(self, conll_path: PathLike):
         """Construct the graph using the provided conll file"""
-        sentences, _ = CoNLL.conll2dict(conll_path)
+        with open(conll_path) as f:
+            return self.from_sentences(iter_conll_sentences(f))
 
+    def from_string(self, conll_str: str):
+        """Construct the graph using a string in conll format"""
+        return self.from_sentences(
+            iter_conll_sentences(conll_str.splitlines())
+        )
+
+    def from_sentences(self, sentences: Iterable[CONLL_SENTENCE]):
+        """Construct the graph using sentences from 'ud_boxer.conll'"""
         nodes, edges = [], []
         for sentence_idx, sentence in enumerate(sentences):
             # Explicitly add the root node for each sentence
@@ -65,6 +116,7 @@ class UDGraph(BaseGraph):
                         "upos": None,
                         "xpos": None,
                         "feats": None,
+                        "misc": None,
                         "connl_id": None,
                         "type": UD_NODE_TYPE.ROOT,
                     },
@@ -83,61 +135,49 @@ class UDGraph(BaseGraph):
                     )
                 )
 
-            for token in sentence:
-                # Ids are read in as tuples, but currently there are no parses
-                # with multiple or duplicate ids (not sure when that happens,
-                # with pre-annotated docs maybe?)
-                if len(token["id"]) != 1:
+            for columns in sentence:
+                token_id, form, lemma, upos, xpos, feats, head = columns[:7]
+                # Currently there are no parses with multiword tokens or
+                # empty nodes (not sure when that happens, with pre-annotated
+                # docs maybe?)
+                if "-" in token_id or "." in token_id:
                     raise UDError(
                         f"Multiple ids found, cannot parse this currently."
                     )
 
-                tok_id = (sentence_idx, UD_NODE_TYPE.TOKEN, token["id"][0])
-                dep_rel = token.get("deprel")
-                upos = token.get("upos")
+                tok_id = (sentence_idx, UD_NODE_TYPE.TOKEN, int(token_id))
+                dep_rel = _optional(columns[7])
+                upos = _optional(upos)
 
                 if dep_rel not in UDSpecBasic.DepRels.ALL_DEP_RELS:
                     raise UDError(f"Unknown deprel found {dep_rel}")
                 if upos not in UDSpecBasic.POS.ALL_POS:
                     raise UDError(f"Unknown upos found {upos}")
 
-                # Morphological features are optional (can be None) and are
-                # encoded as follows:
-                #   <feat_1_key>=<feat_1_val>|<feat_2_key>=<feat_2_val> ...
-                # So for instance: Mood=Ind|Tense=Past|VerbForm=Fin
-                # None of the features are required on a token level.
-                feats = dict()
-                if feats_str := token.get("feats"):
-                    for key, value in [
-                        item.split("=") for item in feats_str.split("|")
-                    ]:
-                        if key not in UDSpecBasic.Feats.KEYS:
-                            raise UDError(f"Unknown Feat key found: {key}")
-                        feats[key] = value
-
                 tok_data = {
                     "_id": tok_id,
-                    "token": token["text"],
-                    "lemma": token.get("lemma"),
+                    "token": form,
+                    "lemma": _optional(lemma),
                     "deprel": dep_rel,
                     "upos": upos,
-                    "xpos": token.get("xpos"),
-                    "feats": feats,
-                    "connl_id": token.get("id"),
+                    "xpos": _optional(xpos),
+                    "feats": dict(_parse_feats(feats)),
+                    "misc": dict(parse_conll_items(columns[9])),
+                    "connl_id": (tok_id[2],),
                     "type": tok_id[1],
                 }
 
-                if token["head"] == 0:
-                    head_id = (sentence_idx, UD_NODE_TYPE.ROOT, token["head"])
+                if head == "0":
+                    head_id = (sentence_idx, UD_NODE_TYPE.ROOT, 0)
                     edge_type = UD_EDGE_TYPE.EXPLICIT_ROOT
                     self.root_node_ids.append(tok_id)
                 else:
-                    head_id = (sentence_idx, UD_NODE_TYPE.TOKEN, token["head"])
+                    head_id = (sentence_idx, UD_NODE_TYPE.TOKEN, int(head))
                     edge_type = UD_EDGE_TYPE.DEPENDENCY_RELATION
 
                 edge_data = {
-                    "token": token["deprel"],
-                    "deprel": token["deprel"],
+                    "token": dep_rel,
+                    "deprel": dep_rel,
                     "type": edge_type,
                 }
 
@@ -179,37 +219,90 @@ class UDGraph(BaseGraph):
         }
 
 
+def iter_ud_graphs(
+    conll_path: PathLike, per_document: bool = False
+) -> Iterator[UDGraph]:
+    """
+    Read a (big) conll file one UDGraph at a time, a graph per sentence or a
+    graph per document ('# newdoc' comments).
+    """
+    with open(conll_path) as f:
+        if per_document:
+            for document in iter_conll_documents(f):
+                yield UDGraph().from_sentences(document)
+        else:
+            for sentence in iter_conll_sentences(f):
+                yield UDGraph().from_sentences([sentence])
+
+
 class UDParser:
+    # Paragraph break between the documents of a batch for trankit.
+    TRANKIT_SEPARATOR = "\n\n"
+
     def __init__(
         self,
         system: Config.UD_SYSTEM = Config.UD_SYSTEM.STANZA,
         language: Config.SUPPORTED_LANGUAGES = Config.SUPPORTED_LANGUAGES.EN,
+        cache: Optional[UDCache] = None,
     ) -> None:
         if system == Config.UD_SYSTEM.STANZA:
-            from stanza import Pipeline, download
+            from stanza import Document, Pipeline, __version__, download
             from stanza.utils.conll import CoNLL
 
             # No need for very heavy NER / sentiment etc models currently
             processors = "tokenize,pos,lemma,depparse"
             download(language, processors=processors)
             pipeline = Pipeline(lang=language, processors=processors)
+            model_version = f"{__version__}-{processors}"
+
+            def parse_batch(texts):
+                # A list of documents is processed in bulk by stanza.
+                return pipeline([Document([], text=text) for text in texts])
 
-            def write_output(result, out_file):
-                CoNLL.write_doc2conll(result, out_file)
+            def to_conll(result):
+                return CoNLL.doc2conll_text(result)
 
         elif system == Config.UD_SYSTEM.TRANKIT:
-            from trankit import Pipeline, trankit2conllu
+            from trankit import Pipeline, __version__, trankit2conllu
 
             pipeline = Pipeline(Config.UD_LANG_MAPPING[language])
-
-            def write_output(result, out_file):
-                out_file.write_text(trankit2conllu(result))
+            model_version = __version__
+
+            def parse_batch(texts):
+                # Trankit has no call for multiple documents, but it never
+                # puts a sentence across paragraphs. The batch is parsed as
+                # one text with a paragraph per document and the sentences
+                # are split back out by their character offsets.
+                starts, offset = [], 0
+                for text in texts:
+                    starts.append(offset)
+                    offset += len(text) + len(self.TRANKIT_SEPARATOR)
+                result = pipeline(self.TRANKIT_SEPARATOR.join(texts))
+
+                docs = [{"text": text, "sentences": []} for text in texts]
+                for sentence in result["sentences"]:
+                    doc_idx = bisect_right(starts, sentence["dspan"][0]) - 1
+                    docs[doc_idx]["sentences"].append(sentence)
+                return docs
+
+            def to_conll(result):
+                return trankit2conllu(result)
 
         else:
             raise UDError(f"Unsupported UD_SYSTEM: {system}")
 
+        self.system = str(system)
+        self.language = str(language)
+        # Versions of the models that come with the installed UD system,
+        # part of the UDCache keys.
+        self.model_version = model_version
+        self.cache = cache
         self.pipeline = pipeline
-        self.write_output = write_output
+        self.parse_batch = parse_batch
+        self.to_conll = to_conll
+
+    def write_output(self, result: Any, out_file: PathLike):
+        Path(out_file).write_text(self.to_conll(result))
 
     def parse(self, text: str, out_file: PathLike, return_output: bool = False) -> Path:
         """
@@ -217,12 +310,21 @@ class UDParser:
         at the provided path.
         """
         out_file = Path(out_file)
+        if not return_output:
+            out_file.write_text(self.parse_many([text])[0])
+            return out_file
+
         result = self.pipeline(text)
         self.write_output(result, out_file)
+        return out_file, result
 
-        if return_output:
-            return out_file, result
-        return out_file
+    def parse_in_memory(self, text: str) -> Tuple[str, UDGraph]:
+        """
+        Generate a UD parse from the input text without writing it to disk,
+        returns it in conll format together with its UDGraph.
+        """
+        conll_str = self.parse_many([text])[0]
+        return conll_str, UDGraph().from_string(conll_str)
 
     def parse_path(self, text_file: PathLike, out_file: PathLike) -> Path:
         """
@@ -231,6 +333,43 @@ class UDParser:
         """
         return self.parse(Path(text_file).read_text(), out_file)
 
+    def parse_many(
+        self, texts: Sequence[str], batch_size: int = 32
+    ) -> List[str]:
+        """
+        Generate the UD parses of multiple documents in CoNLL-U format, in
+        the order of 'texts'. The documents are sorted by length and every
+        'batch_size' of them go through the pipeline in a single call, so
+        the batches that the pipeline creates internally need little
+        padding. With a cache, only the documents that are not in it are
+        parsed.
+        """
+        if batch_size < 1:
+            raise UDError(f"Invalid batch size: {batch_size}")
+
+        conll_strs = [None] * len(texts)
+        keys = [None] * len(texts)
+        if self.cache is not None:
+            for idx, text in enumerate(texts):
+                keys[idx] = self.cache.key(
+                    text, self.system, self.language, self.model_version
+                )
+                conll_strs[idx] = self.cache.get(keys[idx])
+
+        order = sorted(
+            (idx for idx in range(len(texts)) if conll_strs[idx] is None),
+            key=lambda idx: len(texts[idx]),
+        )
+        for start in range(0, len(order), batch_size):
+            batch = order[start : start + batch_size]
+            results = self.parse_batch([texts[idx] for idx in batch])
+            for idx, result in zip(batch, results):
+                conll_strs[idx] = self.to_conll(result)
+                if self.cache is not None:
+                    self.cache.put(keys[idx], conll_strs[idx])
+
+        return conll_strs
+
 
 class Collector:
     """Helper to collect some information about the UD graph"""
@@ -0,0 +1,76 @@
+import hashlib
+from collections import OrderedDict
+from os import PathLike
+from typing import Optional
+
+from ud_boxer.disk_cache import DiskCache
+
+__all__ = [
+    "DEFAULT_UD_CACHE_SIZE",
+    "DEFAULT_UD_MEMORY_SIZE",
+    "UDCache",
+]
+
+# 256 MiB of compressed parses, the parses of all PMB splits take up less.
+DEFAULT_UD_CACHE_SIZE = 1 << 28
+# Number of parses that are also kept in memory.
+DEFAULT_UD_MEMORY_SIZE = 4096
+
+
+class UDCache(DiskCache):
+    """
+    Cache of UD parses in CoNLL-U format. Parses are keyed by a hash of the
+    raw text and the UD system, language and model version that parsed it
+    (see 'key') and stored on disk in a single SQLite database, the least
+    recently used parses are evicted when it grows beyond 'max_size' bytes.
+    The last 'memory_size' parses that were used are kept in memory as
+    well, so repeated texts (in a service for instance) do not even hit the
+    database.
+    """
+
+    TABLE = "parses"
+
+    def __init__(
+        self,
+        path: PathLike,
+        max_size: int = DEFAULT_UD_CACHE_SIZE,
+        memory_size: int = DEFAULT_UD_MEMORY_SIZE,
+    ) -> None:
+        super().__init__(path, max_size)
+        self.memory_size = memory_size
+        self._memory: OrderedDict[str, str] = OrderedDict()
+
+    @staticmethod
+    def key(text: str, system: str, language: str, model_version: str) -> str:
+        """Key of a single parse, see 'UDParser.model_version'"""
+        key_hasher = hashlib.sha256()
+        for item in (system, language, model_version, text):
+            key_hasher.update(f"{item}\0".encode())
+        return key_hasher.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if (conll_str := self._memory.get(key)) is not None:
+                self._memory.move_to_end(key)
+                return conll_str
+
+            if (value := self.get_bytes(key)) is None:
+                return None
+
+            conll_str = value.decode()
+            self._remember(key, conll_str)
+            return conll_str
+
+    def put(self, key: str, conll_str: str):
+        with self._lock:
+            self.put_bytes(key, conll_str.encode())
+            self._remember(key, conll_str)
+
+    def _remember(self, key: str, conll_str: str):
+        self._memory[key] = conll_str
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def __getstate__(self):
+        return {**super().__getstate__(), "_memory": OrderedDict()}
@@ -1,4 +1,5 @@
 __all__ = [
+    "UDError",
     "UDSpecBasic",
     "UPOS_WN_POS_MAPPING",
     "TIME_EDGE_MAPPING",
@@ -6,6 +7,10 @@ __all__ = [
 ]
 
 
+class UDError(Exception):
+    pass
+
+
 class UDSpecBasic:
     class DepRels:
         ACL = "acl"  # clausal modifier of noun (adnominal clause)